@@ -7,6 +7,12 @@ from .capture import *  # noqa
 from .scaling import *  # noqa
 from .eyes_base import *  # noqa
 from .geometry import *  # noqa
+from .http_transport import *  # noqa
+from .render_info_cache import *  # noqa
+from .upload_pipeline import *  # noqa
+from .polling import *  # noqa
+from .upload_index import *  # noqa
+from .tracing import *  # noqa
 from .agent_connector import AgentConnector  # noqa
 
 __all__ = (triggers.__all__ +  # noqa
@@ -18,4 +24,10 @@ __all__ = (triggers.__all__ +  # noqa
            capture.__all__ +  # noqa
            eyes_base.__all__ +  # noqa
            geometry.__all__ +  # noqa
-           ('logger', 'AgentConnector'))
+           http_transport.__all__ +  # noqa
+           render_info_cache.__all__ +  # noqa
+           upload_pipeline.__all__ +  # noqa
+           polling.__all__ +  # noqa
+           upload_index.__all__ +  # noqa
+           tracing.__all__ +  # noqa
+           ('logger', 'tracing', 'AgentConnector'))
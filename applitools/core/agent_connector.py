@@ -1,7 +1,6 @@
 from __future__ import absolute_import
 
 import itertools
-import math
 import time
 import typing as tp
 import uuid
@@ -11,15 +10,24 @@ import requests
 from requests.packages import urllib3
 
 from applitools.utils import general_utils
-from applitools.utils.compat import urljoin, gzip_compress  # type: ignore
-from . import logger, EyesError
+from applitools.utils.compat import urljoin, urlparse, gzip_compress  # type: ignore
+from applitools.utils.streaming import GzipSpool
+from . import logger, tracing, EyesError
+from .http_transport import HttpTransport
+from .polling import PollingStrategy
+from .render_info_cache import render_info_cache
 from .test_results import TestResults
+from .upload_index import upload_index
 from ..utils.general_utils import UTC
 
 if tp.TYPE_CHECKING:
     from typing import Dict, Optional, Text, Callable, Any
     from requests.models import Response
     from ..utils.custom_types import RunningSession, SessionStartInfo, Num
+    from .http_transport import ConnectionSettings
+    from .polling import _Poll
+    from .render_info_cache import RenderInfoCache
+    from .upload_index import UploadIndex
 
 # Prints out all data sent/received through 'requests'
 # import httplib
@@ -36,6 +44,34 @@ def _parse_response_with_json_data(response):
     return response.json()
 
 
+def _running_session_from_response(response):
+    # type: (Response) -> RunningSession
+    parsed_response = _parse_response_with_json_data(response)
+    return dict(
+        session_id=parsed_response["id"],
+        session_url=parsed_response["url"],
+        is_new_session=parsed_response["isNew"],
+    )
+
+
+def _test_results_from_response(response):
+    # type: (Response) -> TestResults
+    pr = _parse_response_with_json_data(response)
+    logger.debug("stop_session(): parsed response: {}", pr)
+    return TestResults(
+        pr.get("steps"),
+        pr.get("matches"),
+        pr.get("mismatches"),
+        pr.get("missing"),
+        pr.get("exactMatches"),
+        pr.get("strictMatches"),
+        pr.get("contentMatches"),
+        pr.get("layoutMatches"),
+        pr.get("noneMatches"),
+        pr.get("status"),
+    )
+
+
 def to_rfc1123_datetime(dt):
     # type: (datetime) -> Text
     """Return a string representation of a date according to RFC 1123
@@ -106,6 +142,13 @@ def retry(delays=(0, 100, 500), exception=Exception, report=lambda *args: None):
     return wrapper
 
 
+class _AccessTokenRejected(Exception):
+    """
+    Raised when the storage service rejects the access token of the render info.
+    Intentionally not an EyesError, so the upload isn't retried with the same token.
+    """
+
+
 class AgentConnector(object):
     """
     Provides an API for communication with the Applitools server.
@@ -121,17 +164,38 @@ class AgentConnector(object):
         "x-applitools-eyes-client": None,
     }
 
-    def __init__(self, server_url, full_agent_id):
-        # type: (tp.Text, tp.Text) -> None
+    def __init__(self,
+                 server_url,  # type: tp.Text
+                 full_agent_id,  # type: tp.Text
+                 connection_settings=None,  # type: tp.Optional[ConnectionSettings]
+                 transport=None,  # type: tp.Optional[HttpTransport]
+                 polling_strategy=None,  # type: tp.Optional[PollingStrategy]
+                 ):
+        # type: (...) -> None
         """
         Ctor.
 
         :param server_url: The url of the Applitools server.
+        :param full_agent_id: The agent id which is sent with every request.
+        :param connection_settings: Settings of the connection pool. Ignored if transport is given.
+        :param transport: An existing transport to share connections with other connectors.
+        :param polling_strategy: The strategy of polling long running server tasks.
         """
         # Used inside the server_url property.
         self._server_url = None
         self._endpoint_uri = None
         self._render_info = None
+        if transport is None:
+            transport = HttpTransport(connection_settings)
+        self._transport = transport  # type: HttpTransport
+        self._render_info_cache = render_info_cache  # type: RenderInfoCache
+        if polling_strategy is None:
+            polling_strategy = PollingStrategy(self.LONG_REQUEST_DELAY_MS, self.MAX_LONG_REQUEST_DELAY_MS,
+                                               self.LONG_REQUEST_DELAY_MULTIPLICATIVE_INCREASE_FACTOR)
+        self.polling_strategy = polling_strategy  # type: PollingStrategy
+        # If true, payloads identical to ones already uploaded reuse their url instead of being uploaded again.
+        self.deduplicate_uploads = False  # type: bool
+        self._upload_index = upload_index  # type: UploadIndex
 
         self.api_key = None  # type: ignore
         self.server_url = server_url
@@ -148,17 +212,66 @@ class AgentConnector(object):
         self._server_url = server_url  # type: ignore
         self._endpoint_uri = server_url.rstrip("/") + "/api/sessions/running"  # type: ignore
 
-    def long_request(self, method, url, **kwargs):
-        # type: (Callable, Text, **Any) -> Response
+    @property
+    def transport(self):
+        # type: () -> HttpTransport
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport):
+        # type: (HttpTransport) -> None
+        self._transport = transport
+
+    @property
+    def connection_stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns counters of requests sent and connections opened/reused by the transport.
+        """
+        return self._transport.connection_stats
+
+    @staticmethod
+    def _long_request_kwargs(kwargs):
+        # type: (tp.Dict[Text, Any]) -> tp.Dict[Text, Any]
         headers = kwargs.get("headers", AgentConnector._DEFAULT_HEADERS).copy()
         headers["Eyes-Expect"] = "202+location"
         headers["Eyes-Date"] = current_time_in_rfc1123()
         kwargs["headers"] = headers
-        response = method(url, **kwargs)
-        logger.debug("Long request `{}` for {}".format(method.__name__, response.url))
-        return self._long_request_check_status(response)
+        return kwargs
 
-    def _long_request_check_status(self, response):
+    def _long_request_status_kwargs(self):
+        # type: () -> tp.Dict[Text, Any]
+        """
+        Returns the arguments of the requests which poll or delete a long request's Location.
+        """
+        return dict(
+            headers={
+                "Eyes-Date": current_time_in_rfc1123(),
+                "x-applitools-eyes-client": self._DEFAULT_HEADERS['x-applitools-eyes-client']
+            },
+            verify=False,
+            params=dict(apiKey=self.api_key),
+        )
+
+    def long_request(self, method, url, endpoint=None, **kwargs):
+        # type: (Callable, Text, tp.Optional[Text], **Any) -> Response
+        """
+        Sends a request which may start a long running server task, and polls until it completes.
+
+        :param endpoint: The name the polling statistics are kept under. Defaults to the url path.
+        """
+        endpoint = endpoint or urlparse(url).path
+        poll = self.polling_strategy.begin(endpoint)
+        try:
+            with tracing.span('long_request', endpoint=endpoint):
+                response = method(url, **self._long_request_kwargs(kwargs))
+                logger.debug("Long request `{}` for {}", method.__name__, response.url)
+                return self._long_request_check_status(response, poll)
+        finally:
+            poll.finish()
+
+    def _long_request_check_status(self, response, poll):
+        # type: (Response, _Poll) -> Response
         if (
             response.status_code == requests.codes.ok
             or "Location" not in response.headers
@@ -168,46 +281,39 @@ class AgentConnector(object):
         elif response.status_code == requests.codes.accepted:
             # long request here; calling received url to know that request was processed
             url = response.headers["Location"]
-            response = self._long_request_loop(url)
-            return self._long_request_check_status(response)
+            poll.on_response(response)
+            response = self._long_request_loop(url, poll)
+            return self._long_request_check_status(response, poll)
         elif response.status_code == requests.codes.created:
             # delete url that was used before
             url = response.headers["Location"]
-            return requests.delete(
-                url,
-                headers={
-                    "Eyes-Date": current_time_in_rfc1123(),
-                    "x-applitools-eyes-client": self._DEFAULT_HEADERS['x-applitools-eyes-client']
-                },
-                verify=False,
-                params=dict(apiKey=self.api_key),
-            )
+            return self._transport.delete(url, **self._long_request_status_kwargs())
         elif response.status_code == requests.codes.gone:
             raise EyesError("The server task has gone.")
         else:
             raise EyesError("Unknown error during long request: {}".format(response))
 
-    def _long_request_loop(self, url, delay=LONG_REQUEST_DELAY_MS):
-        delay = min(
-            self.MAX_LONG_REQUEST_DELAY_MS,
-            math.floor(delay * self.LONG_REQUEST_DELAY_MULTIPLICATIVE_INCREASE_FACTOR),
-        )
-        logger.debug("Still running... Retrying in {} ms".format(delay))
+    def _long_request_loop(self, url, poll):
+        # type: (Text, _Poll) -> Response
+        while True:
+            delay = poll.next_delay()
+            logger.debug("Still running... Retrying in {:.0f} ms", delay * 1000)
+            time.sleep(delay)
+            with tracing.span('long_request_poll'):
+                response = self._transport.get(url, **self._long_request_status_kwargs())
+            if response.status_code != requests.codes.ok:
+                return response
+            poll.on_response(response)
 
-        time.sleep(delay / 1000.0)
-        response = requests.get(
-            url,
-            headers={
-                "Eyes-Date": current_time_in_rfc1123(),
-                "x-applitools-eyes-client": self._DEFAULT_HEADERS['x-applitools-eyes-client']
-                },
-            verify=False,
-            params=dict(apiKey=self.api_key),
-        )
-        if response.status_code != requests.codes.ok:
-            return response
-        return self._long_request_loop(url, delay)
+    @property
+    def polling_stats(self):
+        # type: () -> tp.Dict[tp.Text, tp.Dict[tp.Text, tp.Any]]
+        """
+        Returns per-endpoint histograms of the number of polls and the latency of long requests.
+        """
+        return self.polling_strategy.stats.as_dict()
 
+    @tracing.traced('start_session')
     def start_session(self, session_start_info):
         # type: (SessionStartInfo) -> RunningSession
         """
@@ -220,21 +326,18 @@ class AgentConnector(object):
         """
         data = '{"startInfo": %s}' % (general_utils.to_json(session_start_info))
         response = self.long_request(
-            requests.post,
+            self._transport.post,
             self._endpoint_uri,
+            endpoint="start_session",
             data=data,
             verify=False,
             params=dict(apiKey=self.api_key),
             headers=AgentConnector._DEFAULT_HEADERS,
             timeout=AgentConnector._TIMEOUT,
         )
-        parsed_response = _parse_response_with_json_data(response)
-        return dict(
-            session_id=parsed_response["id"],
-            session_url=parsed_response["url"],
-            is_new_session=parsed_response["isNew"],
-        )
+        return _running_session_from_response(response)
 
+    @tracing.traced('stop_session')
     def stop_session(self, running_session, is_aborted, save):
         # type: (RunningSession, bool, bool) -> TestResults
         """
@@ -249,35 +352,50 @@ class AgentConnector(object):
         session_uri = "%s/%s" % (self._endpoint_uri, running_session["session_id"])
         params = {"aborted": is_aborted, "updateBaseline": save, "apiKey": self.api_key}
         response = self.long_request(
-            requests.delete,
+            self._transport.delete,
             session_uri,
+            endpoint="stop_session",
             params=params,
             verify=False,
             headers=AgentConnector._DEFAULT_HEADERS,
             timeout=AgentConnector._TIMEOUT,
         )
-        pr = _parse_response_with_json_data(response)
-        logger.debug("stop_session(): parsed response: {}".format(pr))
-        return TestResults(
-            pr.get("steps"),
-            pr.get("matches"),
-            pr.get("mismatches"),
-            pr.get("missing"),
-            pr.get("exactMatches"),
-            pr.get("strictMatches"),
-            pr.get("contentMatches"),
-            pr.get("layoutMatches"),
-            pr.get("noneMatches"),
-            pr.get("status"),
-        )
+        return _test_results_from_response(response)
+
+    def render_info(self, force=False):
+        # type: (bool) -> Optional[Dict]
+        """
+        Returns the render info, which is shared by all the connectors of the process until the
+        access token is about to expire.
 
-    def render_info(self):
-        # type: () -> Optional[Dict]
+        :param force: If True, the cached render info is dropped and fetched again.
+        """
         logger.debug("render_info() called.")
+        key = self._render_info_key
+        if force:
+            self._render_info_cache.invalidate(key)
+        self._render_info = self._render_info_cache.get(key, self._fetch_render_info)
+        return self._render_info
+
+    @property
+    def _render_info_key(self):
+        # type: () -> tp.Tuple[tp.Text, tp.Text]
+        return self._server_url, self.api_key
+
+    @property
+    def render_info_stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the hit/miss statistics of the render info cache.
+        """
+        return self._render_info_cache.stats
+
+    def _fetch_render_info(self):
+        # type: () -> Dict
         headers = AgentConnector._DEFAULT_HEADERS.copy()
         headers["Content-Type"] = "application/json"
         response = self.long_request(
-            requests.get,
+            self._transport.get,
             url=urljoin(self._endpoint_uri, "/api/sessions/renderinfo"),
             params=dict(apiKey=self.api_key),
             verify=False,
@@ -290,14 +408,42 @@ class AgentConnector(object):
                     response.status_code, response.content
                 )
             )
-        self._render_info = response.json()
-        return self._render_info
+        return response.json()
+
+    @property
+    def upload_dedup_stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the hits, misses and bytes saved by upload deduplication, for the whole process.
+        """
+        return self._upload_index.stats
 
+    @tracing.traced('upload')
     def _try_upload_data(self, data_bytes, content_type, media_type):
-        # type: (bytes, Text, Text) -> Optional[Text]
+        # type: (tp.Union[bytes, GzipSpool], Text, Text) -> Optional[Text]
+        if not self.deduplicate_uploads:
+            return self._try_upload_new_data(data_bytes, content_type, media_type)
+        if isinstance(data_bytes, GzipSpool):
+            digest = data_bytes.digest
+        else:
+            digest = self._upload_index.digest(data_bytes)
+        key = (self._render_info_key, media_type, digest)
+        target_url = self._upload_index.lookup(key, len(data_bytes))
+        if target_url is not None:
+            logger.info("data already uploaded to {}".format(target_url))
+            return target_url
+        target_url = self._try_upload_new_data(data_bytes, content_type, media_type)
+        if target_url is not None:
+            self._upload_index.add(key, target_url)
+        return target_url
+
+    def _try_upload_new_data(self, data_bytes, content_type, media_type):
+        # type: (tp.Union[bytes, GzipSpool], Text, Text) -> Optional[Text]
         rendering_info = self.render_info()
 
-        if rendering_info and "resultsUrl" in rendering_info:
+        for _ in range(2):
+            if not (rendering_info and "resultsUrl" in rendering_info):
+                return None
             try:
                 target_url = rendering_info["resultsUrl"]
                 guid = uuid.uuid4()
@@ -307,13 +453,19 @@ class AgentConnector(object):
                     data_bytes, rendering_info, target_url, content_type, media_type
                 ):
                     return target_url
+            except _AccessTokenRejected as e:
+                logger.debug("{}. Refreshing render info...".format(e))
+                self._render_info_cache.invalidate(self._render_info_key, rendering_info)
+                rendering_info = self.render_info()
             except Exception as e:
                 logger.debug("Error uploading image")
                 logger.debug(str(e))
+                return None
+        return None
 
     @retry(delays=(0.5, 1, 10), exception=EyesError, report=logger.debug)
     def _upload_data(self, data_bytes, rendering_info, target_url, content_type, media_type):
-        # type: (bytes, Dict, Text, Text, Text) -> bool
+        # type: (tp.Union[bytes, GzipSpool], Dict, Text, Text, Text) -> bool
         headers = AgentConnector._DEFAULT_HEADERS.copy()
         headers["Content-Type"] = content_type
         headers["Content-Length"] = str(len(data_bytes))
@@ -321,7 +473,10 @@ class AgentConnector(object):
         headers["X-Auth-Token"] = rendering_info["accessToken"]
         headers["x-ms-blob-type"] = "BlockBlob"
 
-        response = requests.put(
+        if isinstance(data_bytes, GzipSpool):
+            # Streamed from the start on every attempt.
+            data_bytes.seek(0)
+        response = self._transport.put(
             target_url,
             data=data_bytes,
             headers=headers,
@@ -331,10 +486,15 @@ class AgentConnector(object):
         if response.status_code in [requests.codes.ok, requests.codes.created]:
             logger.info("Upload Status Code: {}".format(response.status_code))
             return True
+        if response.status_code in [requests.codes.unauthorized, requests.codes.forbidden]:
+            raise _AccessTokenRejected(
+                "Upload rejected. Status Code: {}".format(response.status_code)
+            )
         raise EyesError(
             "Failed to Upload Data. Status Code: {}".format(response.status_code)
         )
 
+    @tracing.traced('match_window')
     def match_window(self, running_session, data):
         # type: (RunningSession, tp.Text) -> bool
         """
@@ -353,8 +513,9 @@ class AgentConnector(object):
         headers["Content-Type"] = "application/octet-stream"
 
         response = self.long_request(
-            requests.post,
+            self._transport.post,
             session_uri,
+            endpoint="match_window",
             params=dict(apiKey=self.api_key),
             data=data,
             verify=False,
@@ -364,11 +525,16 @@ class AgentConnector(object):
         parsed_response = _parse_response_with_json_data(response)
         return parsed_response["asExpected"]
 
+    @tracing.traced('upload_dom')
     def post_dom_capture(self, dom_json):
-        # type: (tp.Text) -> tp.Optional[tp.Text]
+        # type: (tp.Union[tp.Text, GzipSpool]) -> tp.Optional[tp.Text]
         """
-        Upload the DOM of the tested page.
+        Upload the DOM of the tested page, either as JSON or already compressed into a GzipSpool,
+        which is streamed.
         Return an URL of uploaded resource which should be posted to AppOutput.
         """
-        dom_bytes = gzip_compress(dom_json.encode("utf-8"))
+        if isinstance(dom_json, GzipSpool):
+            dom_bytes = dom_json.finish()
+        else:
+            dom_bytes = gzip_compress(dom_json.encode("utf-8"))
         return self._try_upload_data(dom_bytes, "application/octet-stream", "application/json")
@@ -0,0 +1,200 @@
+"""
+Asynchronous (asyncio) flavour of the AgentConnector. Requires Python 3.5+.
+
+The blocking HTTP requests are run on an executor, while waiting for long running server
+tasks is done with `asyncio.sleep`, so many sessions can be started, matched and stopped
+concurrently from a single event loop without holding a thread per polling request.
+"""
+from __future__ import absolute_import
+
+import asyncio
+import functools
+import typing as tp
+
+import requests
+
+from applitools.utils import general_utils
+from applitools.utils.compat import gzip_compress, urlparse
+from applitools.utils.streaming import GzipSpool
+from . import logger, EyesError
+from .agent_connector import (AgentConnector, _parse_response_with_json_data,
+                              _running_session_from_response, _test_results_from_response)
+
+if tp.TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from typing import Any, Callable, Optional, Text
+    from requests.models import Response
+    from ..utils.custom_types import RunningSession, SessionStartInfo
+    from .polling import _Poll
+    from .test_results import TestResults
+
+__all__ = ('AsyncAgentConnector',)
+
+
+class AsyncAgentConnector(AgentConnector):
+    """
+    AgentConnector with coroutine flavours of the session API, named with an `_async` suffix
+    (e.g. `match_window_async`). The inherited synchronous methods keep working, and the
+    transport, the render info cache and the request building are shared between both.
+    """
+
+    def __init__(self, server_url, full_agent_id, connection_settings=None, transport=None,
+                 polling_strategy=None, executor=None, loop=None):
+        """
+        :param executor: The executor the blocking HTTP requests are run on. None means the
+            default executor of the event loop.
+        :param loop: The event loop to use. None means the current event loop.
+        """
+        super(AsyncAgentConnector, self).__init__(server_url, full_agent_id,
+                                                  connection_settings, transport, polling_strategy)
+        self._executor = executor  # type: Optional[Executor]
+        self._loop = loop  # type: Optional[asyncio.AbstractEventLoop]
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        # type: (Callable, *Any, **Any) -> Any
+        loop = self._loop or asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _long_request_async(self, method, url, endpoint=None, **kwargs):
+        # type: (Callable, Text, Optional[Text], **Any) -> Response
+        """
+        The coroutine flavour of `long_request`. It's named apart so the synchronous requests
+        inherited from AgentConnector (e.g. of the render info), which are run on the executor,
+        keep using the blocking one.
+        """
+        poll = self.polling_strategy.begin(endpoint or urlparse(url).path)
+        try:
+            response = await self._run_blocking(method, url, **self._long_request_kwargs(kwargs))
+            logger.debug("Long request `{}` for {}", method.__name__, response.url)
+            return await self._long_request_check_status_async(response, poll)
+        finally:
+            poll.finish()
+
+    async def _long_request_check_status_async(self, response, poll):
+        # type: (Response, _Poll) -> Response
+        if (
+            response.status_code == requests.codes.ok
+            or "Location" not in response.headers
+        ):
+            # request ends successful or it doesn't support Long request
+            return response
+        elif response.status_code == requests.codes.accepted:
+            # long request here; calling received url to know that request was processed
+            url = response.headers["Location"]
+            poll.on_response(response)
+            response = await self._long_request_loop_async(url, poll)
+            return await self._long_request_check_status_async(response, poll)
+        elif response.status_code == requests.codes.created:
+            # delete url that was used before
+            url = response.headers["Location"]
+            return await self._run_blocking(self._transport.delete, url,
+                                            **self._long_request_status_kwargs())
+        elif response.status_code == requests.codes.gone:
+            raise EyesError("The server task has gone.")
+        else:
+            raise EyesError("Unknown error during long request: {}".format(response))
+
+    async def _long_request_loop_async(self, url, poll):
+        # type: (Text, _Poll) -> Response
+        while True:
+            delay = poll.next_delay()
+            logger.debug("Still running... Retrying in {:.0f} ms", delay * 1000)
+            await asyncio.sleep(delay)
+            response = await self._run_blocking(self._transport.get, url,
+                                                **self._long_request_status_kwargs())
+            if response.status_code != requests.codes.ok:
+                return response
+            poll.on_response(response)
+
+    async def start_session_async(self, session_start_info):
+        # type: (SessionStartInfo) -> RunningSession
+        """
+        Starts a new running session in the agent.
+
+        :param session_start_info: The start params for the session.
+        :return: Represents the current running session.
+        """
+        data = '{"startInfo": %s}' % (general_utils.to_json(session_start_info))
+        response = await self._long_request_async(
+            self._transport.post,
+            self._endpoint_uri,
+            endpoint="start_session",
+            data=data,
+            verify=False,
+            params=dict(apiKey=self.api_key),
+            headers=AgentConnector._DEFAULT_HEADERS,
+            timeout=AgentConnector._TIMEOUT,
+        )
+        return _running_session_from_response(response)
+
+    async def stop_session_async(self, running_session, is_aborted, save):
+        # type: (RunningSession, bool, bool) -> TestResults
+        """
+        Stops a running session in the Eyes server.
+
+        :param running_session: The session to stop.
+        :param is_aborted: Whether the server should mark this session as aborted.
+        :param save: Whether the session should be automatically saved if it is not aborted.
+        :return: Test results of the stopped session.
+        """
+        logger.debug("Stop session called..")
+        session_uri = "%s/%s" % (self._endpoint_uri, running_session["session_id"])
+        params = {"aborted": is_aborted, "updateBaseline": save, "apiKey": self.api_key}
+        response = await self._long_request_async(
+            self._transport.delete,
+            session_uri,
+            endpoint="stop_session",
+            params=params,
+            verify=False,
+            headers=AgentConnector._DEFAULT_HEADERS,
+            timeout=AgentConnector._TIMEOUT,
+        )
+        return _test_results_from_response(response)
+
+    async def match_window_async(self, running_session, data):
+        # type: (RunningSession, tp.Text) -> bool
+        """
+        Matches the current window to the immediate expected window in the Eyes server.
+
+        :param running_session: The current session that is running.
+        :param data: The data for the requests.post.
+        :return: Whether the window matched the expected window.
+        """
+        session_uri = "%s/%s" % (self._endpoint_uri, running_session["session_id"])
+        headers = AgentConnector._DEFAULT_HEADERS.copy()
+        headers["Content-Type"] = "application/octet-stream"
+
+        response = await self._long_request_async(
+            self._transport.post,
+            session_uri,
+            endpoint="match_window",
+            params=dict(apiKey=self.api_key),
+            data=data,
+            verify=False,
+            headers=headers,
+            timeout=AgentConnector._TIMEOUT,
+        )
+        parsed_response = _parse_response_with_json_data(response)
+        return parsed_response["asExpected"]
+
+    async def try_upload_data_async(self, data_bytes, content_type, media_type):
+        # type: (tp.Union[bytes, GzipSpool], Text, Text) -> Optional[Text]
+        """
+        Uploads data to the storage service, returning its url or None on failure.
+        """
+        return await self._run_blocking(self._try_upload_data, data_bytes, content_type,
+                                        media_type)
+
+    async def post_dom_capture_async(self, dom_json):
+        # type: (tp.Union[tp.Text, GzipSpool]) -> tp.Optional[tp.Text]
+        """
+        Upload the DOM of the tested page, either as JSON or already compressed into a GzipSpool,
+        which is streamed.
+        Return an URL of uploaded resource which should be posted to AppOutput.
+        """
+        if isinstance(dom_json, GzipSpool):
+            dom_bytes = dom_json.finish()
+        else:
+            dom_bytes = gzip_compress(dom_json.encode("utf-8"))
+        return await self.try_upload_data_async(dom_bytes, "application/octet-stream",
+                                                "application/json")
@@ -110,14 +110,15 @@ class EyesScreenshot(ABC):
             created.
         """
 
-    def get_bytes(self):
-        # type: () -> bytes
+    def get_bytes(self, encoder=None):
+        # type: (tp.Optional[image_utils.PngEncoder]) -> bytes
         """
         Returns the bytes of the screenshot.
 
+        :param encoder: The PNG encoder to use. None means Pillow's defaults.
         :return: The bytes representation of the png.
         """
-        return image_utils.get_bytes(self._screenshot)
+        return image_utils.get_bytes(self._screenshot, encoder)
 
     def get_intersected_region_by_element(self, element):
         # type: (EyesWebElement) -> Region
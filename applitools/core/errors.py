@@ -1,5 +1,5 @@
-__all__ = ('EyesError', 'EyesIllegalArgument', 'OutOfBoundsError', 'TestFailedError', 'NewTestError',
-           'DiffsFoundError')
+__all__ = ('EyesError', 'EyesIllegalArgument', 'OutOfBoundsError', 'DriverBudgetExceededError', 'TestFailedError',
+           'NewTestError', 'DiffsFoundError')
 
 
 class EyesError(Exception):
@@ -21,6 +21,12 @@ class OutOfBoundsError(EyesError):
     """
 
 
+class DriverBudgetExceededError(EyesError):
+    """
+    Indicates that a checkpoint took more WebDriver round trips or time than its budget allows.
+    """
+
+
 class TestFailedError(Exception):
     """
     Indicates that a test did not pass (i.e., test either failed or is a new test).
@@ -8,17 +8,24 @@ from datetime import datetime
 
 from ..__version__ import __version__
 from ..utils import general_utils, ABC
-from . import logger
+from ..utils.image_utils import PngEncoder
+from ..utils.streaming import GzipSpool
+from . import logger, tracing
 from .agent_connector import AgentConnector
 from .errors import EyesError, NewTestError, DiffsFoundError, TestFailedError
+from .http_transport import ConnectionSettings, HttpTransport
 from .match_window_task import MatchWindowTask
 from .test_results import TestResults, TestResultsStatus
+from .upload_pipeline import UploadPipeline
 
 if tp.TYPE_CHECKING:
     from ..utils.custom_types import (ViewPort, UserInputs, AppEnvironment, MatchResult,
                                       RunningSession, SessionStartInfo)
     from .capture import EyesScreenshot
     from .geometry import Region
+    from .polling import PollingStrategy
+    from .upload_pipeline import MatchHandle
+    from ..selenium.target import Target
 
 __all__ = ('FailureReports', 'MatchLevel', 'ExactMatchSettings', 'ImageMatchSettings', 'EyesBase')
 
@@ -158,8 +165,12 @@ class EyesBase(ABC):
         self.agent_id = None  # type: tp.Optional[tp.Text]
 
         self._agent_connector = AgentConnector(server_url, self.full_agent_id)  # type: AgentConnector
+        # Whether the transport was created by this instance, rather than set by the user and maybe shared.
+        self._owns_transport = True
         self._should_get_title = False  # type: bool
         self._is_open = False  # type: bool
+        # The context of the records logged for the test, while it's open.
+        self._log_context = None  # type: tp.Optional[logger.LogContext]
         self._app_name = None  # type: tp.Optional[tp.Text]
         self._running_session = None  # type: tp.Optional[RunningSession]
         self._match_timeout = EyesBase._DEFAULT_MATCH_TIMEOUT  # type: int
@@ -214,12 +225,26 @@ class EyesBase(ABC):
         # The number of milliseconds to wait before each time a screenshot is taken.
         self.wait_before_screenshots = EyesBase._DEFAULT_WAIT_BEFORE_SCREENSHOTS  # type: int
 
+        # The encoder of the screenshots sent to the server. Use PngEncoder.fast() to trade bandwidth for CPU time.
+        self.png_encoder = PngEncoder()  # type: PngEncoder
+
+        # The maximal number of milliseconds to wait for the page to stop changing before the first match of a
+        # check, comparing consecutive screenshots locally. 0 disables the stabilization.
+        self.stabilization_timeout = 0  # type: int
+
         # If true, we will send full DOM to the server for analyzing
         self.send_dom = False
         # If true, use DOM for comparision
         self.use_dom = False
         self.enable_patterns = False
 
+        # If true, screenshots are encoded, uploaded and matched in the background while the test goes on,
+        # check_window returns a MatchHandle and close waits for all pending matches. Matches aren't retried, so
+        # the match timeout is only waited before the capture, and only after a mismatch (as on the last retry).
+        # Mismatches are reported on close, so failure_reports must be FailureReports.ON_CLOSE.
+        self.pipeline_uploads = False  # type: bool
+        self._upload_pipeline = UploadPipeline()  # type: UploadPipeline
+
     @property
     def baseline_name(self):
         logger.warning('DEPRECATED: Use `baseline_branch_name` instead')
@@ -359,6 +384,116 @@ class EyesBase(ABC):
         else:
             self._agent_connector.server_url = server_url
 
+    @property
+    def connection_settings(self):
+        # type: () -> ConnectionSettings
+        """
+        Gets the settings of the connection pool used for communication with the Eyes server.
+        """
+        return self._agent_connector.transport.settings
+
+    @connection_settings.setter
+    def connection_settings(self, settings):
+        # type: (ConnectionSettings) -> None
+        """
+        Sets the settings of the connection pool used for communication with the Eyes server.
+        A transport set by the user (e.g. shared with other Eyes instances) is replaced, but not closed.
+
+        :param settings: The connection settings (pool sizes, keep-alive, proxies).
+        """
+        if self._owns_transport:
+            self._agent_connector.transport.close()
+        self._agent_connector.transport = HttpTransport(settings)
+        self._owns_transport = True
+
+    @property
+    def transport(self):
+        # type: () -> HttpTransport
+        """
+        Gets the transport used for communication with the Eyes server.
+        """
+        return self._agent_connector.transport
+
+    @transport.setter
+    def transport(self, transport):
+        # type: (HttpTransport) -> None
+        """
+        Sets the transport used for communication with the Eyes server, which several Eyes
+        instances may share (e.g. to share its connection pool). The transport is closed by its owner.
+        """
+        if self._owns_transport and transport is not self._agent_connector.transport:
+            self._agent_connector.transport.close()
+        self._agent_connector.transport = transport
+        self._owns_transport = False
+
+    @property
+    def connection_stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the number of requests sent to the Eyes server and the number of connections
+        which were opened and reused to send them.
+        """
+        return self._agent_connector.connection_stats
+
+    @property
+    def polling_strategy(self):
+        # type: () -> PollingStrategy
+        """
+        Gets the strategy of polling long running server tasks (delays, time budget, jitter).
+        """
+        return self._agent_connector.polling_strategy
+
+    @polling_strategy.setter
+    def polling_strategy(self, strategy):
+        # type: (PollingStrategy) -> None
+        self._agent_connector.polling_strategy = strategy
+
+    @property
+    def polling_stats(self):
+        # type: () -> tp.Dict[tp.Text, tp.Dict[tp.Text, tp.Any]]
+        """
+        Returns per-endpoint histograms of the number of polls and the latency of long server tasks.
+        """
+        return self._agent_connector.polling_stats
+
+    @property
+    def deduplicate_uploads(self):
+        # type: () -> bool
+        """
+        Gets whether screenshots and DOMs identical to ones already uploaded by the process reuse their url.
+        """
+        return self._agent_connector.deduplicate_uploads
+
+    @deduplicate_uploads.setter
+    def deduplicate_uploads(self, value):
+        # type: (bool) -> None
+        self._agent_connector.deduplicate_uploads = value
+
+    @property
+    def upload_dedup_stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the hits, misses and bytes saved by upload deduplication, for the whole process.
+        """
+        return self._agent_connector.upload_dedup_stats
+
+    @property
+    def render_info_stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the hit/miss statistics of the render info cache shared by all Eyes instances.
+        """
+        return self._agent_connector.render_info_stats
+
+    @property
+    def upload_pipeline(self):
+        # type: () -> UploadPipeline
+        """
+        Gets the pipeline used when pipeline_uploads is enabled. Its `workers` and
+        `max_in_flight_bytes` can be changed before the first check.
+        """
+        return self._upload_pipeline
+
     @property
     def full_agent_id(self):
         # type: () -> tp.Text
@@ -388,6 +523,7 @@ class EyesBase(ABC):
         """
         return self._is_open
 
+    @tracing.traced('close')
     def close(self, raise_ex=True):
         # type: (bool) -> tp.Optional[TestResults]
         """
@@ -398,12 +534,17 @@ class EyesBase(ABC):
         """
         if self.is_disabled:
             logger.debug('close(): ignored (disabled)')
+            self._close_logger()
             return None
         try:
             logger.debug('close({})'.format(raise_ex))
             if not self._is_open:
                 raise ValueError("Eyes not open")
 
+            failed_match_results = self._drain_before_close(raise_ex)
+            if failed_match_results is not None:
+                return failed_match_results
+
             self._is_open = False
 
             self._reset_last_screenshot()
@@ -455,7 +596,47 @@ class EyesBase(ABC):
             return results
         finally:
             self._running_session = None
-            logger.close()
+            self._close_resources()
+            self._close_logger()
+
+    def _drain_before_close(self, raise_ex):
+        # type: (bool) -> tp.Optional[TestResults]
+        """
+        Waits for the background matches of the test being closed. If one of them failed, the
+        session is aborted.
+
+        :raise: The error of the failed match, if raise_ex is True.
+        :return: None if all the matches completed, or else the results of the aborted session.
+        """
+        try:
+            self._drain_upload_pipeline()
+        except Exception as e:
+            return self._abort_after_failed_match(e, raise_ex)
+        return None
+
+    def _abort_after_failed_match(self, error, raise_ex):
+        # type: (Exception, bool) -> TestResults
+        """
+        Aborts the session of close, since a background match of it failed.
+
+        :raise: error, if raise_ex is True.
+        :return: The results of the aborted session, as failed.
+        """
+        logger.info("close(): A background match failed: {!r}. Aborting server session...".format(error))
+        self._is_open = False
+        self._reset_last_screenshot()
+        results = TestResults()
+        if self._running_session:
+            try:
+                results = self._agent_connector.stop_session(self._running_session, True, False)
+                results.url = self._running_session['session_url']
+                logger.info('--- Test aborted.')
+            except EyesError as e:
+                logger.info("Failed to abort server session: %s " % e)
+        if raise_ex:
+            raise error
+        results.status = TestResultsStatus.Failed
+        return results
 
     def abort_if_not_closed(self):
         # type: () -> None
@@ -464,6 +645,7 @@ class EyesBase(ABC):
         """
         if self.is_disabled:
             logger.debug('abort_if_not_closed(): ignored (disabled)')
+            self._close_logger()
             return
         try:
             self._reset_last_screenshot()
@@ -479,7 +661,47 @@ class EyesBase(ABC):
                 finally:
                     self._running_session = None
         finally:
-            logger.close()
+            self._close_resources()
+            self._close_logger()
+
+    def _close_resources(self):
+        # type: () -> None
+        """
+        Releases the resources held for the test, once it is closed or aborted.
+        """
+        self._upload_pipeline.close()
+        self.png_encoder.close()
+
+    def _drain_upload_pipeline(self):
+        # type: () -> None
+        """
+        Waits for the background matches and handles their results, in the order of the checks.
+
+        :raise: The exception of the first failed match, after all the matches completed.
+        """
+        error = None
+        for handle in self._upload_pipeline.drain():
+            if handle.exception() is not None:
+                error = error or handle.exception()
+                continue
+            self._handle_match_result(handle.result(), handle.tag)
+        if error is not None:
+            raise error
+
+    def _open_logger(self, test_name):
+        # type: (tp.Text) -> None
+        """
+        Starts logging the records of the current thread for the test being opened.
+        """
+        self._close_logger()
+        self._log_context = logger.LogContext(test_name)
+        logger.open_(self._log_context)
+
+    def _close_logger(self):
+        # type: () -> None
+        if self._log_context is not None:
+            logger.close(self._log_context)
+            self._log_context = None
 
     def _before_open(self):
         pass
@@ -500,7 +722,8 @@ class EyesBase(ABC):
         :return: An updated web driver
         :raise EyesError: If the session was already open.
         """
-        logger.open_()
+        if self._log_context is None:
+            self._open_logger(test_name)
         if self.is_disabled:
             logger.debug('_open_base(): ignored (disabled)')
             return
@@ -586,25 +809,44 @@ class EyesBase(ABC):
         """
 
     def _check_window_base(self, tag=None, match_timeout=-1, target=None):
+        # type: (tp.Optional[tp.Text], int, tp.Optional[Target]) -> tp.Optional[MatchHandle]
         if self.is_disabled:
             logger.info("check_window(%s): ignored (disabled)" % tag)
-            # TODO: create propper MatchResult class
-            result = {"as_expected": True, "screenshot": None}
-            return result
+            return None
+        if self.pipeline_uploads and self.failure_reports == FailureReports.IMMEDIATE:
+            raise EyesError("Mismatches of background matches can't be reported immediately. "
+                            "Set failure_reports to FailureReports.ON_CLOSE or disable pipeline_uploads.")
 
         self._ensure_running_session()
 
         self._before_match_window()
+        try:
+            if self.pipeline_uploads:
+                handle = self._match_window_task.match_window_in_background(
+                    self._upload_pipeline,
+                    retry_timeout=match_timeout,
+                    tag=tag,
+                    user_inputs=self._user_inputs,
+                    default_match_settings=self.default_match_settings,
+                    target=target,
+                    run_once_after_wait=self._should_match_once_on_timeout)
+            else:
+                # TODO: implement MatchWIndow_ analog
+                result = self._match_window_task.match_window(
+                    retry_timeout=match_timeout,
+                    tag=tag,
+                    user_inputs=self._user_inputs,
+                    default_match_settings=self.default_match_settings,
+                    target=target,
+                    run_once_after_wait=self._should_match_once_on_timeout)
+        finally:
+            # Runs even if the check failed, so the per-check state is always cleaned up.
+            self._after_match_window()
 
-        # TODO: implement MatchWIndow_ analog
-
-        result = self._match_window_task.match_window(retry_timeout=match_timeout,
-                                                      tag=tag,
-                                                      user_inputs=self._user_inputs,
-                                                      default_match_settings=self.default_match_settings,
-                                                      target=target,
-                                                      run_once_after_wait=self._should_match_once_on_timeout)
-        self._after_match_window()
+        if self.pipeline_uploads:
+            self._last_screenshot = self._match_window_task._last_screenshot
+            self._user_inputs = []
+            return handle
         self._handle_match_result(result, tag)
 
     def _handle_match_result(self, result, tag):
@@ -623,13 +865,14 @@ class EyesBase(ABC):
 
     @abc.abstractmethod
     def _try_capture_dom(self):
-        # type: () -> tp.Text
+        # type: () -> tp.Union[tp.Text, GzipSpool, None]
         """
-        Returns the string with DOM of the current page in the prepared format or empty string
+        Returns the string with DOM of the current page in the prepared format (or the stream it
+        was compressed into) or empty string
         """
 
     def _try_post_dom_capture(self, dom_json):
-        # type: (tp.Text) -> tp.Optional[tp.Text]
+        # type: (tp.Union[tp.Text, GzipSpool, None]) -> tp.Optional[tp.Text]
         """
         In case DOM data is valid uploads it to the server and return URL where it stored.
         """
@@ -640,3 +883,6 @@ class EyesBase(ABC):
         except Exception as e:
             logger.warning("Couldn't send DOM Json. Passing...\n Got next error: {}".format(e))
             return None
+        finally:
+            if isinstance(dom_json, GzipSpool):
+                dom_json.close()
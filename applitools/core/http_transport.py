@@ -0,0 +1,209 @@
+"""
+Connection-pooled HTTP transport used for communication with the Eyes server.
+"""
+from __future__ import absolute_import
+
+import threading
+import typing as tp
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from applitools.utils.compat import urlparse
+
+if tp.TYPE_CHECKING:
+    from requests.models import Response
+
+__all__ = ('ConnectionSettings', 'HttpTransport')
+
+
+class ConnectionSettings(object):
+    """
+    Encapsulates the settings of the connection pool used for talking to the Eyes server.
+    """
+
+    def __init__(self,
+                 pool_connections=10,  # type: int
+                 pool_maxsize=10,  # type: int
+                 per_host_pool_maxsize=None,  # type: tp.Optional[tp.Dict[tp.Text, int]]
+                 keep_alive=True,  # type: bool
+                 proxies=None,  # type: tp.Optional[tp.Dict[tp.Text, tp.Text]]
+                 pool_block=False,  # type: bool
+                 ):
+        # type: (...) -> None
+        """
+        :param pool_connections: The number of per-host connection pools to keep.
+        :param pool_maxsize: The maximum number of connections kept open to a single host.
+        :param per_host_pool_maxsize: Overrides pool_maxsize for specific hosts, e.g.
+            {'https://eyesapi.applitools.com': 20}.
+        :param keep_alive: If False, every request asks the server to close the connection.
+        :param proxies: Proxies to use, in the format of `requests`, e.g.
+            {'https': 'http://proxy:3128'}. None means to use environment settings.
+        :param pool_block: Whether to block when no free connection is available in the pool.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.per_host_pool_maxsize = per_host_pool_maxsize or {}
+        self.keep_alive = keep_alive
+        self.proxies = proxies
+        self.pool_block = pool_block
+
+    def __str__(self):
+        return "[pool connections: %d, pool maxsize: %d, per host: %s, keep alive: %s, proxies: %s]" % (
+            self.pool_connections, self.pool_maxsize, self.per_host_pool_maxsize, self.keep_alive, self.proxies)
+
+
+class _ConnectionStats(object):
+    """
+    Thread-safe counters of requests sent and sockets opened by a transport.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def on_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def on_new_connection(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        with self._lock:
+            return dict(requests=self.requests,
+                        connections_opened=self.connections_opened,
+                        connections_reused=max(0, self.requests - self.connections_opened))
+
+
+def _counting_pool_classes(stats):
+    # type: (_ConnectionStats) -> tp.Dict[tp.Text, type]
+    """
+    Returns urllib3 pool classes which report every newly opened socket to stats.
+    """
+
+    class _CountingHTTPConnection(HTTPConnectionPool.ConnectionCls):
+        def _new_conn(self):
+            stats.on_new_connection()
+            return super(_CountingHTTPConnection, self)._new_conn()
+
+    class _CountingHTTPSConnection(HTTPSConnectionPool.ConnectionCls):
+        def _new_conn(self):
+            stats.on_new_connection()
+            return super(_CountingHTTPSConnection, self)._new_conn()
+
+    class _CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = _CountingHTTPConnection
+
+    class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = _CountingHTTPSConnection
+
+    return {'http': _CountingHTTPConnectionPool, 'https': _CountingHTTPSConnectionPool}
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    def __init__(self, stats, **kwargs):
+        self._stats = stats
+        super(_CountingHTTPAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(_CountingHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self._stats)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super(_CountingHTTPAdapter, self).proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = _counting_pool_classes(self._stats)
+        return manager
+
+
+class HttpTransport(object):
+    """
+    A thread-safe, connection-pooled replacement of the module-level `requests` functions.
+
+    The adapters (and so the connection pools) are shared by all threads, while every thread
+    gets its own `requests.Session` since sessions are not guaranteed to be thread-safe.
+    """
+
+    def __init__(self, settings=None):
+        # type: (tp.Optional[ConnectionSettings]) -> None
+        self.settings = settings or ConnectionSettings()
+        self._stats = _ConnectionStats()
+        self._local = threading.local()
+        self._adapters = {}  # type: tp.Dict[tp.Text, HTTPAdapter]
+        for prefix in ('https://', 'http://'):
+            self._adapters[prefix] = self._create_adapter(self.settings.pool_maxsize)
+        for host, maxsize in self.settings.per_host_pool_maxsize.items():
+            self._adapters[self._host_prefix(host)] = self._create_adapter(maxsize)
+
+    @staticmethod
+    def _host_prefix(host):
+        # type: (tp.Text) -> tp.Text
+        if not urlparse(host).scheme:
+            host = 'https://' + host
+        return host.rstrip('/') + '/'
+
+    def _create_adapter(self, maxsize):
+        # type: (int) -> HTTPAdapter
+        return _CountingHTTPAdapter(self._stats,
+                                    pool_connections=self.settings.pool_connections,
+                                    pool_maxsize=maxsize,
+                                    pool_block=self.settings.pool_block)
+
+    @property
+    def session(self):
+        # type: () -> requests.Session
+        """
+        Returns the session of the current thread.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            for prefix, adapter in self._adapters.items():
+                session.mount(prefix, adapter)
+            if self.settings.proxies is not None:
+                session.proxies.update(self.settings.proxies)
+            if not self.settings.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        # type: (tp.Text, tp.Text, **tp.Any) -> Response
+        self._stats.on_request()
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        # type: (tp.Text, **tp.Any) -> Response
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        # type: (tp.Text, **tp.Any) -> Response
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        # type: (tp.Text, **tp.Any) -> Response
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        # type: (tp.Text, **tp.Any) -> Response
+        return self.request('DELETE', url, **kwargs)
+
+    @property
+    def connection_stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the number of requests sent, sockets opened and connections reused so far.
+        """
+        return self._stats.as_dict()
+
+    def close(self):
+        # type: () -> None
+        """
+        Closes all pooled connections.
+        """
+        for adapter in self._adapters.values():
+            adapter.close()
@@ -1,29 +1,143 @@
 """
 Logs handling.
+
+The logger set by set_logger is shared by the whole process, and stays open until another one is
+set. Every record is stamped with the LogContext of the session it's logged for, which is local to
+the thread (or context) running the session, so concurrent sessions can tell their records apart.
 """
 from __future__ import absolute_import
 
 import os
 import sys
+import uuid
 import logging
+import threading
 import warnings
 import functools
+import contextlib
 import datetime as dt
 import typing as tp
 
 from applitools.utils.compat import ABC
 
+try:
+    import contextvars
+except ImportError:  # Python < 3.7
+    contextvars = None  # type: ignore
+
 if tp.TYPE_CHECKING:
     from PIL import Image
     from ..core.geometry import Region
 
 _DEFAULT_EYES_LOGGER_NAME = 'eyes'
-_DEFAULT_EYES_FORMATTER = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+_DEFAULT_EYES_FORMATTER = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(eyes_context)s%(message)s')
 _DEFAULT_LOGGER_LEVEL = int(os.environ.get('LOGGER_LEVEL', logging.INFO))
 _DEBUG_SCREENSHOT_PREFIX = os.environ.get('DEBUG_SCREENSHOT_PREFIX', 'screenshot_')
 _DEBUG_SCREENSHOT_PATH = os.environ.get('DEBUG_SCREENSHOT_PATH', '.')
 
-__all__ = ('StdoutLogger', 'FileLogger', 'NullLogger')
+__all__ = ('StdoutLogger', 'FileLogger', 'NullLogger', 'LogContext')
+
+
+class LogContext(object):
+    """
+    The session records are logged for. Records get its id and test name as their
+    `eyes_session_id` and `eyes_test_name` attributes, and both as `eyes_context`.
+    """
+
+    def __init__(self, test_name=None, session_id=None):
+        # type: (tp.Optional[tp.Text], tp.Optional[tp.Text]) -> None
+        self.test_name = test_name
+        self.session_id = session_id or uuid.uuid4().hex[:8]
+
+    @property
+    def record_attributes(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        return dict(eyes_context='[{}] '.format(self), eyes_session_id=self.session_id,
+                    eyes_test_name=self.test_name)
+
+    def __str__(self):
+        if self.test_name is None:
+            return self.session_id
+        return '{} {}'.format(self.session_id, self.test_name)
+
+
+if contextvars is not None:
+    _current_context = contextvars.ContextVar('eyes_log_context', default=None)
+
+    def get_context():
+        # type: () -> tp.Optional[LogContext]
+        """
+        Returns the context of the records logged by the current thread (or context), if any.
+        """
+        return _current_context.get()
+
+    def _set_context(context):
+        # type: (tp.Optional[LogContext]) -> None
+        _current_context.set(context)
+else:
+    _local = threading.local()
+
+    def get_context():
+        # type: () -> tp.Optional[LogContext]
+        """
+        Returns the context of the records logged by the current thread, if any.
+        """
+        return getattr(_local, 'context', None)
+
+    def _set_context(context):
+        # type: (tp.Optional[LogContext]) -> None
+        _local.context = context
+
+
+@contextlib.contextmanager
+def context(log_context):
+    # type: (tp.Optional[LogContext]) -> tp.Generator
+    """
+    Logs the records of the block in log_context.
+    """
+    previous = get_context()
+    _set_context(log_context)
+    try:
+        yield log_context
+    finally:
+        _set_context(previous)
+
+
+def bind_context(func):
+    # type: (tp.Callable) -> tp.Callable
+    """
+    Returns func, to be called on another thread (e.g. of a pool), logging in the context of the
+    calling thread.
+    """
+    log_context = get_context()
+    if log_context is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with context(log_context):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class _ContextFilter(logging.Filter):
+    """
+    Stamps every record written by a handler with the current LogContext, including records which
+    weren't logged by the SDK (e.g. of other loggers sharing the handler), so the formatter can
+    always refer to the context attributes.
+    """
+
+    def filter(self, record):
+        # type: (logging.LogRecord) -> bool
+        log_context = get_context()
+        if log_context is not None:
+            attributes = log_context.record_attributes
+        else:
+            attributes = dict(eyes_context='', eyes_session_id=None, eyes_test_name=None)
+        for name, value in attributes.items():
+            setattr(record, name, value)
+        return True
 
 
 class _Logger(ABC):
@@ -66,6 +180,7 @@ class _Logger(ABC):
             # Setting formatter
             if self._formatter is not None:
                 self._handler.setFormatter(self._formatter)
+            self._handler.addFilter(_ContextFilter())
             self._logger.addHandler(self._handler)
 
     def close(self):
@@ -81,6 +196,17 @@ class _Logger(ABC):
             self._logger = None
             self._handler = None
 
+    def is_enabled_for(self, level):
+        # type: (int) -> bool
+        """
+        Returns whether the logger is open and writes messages of level.
+        """
+        return self._logger is not None and level >= self._level
+
+    def _log(self, level, msg):
+        # type: (int, tp.Text) -> None
+        self._logger.log(level, msg)
+
     def info(self, msg):
         # type: (tp.Text) -> None
         """
@@ -89,7 +215,7 @@ class _Logger(ABC):
         :param msg: The message that will be written to the logger.
         """
         if self._logger:
-            self._logger.info(msg)
+            self._log(logging.INFO, msg)
 
     def debug(self, msg):
         # type: (tp.Text) -> None
@@ -99,7 +225,7 @@ class _Logger(ABC):
         :param msg: The message that will be written to the logger.
         """
         if self._logger:
-            self._logger.debug(msg)
+            self._log(logging.DEBUG, msg)
 
 
 class StdoutLogger(_Logger):
@@ -155,65 +281,91 @@ class NullLogger(_Logger):
         super(NullLogger, self).__init__(name, level)
 
 
-# This will be set by the user.
-_logger_to_use = None  # type: tp.Optional[_Logger]
-# Holds the actual logger after open is called.
+# The logger set by the user, open until another one is set.
 _logger = None  # type: tp.Optional[_Logger]
+_lock = threading.Lock()
 
 
 def set_logger(logger=None):
     # type: (tp.Optional[_Logger]) -> None
     """
-    Sets the used logger to the logger.
+    Sets the used logger to the logger, closing the previous one.
 
     :param logger: The logger to use.
     """
-    global _logger_to_use
-    _logger_to_use = logger
+    global _logger
+    with _lock:
+        if logger is _logger:
+            return
+        if _logger is not None:
+            _logger.close()
+        _logger = logger
+        if _logger is not None:
+            _logger.open()
+
+
+def open_(log_context=None):
+    # type: (tp.Optional[LogContext]) -> None
+    """
+    Starts logging the records of the current thread (or context) in log_context, e.g. of a session
+    opened on it. The logger itself is already open.
+    """
+    if log_context is not None:
+        _set_context(log_context)
 
 
-def open_():
-    # type: () -> None
+def close(log_context=None):
+    # type: (tp.Optional[LogContext]) -> None
     """
-    Opens a new logger.
+    Stops logging the records of the current thread in log_context, unless it's in another one by now.
     """
-    global _logger
-    _logger = _logger_to_use
-    if _logger is not None:
-        _logger.open()
+    if log_context is not None and get_context() is log_context:
+        _set_context(None)
 
 
-def close():
-    # type: () -> None
+def is_enabled_for(level):
+    # type: (int) -> bool
     """
-    Closed the logger.
+    Returns whether messages of level are written, so that costly log messages can be skipped
+    altogether when they aren't.
     """
-    global _logger
-    if _logger is not None:
-        _logger.close()
-        _logger = None
+    logger = _logger
+    return logger is not None and logger.is_enabled_for(level)
 
 
-def info(msg):
-    # type: (tp.Text) -> None
+def _format(msg, args, kwargs):
+    # type: (tp.Union[tp.Text, tp.Callable[[], tp.Text]], tp.Tuple, tp.Dict[tp.Text, tp.Any]) -> tp.Text
+    if callable(msg):
+        msg = msg()
+    return msg.format(*args, **kwargs) if args or kwargs else msg
+
+
+def info(msg, *args, **kwargs):
+    # type: (tp.Union[tp.Text, tp.Callable[[], tp.Text]], *tp.Any, **tp.Any) -> None
     """
-    Writes info level msg to the logger.
+    Writes info level msg to the logger. msg may be a callable returning the message, and given
+    args or kwargs, it's formatted with them (as by str.format). Either way, it's built only if the
+    logger writes info messages.
 
     :param msg: The message that will be written to the log.
     """
-    if _logger is not None:
-        _logger.info(msg)
+    logger = _logger
+    if logger is not None and logger.is_enabled_for(logging.INFO):
+        logger.info(_format(msg, args, kwargs))
 
 
-def debug(msg):
-    # type: (tp.Text) -> None
+def debug(msg, *args, **kwargs):
+    # type: (tp.Union[tp.Text, tp.Callable[[], tp.Text]], *tp.Any, **tp.Any) -> None
     """
-    Writes debug level msg to the logger.
+    Writes debug level msg to the logger. msg may be a callable returning the message, and given
+    args or kwargs, it's formatted with them (as by str.format). Either way, it's built only if the
+    logger writes debug messages, so disabled debug messages cost next to nothing.
 
     :param msg: The message that will be written to the log.
     """
-    if _logger is not None:
-        _logger.debug(msg)
+    logger = _logger
+    if logger is not None and logger.is_enabled_for(logging.DEBUG):
+        logger.debug(_format(msg, args, kwargs))
 
 
 def warning(msg):
@@ -235,7 +387,7 @@ def save_screenshot(image, suffix, region=None):
     """
     A debug screenshot provider for saving screenshots to file.
     """
-    if _logger and _logger._level == logging.DEBUG:
+    if is_enabled_for(logging.DEBUG):
         if region:
             suffix = 'part-{suffix}-{left}_{top}_{width}x{height}'.format(
                 suffix=suffix, left=region.left, top=region.top,
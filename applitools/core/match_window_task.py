@@ -1,12 +1,13 @@
 from __future__ import absolute_import
 
 import functools
+import logging
 import time
 import typing as tp
 from struct import pack
 
 # noinspection PyProtectedMember
-from ..utils import general_utils
+from ..utils import general_utils, image_utils
 from . import logger
 from .errors import OutOfBoundsError, EyesError
 from .geometry import Region
@@ -19,6 +20,7 @@ if tp.TYPE_CHECKING:
     from .agent_connector import AgentConnector
     from .eyes_base import ImageMatchSettings
     from .capture import EyesScreenshot
+    from .upload_pipeline import MatchHandle, UploadPipeline
 
 __all__ = ('MatchWindowTask',)
 
@@ -30,6 +32,7 @@ class MatchWindowTask(object):
     Handles matching of output with the expected output (including retry and 'ignore mismatch' when needed).
     """
     _MATCH_INTERVAL = 0.5
+    _STABILIZATION_INTERVAL = 0.2  # Seconds
 
     MINIMUM_MATCH_TIMEOUT = 60  # Milliseconds
 
@@ -48,6 +51,9 @@ class MatchWindowTask(object):
         self._running_session = running_session
         self._default_retry_timeout = default_retry_timeout / 1000.0  # type: Num # since we want the time in seconds.
         self._last_screenshot = None  # type: tp.Optional[EyesScreenshot]
+        self._last_fingerprint = None  # type: tp.Optional[image_utils.ImageFingerprint]
+        # The number of retries skipped since the screenshot didn't change.
+        self.skipped_matches = 0
 
     def _create_match_data_bytes(self,
                                  app_output,  # type: AppOutput
@@ -69,7 +75,8 @@ class MatchWindowTask(object):
             from applitools.selenium.target import Target  # noqa
             target = Target()
 
-        screenshot_url =  self._agent_connector._try_upload_data(screenshot.get_bytes(), "image/png", "image/png")
+        screenshot_bytes = screenshot.get_bytes(self._eyes.png_encoder)
+        screenshot_url = self._agent_connector._try_upload_data(screenshot_bytes, "image/png", "image/png")
         if screenshot_url is None:
             raise EyesError(
                 "MatchWindow failed: could not upload image to storage service."
@@ -124,32 +131,96 @@ class MatchWindowTask(object):
                                                                                                        err))
         return {"ignore": ignore, "floating": floating}
 
-    def _prepare_match_data_for_window(self, tag,  # type: tp.Text
+    def _wait_until_stable(self, screenshot, fingerprint):
+        # type: (EyesScreenshot, image_utils.ImageFingerprint) -> tp.Tuple[EyesScreenshot, image_utils.ImageFingerprint]
+        """
+        Retakes the screenshot until two consecutive ones are identical or the stabilization timeout expires.
+        """
+        timeout = self._eyes.stabilization_timeout / 1000.0
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            time.sleep(self._STABILIZATION_INTERVAL)
+            next_screenshot = self._eyes.get_screenshot(hide_scrollbars_called=True)
+            next_fingerprint = image_utils.get_fingerprint(next_screenshot._screenshot)
+            if next_fingerprint == fingerprint:
+                logger.debug("Screenshot is stable.")
+                return next_screenshot, next_fingerprint
+            if logger.is_enabled_for(logging.DEBUG):
+                logger.debug("Screenshot changed (distance: {}). Waiting for it to stabilize...",
+                             next_fingerprint.distance(fingerprint))
+            screenshot, fingerprint = next_screenshot, next_fingerprint
+        logger.debug("Screenshot didn't stabilize within {} seconds.", timeout)
+        return screenshot, fingerprint
+
+    def _capture_window(self, target, skip_if_unchanged=False, stabilize=False, track_changes=False):
+        # type: (tp.Optional[Target], bool, bool, bool) -> tp.Optional[tp.Dict[tp.Text, tp.Any]]
+        """
+        Takes everything the match needs from the browser: the screenshot, the regions and the DOM.
+
+        :param skip_if_unchanged: If True, returns None when the screenshot is identical to the last one taken.
+        :param stabilize: If True, waits until the screenshot stops changing (see `stabilization_timeout`).
+        :param track_changes: If True, the screenshot is remembered for a later capture to skip if it's unchanged.
+            Implied by skip_if_unchanged.
+        """
+        title = self._eyes._title
+        track_changes = track_changes or skip_if_unchanged
+        stabilize = stabilize and self._eyes.stabilization_timeout > 0
+
+        with self._eyes._hide_scrollbars_if_needed():
+            screenshot = self._eyes.get_screenshot(hide_scrollbars_called=True)
+            # Fingerprinting is a full pass over the image, so it's only done if something compares it.
+            if track_changes or stabilize:
+                fingerprint = image_utils.get_fingerprint(screenshot._screenshot)
+                if stabilize:
+                    screenshot, fingerprint = self._wait_until_stable(screenshot, fingerprint)
+                if skip_if_unchanged and fingerprint == self._last_fingerprint:
+                    return None
+                if track_changes:
+                    self._last_fingerprint = fingerprint
+            dynamic_regions = MatchWindowTask._get_dynamic_regions(target, screenshot)
+        dom_json = None
+        if self._eyes.send_dom or (target and target._send_dom):
+            dom_json = self._eyes._try_capture_dom()
+        return dict(title=title, screenshot=screenshot, dom_json=dom_json, **dynamic_regions)
+
+    def _create_match_data_for_capture(self, capture,  # type: tp.Dict[tp.Text, tp.Any]
+                                       tag,  # type: tp.Text
                                        user_inputs,  # type: UserInputs
                                        default_match_settings,  # type: ImageMatchSettings
                                        target,  # type: Target
                                        ignore_mismatch=False):
         # type: (...) -> bytes
-        title = self._eyes._title
-
-        with self._eyes._hide_scrollbars_if_needed():
-            self._last_screenshot = self._eyes.get_screenshot(hide_scrollbars_called=True)
-            dynamic_regions = MatchWindowTask._get_dynamic_regions(target, self._last_screenshot)
-        app_output = {'title': title, 'screenshot64': None}  # type: AppOutput
+        """
+        Uploads the captured data and creates the match data. Doesn't access the browser.
+        """
+        app_output = {'title': capture['title'], 'screenshot64': None}  # type: AppOutput
+        if capture['dom_json']:
+            dom_url = self._eyes._try_post_dom_capture(capture['dom_json'])
+            if dom_url is None:
+                logger.warning('Failed to upload DOM. Skipping...')
+            else:
+                app_output['DomUrl'] = dom_url
 
-        if self._eyes.send_dom or (target and target._send_dom):
-            dom_json = self._eyes._try_capture_dom()
-            if dom_json:
-                dom_url = self._eyes._try_post_dom_capture(dom_json)
-                if dom_url is None:
-                    logger.warning('Failed to upload DOM. Skipping...')
-                else:
-                    app_output['DomUrl'] = dom_url
-
-        logger.debug('AppOutput: {}'.format(app_output))
+        logger.debug('AppOutput: {}', app_output)
         return self._create_match_data_bytes(app_output, user_inputs, tag, ignore_mismatch,
-                                             self._last_screenshot, default_match_settings, target,
-                                             dynamic_regions['ignore'], dynamic_regions['floating'])
+                                             capture['screenshot'], default_match_settings, target,
+                                             capture['ignore'], capture['floating'])
+
+    def _prepare_match_data_for_window(self, tag,  # type: tp.Text
+                                       user_inputs,  # type: UserInputs
+                                       default_match_settings,  # type: ImageMatchSettings
+                                       target,  # type: Target
+                                       ignore_mismatch=False,
+                                       skip_if_unchanged=False,
+                                       stabilize=False,
+                                       track_changes=False):
+        # type: (...) -> tp.Optional[bytes]
+        capture = self._capture_window(target, skip_if_unchanged, stabilize, track_changes)
+        if capture is None:
+            return None
+        self._last_screenshot = capture['screenshot']
+        return self._create_match_data_for_capture(capture, tag, user_inputs, default_match_settings,
+                                                   target, ignore_mismatch)
 
     def _run_with_intervals(self, prepare_action, retry_timeout):
         # type: (tp.Callable, Num) -> MatchResult
@@ -159,7 +230,7 @@ class MatchWindowTask(object):
         logger.debug('Matching with intervals...')
         # We intentionally take the first screenshot before starting the timer, to allow the page
         # just a tad more time to stabilize.
-        data = prepare_action(ignore_mismatch=True)
+        data = prepare_action(ignore_mismatch=True, stabilize=True, track_changes=True)
         # Start the timer.
         start = time.time()
         logger.debug('First match attempt...')
@@ -167,45 +238,55 @@ class MatchWindowTask(object):
         if as_expected:
             return {"as_expected": True, "screenshot": self._last_screenshot}
         retry = time.time() - start
-        logger.debug("Failed. Elapsed time: {0:.1f} seconds".format(retry))
+        logger.debug("Failed. Elapsed time: {0:.1f} seconds", retry)
 
         while retry < retry_timeout:
             logger.debug('Matching...')
             time.sleep(self._MATCH_INTERVAL)
-            data = prepare_action(ignore_mismatch=True)
-            as_expected = self._agent_connector.match_window(self._running_session, data)
-            if as_expected:
-                return {"as_expected": True, "screenshot": self._last_screenshot}
+            data = prepare_action(ignore_mismatch=True, skip_if_unchanged=True)
+            if data is None:
+                # The server has already rejected this very screenshot.
+                logger.debug('Screenshot unchanged. Skipping...')
+                self.skipped_matches += 1
+            else:
+                as_expected = self._agent_connector.match_window(self._running_session, data)
+                if as_expected:
+                    return {"as_expected": True, "screenshot": self._last_screenshot}
             retry = time.time() - start
-            logger.debug("Elapsed time: {0:.1f} seconds".format(retry))
+            logger.debug("Elapsed time: {0:.1f} seconds", retry)
         # One last try
         logger.debug('One last matching attempt...')
         data = prepare_action()
         as_expected = self._agent_connector.match_window(self._running_session, data)
         return {"as_expected": as_expected, "screenshot": self._last_screenshot}
 
-    def _run(self, prepare_action, run_once_after_wait=False, retry_timeout=-1):
-        # type: (tp.Callable, bool, Num) -> MatchResult
+    def _retry_timeout_in_seconds(self, retry_timeout):
+        # type: (Num) -> Num
         if 0 < retry_timeout < MatchWindowTask.MINIMUM_MATCH_TIMEOUT:
             raise ValueError("Match timeout must be at least 60ms, got {} instead.".format(retry_timeout))
         if retry_timeout < 0:
             retry_timeout = self._default_retry_timeout
         else:
             retry_timeout /= 1000.0
-        logger.debug("Match timeout set to: {0} seconds".format(retry_timeout))
+        logger.debug("Match timeout set to: {0} seconds", retry_timeout)
+        return retry_timeout
+
+    def _run(self, prepare_action, run_once_after_wait=False, retry_timeout=-1):
+        # type: (tp.Callable, bool, Num) -> MatchResult
+        retry_timeout = self._retry_timeout_in_seconds(retry_timeout)
         start = time.time()
         if run_once_after_wait or retry_timeout == 0:
             logger.debug("Matching once...")
             # If the load time is 0, the sleep would immediately return anyway.
             time.sleep(retry_timeout)
-            data = prepare_action()
+            data = prepare_action(stabilize=True)
             as_expected = self._agent_connector.match_window(self._running_session, data)
             result = {"as_expected": as_expected, "screenshot": self._last_screenshot}  # type: MatchResult
         else:
             result = self._run_with_intervals(prepare_action, retry_timeout)
-        logger.debug("Match result: {0}".format(result["as_expected"]))
+        logger.debug("Match result: {0}", result["as_expected"])
         elapsed_time = time.time() - start
-        logger.debug("_run(): Completed in {0:.1f} seconds".format(elapsed_time))
+        logger.debug("_run(): Completed in {0:.1f} seconds", elapsed_time)
         return result
 
     def match_window(self, retry_timeout,  # type: Num
@@ -229,3 +310,40 @@ class MatchWindowTask(object):
         prepare_action = functools.partial(self._prepare_match_data_for_window, tag,
                                            user_inputs, default_match_settings, target)
         return self._run(prepare_action, run_once_after_wait, retry_timeout)
+
+    def match_window_in_background(self, pipeline,  # type: UploadPipeline
+                                   retry_timeout,  # type: Num
+                                   tag,  # type: str
+                                   user_inputs,  # UserInputs
+                                   default_match_settings,  # type: ImageMatchSettings
+                                   target,  # type: tp.Optional[Target]
+                                   run_once_after_wait=False):
+        # type: (...) -> MatchHandle
+        """
+        Captures the window and leaves the encoding, the uploads and the match to the pipeline.
+        Since a retry requires a new capture, the window is matched once.
+
+        :param pipeline: The pipeline which runs the match.
+        :return: A handle of the match, which results in the same value as `match_window`.
+        """
+        retry_timeout = self._retry_timeout_in_seconds(retry_timeout)
+        if run_once_after_wait:
+            time.sleep(retry_timeout)
+        capture = self._capture_window(target, stabilize=True)
+        screenshot = capture['screenshot']
+        self._last_screenshot = screenshot
+        user_inputs = list(user_inputs)
+        image = screenshot._screenshot
+        size = image.width * image.height * len(image.getbands())
+
+        def upload():
+            return self._create_match_data_for_capture(capture, tag, user_inputs,
+                                                       default_match_settings, target)
+
+        def match(data):
+            # Matched in the order of the checks, so the steps line up with the baseline.
+            as_expected = self._agent_connector.match_window(self._running_session, data)
+            logger.debug("Background match result of '{}': {}", tag, as_expected)
+            return {"as_expected": as_expected, "screenshot": screenshot}
+
+        return pipeline.submit(upload, size, tag, ordered=match)
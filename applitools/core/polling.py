@@ -0,0 +1,174 @@
+"""
+Polling of long running server tasks (the `202 + Location` protocol of the Eyes server).
+"""
+from __future__ import absolute_import
+
+import math
+import random
+import threading
+import time
+import typing as tp
+from email.utils import parsedate_tz, mktime_tz
+
+from applitools.utils.metrics import Histogram
+from . import logger
+from .errors import EyesError
+
+if tp.TYPE_CHECKING:
+    from requests.models import Response
+
+__all__ = ('LongRequestTimeoutError', 'PollingStrategy', 'PollingStats')
+
+
+class LongRequestTimeoutError(EyesError):
+    """
+    Indicates that a long running server task didn't complete within the polling time budget.
+    """
+
+
+def _retry_after_seconds(response):
+    # type: (Response) -> tp.Optional[float]
+    """
+    Returns the delay requested by the `Retry-After` header (seconds or an HTTP date), if any.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - time.time())
+
+
+class PollingStats(object):
+    """
+    Per-endpoint histograms of the number of polls and of the total latency of long requests.
+    """
+    POLL_COUNT_BOUNDS = (0, 1, 2, 3, 5, 10, 20)
+    LATENCY_BOUNDS = (0.5, 1, 2, 5, 10, 30, 60, 120)  # Seconds
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._polls = {}  # type: tp.Dict[tp.Text, Histogram]
+        self._latencies = {}  # type: tp.Dict[tp.Text, Histogram]
+
+    def record(self, endpoint, polls, latency):
+        # type: (tp.Text, int, float) -> None
+        with self._lock:
+            if endpoint not in self._polls:
+                self._polls[endpoint] = Histogram(self.POLL_COUNT_BOUNDS)
+                self._latencies[endpoint] = Histogram(self.LATENCY_BOUNDS)
+            self._polls[endpoint].observe(polls)
+            self._latencies[endpoint].observe(latency)
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, tp.Dict[tp.Text, tp.Any]]
+        with self._lock:
+            return {endpoint: dict(polls=self._polls[endpoint].as_dict(),
+                                   latency=self._latencies[endpoint].as_dict())
+                    for endpoint in self._polls}
+
+
+class _Poll(object):
+    """
+    The polling state of a single long request.
+    """
+
+    def __init__(self, strategy, endpoint):
+        # type: (PollingStrategy, tp.Text) -> None
+        self._strategy = strategy
+        self.endpoint = endpoint
+        self.started_at = time.time()
+        self.polls = 0
+        self._delay_ms = strategy.initial_delay_ms  # type: float
+        self._retry_after = None  # type: tp.Optional[float]
+
+    def on_response(self, response):
+        # type: (Response) -> None
+        """
+        Takes note of the server's `Retry-After` hint, if the strategy honors it.
+        """
+        if self._strategy.honor_retry_after:
+            self._retry_after = _retry_after_seconds(response)
+
+    def next_delay(self):
+        # type: () -> float
+        """
+        Returns the number of seconds to wait before the next poll.
+
+        :raise LongRequestTimeoutError: If the next poll would exceed the time budget.
+        """
+        strategy = self._strategy
+        self._delay_ms = min(strategy.max_delay_ms,
+                             math.floor(self._delay_ms * strategy.multiplicative_increase_factor))
+        if self._retry_after is not None:
+            delay = self._retry_after
+        else:
+            delay = self._delay_ms / 1000.0
+            if strategy.jitter:
+                delay *= random.uniform(1 - strategy.jitter, 1 + strategy.jitter)
+        if strategy.timeout is not None:
+            remaining = self.started_at + strategy.timeout - time.time()
+            if remaining < delay:
+                raise LongRequestTimeoutError(
+                    "Long request to {} didn't complete within {} seconds ({} polls)".format(
+                        self.endpoint, strategy.timeout, self.polls))
+        self.polls += 1
+        return delay
+
+    def finish(self):
+        # type: () -> None
+        self._strategy.stats.record(self.endpoint, self.polls, time.time() - self.started_at)
+
+
+class PollingStrategy(object):
+    """
+    Decides how long to wait between the polls of a long running server task and when to give up.
+
+    The delay grows exponentially up to max_delay_ms and is randomized by +-jitter (a fraction)
+    so many clients don't poll in lockstep. A `Retry-After` returned by the server takes
+    precedence over the computed delay.
+    """
+    DEFAULT_TIMEOUT = 10 * 60  # Seconds
+
+    def __init__(self,
+                 initial_delay_ms=2000,  # type: float
+                 max_delay_ms=10000,  # type: float
+                 multiplicative_increase_factor=1.5,  # type: float
+                 timeout=DEFAULT_TIMEOUT,  # type: tp.Optional[float]
+                 jitter=0.1,  # type: float
+                 honor_retry_after=True,  # type: bool
+                 ):
+        # type: (...) -> None
+        """
+        :param initial_delay_ms: The delay the growth starts from.
+        :param max_delay_ms: The maximal delay between polls.
+        :param multiplicative_increase_factor: The factor the delay grows by after every poll.
+        :param timeout: The total time budget of a long request in seconds, None for no limit.
+        :param jitter: The fraction by which delays are randomized, 0 for no randomization.
+        :param honor_retry_after: Whether to wait as requested by the `Retry-After` header.
+        """
+        self.initial_delay_ms = initial_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.multiplicative_increase_factor = multiplicative_increase_factor
+        self.timeout = timeout
+        self.jitter = jitter
+        self.honor_retry_after = honor_retry_after
+        self.stats = PollingStats()
+
+    def begin(self, endpoint):
+        # type: (tp.Text) -> _Poll
+        """
+        Starts polling a long request of endpoint.
+        """
+        logger.debug("Long request of {} started".format(endpoint))
+        return _Poll(self, endpoint)
+
+    def __str__(self):
+        return "[delay: {}-{} ms x{}, timeout: {} s, jitter: {}, retry-after: {}]".format(
+            self.initial_delay_ms, self.max_delay_ms, self.multiplicative_increase_factor,
+            self.timeout, self.jitter, self.honor_retry_after)
@@ -0,0 +1,142 @@
+"""
+Process-wide cache of the render info returned by the Eyes server.
+"""
+from __future__ import absolute_import
+
+import base64
+import json
+import threading
+import time
+import typing as tp
+
+from . import logger
+
+__all__ = ('RenderInfoCache',)
+
+
+def _token_expiration(access_token):
+    # type: (tp.Optional[tp.Text]) -> tp.Optional[float]
+    """
+    Returns the expiration time (seconds since the epoch) of a JWT access token,
+    or None if the token doesn't carry one.
+    """
+    if not access_token:
+        return None
+    try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode('ascii')).decode('utf-8'))
+        return float(claims['exp'])
+    except Exception:
+        return None
+
+
+class _CacheEntry(object):
+    __slots__ = ('render_info', 'expires_at', 'lock')
+
+    def __init__(self, render_info=None, expires_at=0.0):
+        # type: (tp.Optional[tp.Dict], float) -> None
+        self.render_info = render_info
+        self.expires_at = expires_at
+        # Held while fetching the render info, so only one thread fetches per key.
+        self.lock = threading.Lock()
+
+
+class RenderInfoCache(object):
+    """
+    Keeps the render info per server and api key, so all Eyes instances in the process
+    share a single `renderinfo` round trip until the access token is about to expire.
+    """
+    DEFAULT_TTL = 10 * 60  # Seconds, used when the token expiration is unknown
+    REFRESH_MARGIN = 60  # Seconds before expiration in which the render info is refreshed
+
+    def __init__(self, default_ttl=DEFAULT_TTL, refresh_margin=REFRESH_MARGIN):
+        # type: (float, float) -> None
+        self.default_ttl = default_ttl
+        self.refresh_margin = refresh_margin
+        self._entries = {}  # type: tp.Dict[tp.Hashable, _CacheEntry]
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def _entry(self, key):
+        # type: (tp.Hashable) -> _CacheEntry
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _CacheEntry()
+            return entry
+
+    def _lookup(self, entry):
+        # type: (_CacheEntry) -> tp.Optional[tp.Dict]
+        with self._lock:
+            if entry.render_info is not None and time.time() < entry.expires_at - self.refresh_margin:
+                self._hits += 1
+                return entry.render_info
+        return None
+
+    def get(self, key, fetch):
+        # type: (tp.Hashable, tp.Callable[[], tp.Dict]) -> tp.Dict
+        """
+        Returns the cached render info for key, calling fetch if it is missing or about to expire.
+
+        :param key: The cache key (e.g., server url and api key).
+        :param fetch: A callable which retrieves fresh render info from the server.
+        """
+        entry = self._entry(key)
+        render_info = self._lookup(entry)
+        if render_info is not None:
+            return render_info
+        # Only one thread fetches per key, the others wait and reuse its result.
+        with entry.lock:
+            render_info = self._lookup(entry)
+            if render_info is not None:
+                return render_info
+            render_info = fetch()
+            expires_at = _token_expiration(render_info.get('accessToken'))
+            if expires_at is None:
+                expires_at = time.time() + self.default_ttl
+            with self._lock:
+                self._misses += 1
+                entry.render_info, entry.expires_at = render_info, expires_at
+                # The entry may have been invalidated during the fetch; a newer one is kept.
+                self._entries.setdefault(key, entry)
+            logger.debug("Render info cached until {}".format(expires_at))
+            return render_info
+
+    def invalidate(self, key, render_info=None):
+        # type: (tp.Hashable, tp.Optional[tp.Dict]) -> None
+        """
+        Drops the cached render info of key.
+
+        :param render_info: If given, the entry is dropped only if it is still the cached one,
+            so concurrent invalidations don't discard an already refreshed value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            # Entries still being fetched for the first time have nothing to drop.
+            if entry is None or entry.render_info is None:
+                return
+            if render_info is not None and entry.render_info is not render_info:
+                return
+            del self._entries[key]
+            self._invalidations += 1
+
+    def clear(self):
+        # type: () -> None
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the number of cache hits, misses (server round trips) and invalidations.
+        """
+        with self._lock:
+            return dict(hits=self._hits, misses=self._misses, invalidations=self._invalidations)
+
+
+# Shared by all the AgentConnector instances in the process.
+render_info_cache = RenderInfoCache()
@@ -0,0 +1,194 @@
+"""
+Tracing of the stages of the check pipeline (open, capture, stitching, upload, match, ...) as spans,
+which exporters (e.g. OpenTelemetry or Prometheus ones) subscribe to by adding a TraceHook.
+Without any hook, spans cost a single check and nothing is recorded.
+"""
+from __future__ import absolute_import
+
+import functools
+import threading
+import time
+import typing as tp
+
+from applitools.utils.compat import ABC
+from applitools.utils.metrics import Histogram
+from . import logger
+
+__all__ = ('Span', 'TraceHook', 'SpanHistogramHook', 'add_trace_hook', 'remove_trace_hook')
+
+# Replaced rather than mutated, so spans iterate over a consistent tuple without locking.
+_hooks = ()  # type: tp.Tuple[TraceHook, ...]
+_hooks_lock = threading.Lock()
+_local = threading.local()
+
+
+class Span(object):
+    """
+    A timed stage of the check pipeline.
+    """
+
+    def __init__(self, name, attributes, parent):
+        # type: (tp.Text, tp.Dict[tp.Text, tp.Any], tp.Optional[Span]) -> None
+        self.name = name
+        self.attributes = attributes
+        # The span this one started in, on the same thread.
+        self.parent = parent
+        self.start_time = time.time()
+        self.end_time = None  # type: tp.Optional[float]
+        # The exception the span ended with, if any.
+        self.error = None  # type: tp.Optional[BaseException]
+
+    @property
+    def duration(self):
+        # type: () -> float
+        """
+        The duration in seconds, up to now if the span didn't end yet.
+        """
+        return (self.end_time or time.time()) - self.start_time
+
+    def set_attribute(self, key, value):
+        # type: (tp.Text, tp.Any) -> None
+        self.attributes[key] = value
+
+    def __str__(self):
+        return "Span({}, {:.1f} ms)".format(self.name, self.duration * 1000)
+
+
+class TraceHook(ABC):
+    """
+    Receives the spans of the check pipeline. Hooks are called on the thread the span runs on,
+    and must be thread-safe. Exceptions raised by hooks are logged and ignored.
+    """
+
+    def on_start(self, span):
+        # type: (Span) -> None
+        pass
+
+    def on_end(self, span):
+        # type: (Span) -> None
+        pass
+
+
+class SpanHistogramHook(TraceHook):
+    """
+    Aggregates the durations of the spans into a histogram per span name, which can be exported
+    to Prometheus-style dashboards for per-stage percentiles.
+    """
+    DURATION_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # Seconds
+
+    def __init__(self, bounds=DURATION_BOUNDS):
+        # type: (tp.Sequence[float]) -> None
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self._durations = {}  # type: tp.Dict[tp.Text, Histogram]
+        self._errors = {}  # type: tp.Dict[tp.Text, int]
+
+    def on_end(self, span):
+        # type: (Span) -> None
+        with self._lock:
+            if span.name not in self._durations:
+                self._durations[span.name] = Histogram(self.bounds)
+                self._errors[span.name] = 0
+            self._durations[span.name].observe(span.duration)
+            if span.error is not None:
+                self._errors[span.name] += 1
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, tp.Dict[tp.Text, tp.Any]]
+        with self._lock:
+            return {name: dict(durations=histogram.as_dict(), errors=self._errors[name])
+                    for name, histogram in self._durations.items()}
+
+
+def add_trace_hook(hook):
+    # type: (TraceHook) -> None
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_trace_hook(hook):
+    # type: (TraceHook) -> None
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def _call_hooks(hooks, method, span):
+    # type: (tp.Tuple[TraceHook, ...], tp.Text, Span) -> None
+    for hook in hooks:
+        try:
+            getattr(hook, method)(span)
+        except Exception as e:
+            logger.debug("Trace hook {} failed on {}: {}".format(hook, span.name, e))
+
+
+class _SpanContext(object):
+    def __init__(self, hooks, name, attributes):
+        # type: (tp.Tuple[TraceHook, ...], tp.Text, tp.Dict[tp.Text, tp.Any]) -> None
+        self._hooks = hooks
+        self._span = Span(name, attributes, getattr(_local, 'current', None))
+
+    def __enter__(self):
+        # type: () -> Span
+        _local.current = self._span
+        _call_hooks(self._hooks, 'on_start', self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        span = self._span
+        span.end_time = time.time()
+        span.error = exc_val
+        _local.current = span.parent
+        _call_hooks(self._hooks, 'on_end', span)
+        return False
+
+
+class _NoSpan(object):
+    """
+    The span used when there are no hooks, which records nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **attributes):
+    # type: (tp.Text, **tp.Any) -> tp.Any
+    """
+    Returns a context manager which traces its block as a span named name. The span, whose
+    attributes can be set, is returned by `with ... as`.
+    """
+    hooks = _hooks
+    if not hooks:
+        return _NO_SPAN
+    return _SpanContext(hooks, name, attributes)
+
+
+def traced(name):
+    # type: (tp.Text) -> tp.Callable
+    """
+    Decorates a function so that its calls are traced as spans named name.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            hooks = _hooks
+            if not hooks:
+                return func(*args, **kwargs)
+            with _SpanContext(hooks, name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
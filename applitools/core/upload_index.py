@@ -0,0 +1,75 @@
+"""
+Process-wide index of the data uploaded to the storage service, keyed by content digest.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import threading
+import typing as tp
+
+from applitools.utils.caching import LRUCache
+
+__all__ = ('UploadIndex',)
+
+
+class UploadIndex(object):
+    """
+    Maps the digest of uploaded payloads (screenshots, DOMs) to the url they were uploaded to,
+    so identical payloads checked again by any Eyes instance in the process are not uploaded twice.
+    """
+    DEFAULT_MAXSIZE = 4096
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        # type: (int) -> None
+        self._urls = LRUCache(maxsize)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bytes_saved = 0
+
+    @staticmethod
+    def digest(data_bytes):
+        # type: (bytes) -> tp.Text
+        return hashlib.sha256(data_bytes).hexdigest()
+
+    def lookup(self, key, size):
+        # type: (tp.Hashable, int) -> tp.Optional[tp.Text]
+        """
+        Returns the url the payload of key was uploaded to, or None if it wasn't uploaded yet.
+
+        :param size: The size of the payload, accounted as saved on a hit.
+        """
+        url = self._urls.get(key)
+        with self._lock:
+            if url is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._bytes_saved += size
+        return url
+
+    def add(self, key, url):
+        # type: (tp.Hashable, tp.Text) -> None
+        self._urls.put(key, url)
+
+    def discard(self, key):
+        # type: (tp.Hashable) -> None
+        self._urls.pop(key)
+
+    def clear(self):
+        # type: () -> None
+        self._urls.clear()
+
+    @property
+    def stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the number of payloads found (hits) and not found (misses) in the index,
+        and the number of bytes which weren't uploaded thanks to it.
+        """
+        with self._lock:
+            return dict(hits=self._hits, misses=self._misses, bytes_saved=self._bytes_saved)
+
+
+# Shared by all the AgentConnector instances in the process.
+upload_index = UploadIndex()
@@ -0,0 +1,191 @@
+"""
+Background pipeline which encodes and uploads screenshots while the test keeps driving the browser.
+"""
+from __future__ import absolute_import
+
+import threading
+import typing as tp
+from multiprocessing.pool import ThreadPool
+
+from . import logger
+
+if tp.TYPE_CHECKING:
+    from ..utils.custom_types import MatchResult
+
+__all__ = ('MatchHandle', 'UploadPipeline')
+
+try:
+    TimeoutError = TimeoutError  # noqa: A001
+except NameError:  # Python 2
+    class TimeoutError(Exception):  # type: ignore  # noqa: A001
+        pass
+
+
+class MatchHandle(object):
+    """
+    A future-like handle of a match which is being processed in the background.
+    """
+
+    def __init__(self, tag):
+        # type: (tp.Optional[tp.Text]) -> None
+        self.tag = tag
+        self._event = threading.Event()
+        self._result = None  # type: tp.Optional[MatchResult]
+        self._exception = None  # type: tp.Optional[BaseException]
+
+    def _set_result(self, result):
+        # type: (MatchResult) -> None
+        self._result = result
+        self._event.set()
+
+    def _set_exception(self, exception):
+        # type: (BaseException) -> None
+        self._exception = exception
+        self._event.set()
+
+    def done(self):
+        # type: () -> bool
+        """
+        Returns whether the match has completed, successfully or not.
+        """
+        return self._event.is_set()
+
+    def exception(self, timeout=None):
+        # type: (tp.Optional[float]) -> tp.Optional[BaseException]
+        """
+        Waits for the match and returns the exception it raised, if any.
+        """
+        if not self._event.wait(timeout):
+            raise TimeoutError("Match '{}' is still in progress".format(self.tag))
+        return self._exception
+
+    def result(self, timeout=None):
+        # type: (tp.Optional[float]) -> MatchResult
+        """
+        Waits for the match and returns its result, or raises the exception it raised.
+
+        :param timeout: Seconds to wait. None means to wait until the match completes.
+        """
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self._result  # type: ignore
+
+    def __repr__(self):
+        state = 'done' if self.done() else 'pending'
+        return "MatchHandle(tag={!r}, {})".format(self.tag, state)
+
+
+class UploadPipeline(object):
+    """
+    Runs match jobs on a bounded pool of worker threads. A job may be followed by an ordered step,
+    e.g. the match request itself, which runs one at a time in the order the jobs were submitted.
+
+    The number of bytes held by pending jobs is capped: `submit` blocks the caller until enough
+    in-flight jobs complete, so memory stays bounded when the browser is faster than the network.
+    """
+    DEFAULT_WORKERS = 2
+    DEFAULT_MAX_IN_FLIGHT_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_in_flight_bytes=DEFAULT_MAX_IN_FLIGHT_BYTES):
+        # type: (int, int) -> None
+        self.workers = workers
+        self.max_in_flight_bytes = max_in_flight_bytes
+        self._pool = None  # type: tp.Optional[ThreadPool]
+        self._condition = threading.Condition()
+        self._in_flight_bytes = 0
+        self._pending = []  # type: tp.List[MatchHandle]
+        # The handle of the last submitted job, whose ordered step the next job's one waits for.
+        self._last_handle = None  # type: tp.Optional[MatchHandle]
+
+    @property
+    def in_flight_bytes(self):
+        # type: () -> int
+        with self._condition:
+            return self._in_flight_bytes
+
+    @property
+    def pending(self):
+        # type: () -> tp.List[MatchHandle]
+        """
+        Returns the handles submitted since the last drain.
+        """
+        with self._condition:
+            return list(self._pending)
+
+    def _acquire(self, size):
+        # type: (int) -> None
+        with self._condition:
+            # A job larger than the cap is admitted alone, otherwise it could never run.
+            while self._in_flight_bytes and self._in_flight_bytes + size > self.max_in_flight_bytes:
+                logger.debug("Upload pipeline is full ({} bytes in flight). Waiting...", self._in_flight_bytes)
+                self._condition.wait()
+            self._in_flight_bytes += size
+
+    def _release(self, size):
+        # type: (int) -> None
+        with self._condition:
+            self._in_flight_bytes -= size
+            self._condition.notify_all()
+
+    def submit(self, job, size, tag=None, ordered=None):
+        # type: (tp.Callable[[], tp.Any], int, tp.Optional[tp.Text], tp.Optional[tp.Callable]) -> MatchHandle
+        """
+        Schedules job to run in the background.
+
+        :param job: A callable which performs the match and returns its result, or prepares it
+            (e.g. uploads the screenshot) if ordered is given.
+        :param size: The number of bytes the job holds until it completes.
+        :param tag: The tag of the checked window, used for reporting.
+        :param ordered: A callable called with the result of job, which returns the result of the
+            match. It's called only once the ordered steps of all the previous jobs completed.
+        :return: A handle of the scheduled match.
+        """
+        handle = MatchHandle(tag)
+        self._acquire(size)
+        if self._pool is None:
+            self._pool = ThreadPool(self.workers)
+        with self._condition:
+            previous, self._last_handle = self._last_handle, handle
+            self._pending.append(handle)
+
+        def run():
+            try:
+                result = job()
+                if ordered is not None:
+                    # The pool runs jobs in the order of submission, so the previous one is
+                    # already running and waiting on it can't deadlock.
+                    if previous is not None:
+                        previous._event.wait()
+                    result = ordered(result)
+                handle._set_result(result)
+            except Exception as e:
+                logger.warning("Background match '{}' failed: {}".format(tag, e))
+                handle._set_exception(e)
+            finally:
+                self._release(size)
+
+        self._pool.apply_async(logger.bind_context(run))
+        return handle
+
+    def drain(self):
+        # type: () -> tp.List[MatchHandle]
+        """
+        Waits for all the submitted jobs to complete and returns their handles, in order.
+        """
+        with self._condition:
+            handles, self._pending = self._pending, []
+        for handle in handles:
+            handle.exception()
+        return handles
+
+    def close(self):
+        # type: () -> None
+        """
+        Waits for the submitted jobs and stops the worker threads.
+        """
+        self.drain()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
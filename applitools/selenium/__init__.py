@@ -1,13 +1,17 @@
 from .capture import EyesWebDriverScreenshot, dom_capture
 from .positioning import StitchMode
+from ..utils.stitching import StitchingEngine
 from .eyes import Eyes
 from .webdriver import EyesWebDriver
 from .webelement import EyesWebElement
 from .target import (IgnoreRegionByElement, IgnoreRegionBySelector, FloatingBounds, FloatingRegion,
                      FloatingRegionByElement, FloatingRegionBySelector, Target)
 from .frames import Frame
+from .instrumentation import DriverBudget, DriverCallRecorder
+from .runner import ConcurrentRunner, RunnerJob, JobResult, RunSummary
 
 __all__ = (
         target.__all__ +  # noqa
         ('Eyes', 'EyesWebElement', 'EyesWebDriver', 'Frame', 'EyesWebDriverScreenshot',
-         'StitchMode', 'dom_capture'))
+         'StitchMode', 'StitchingEngine', 'dom_capture', 'DriverBudget', 'DriverCallRecorder',
+         'ConcurrentRunner', 'RunnerJob', 'JobResult', 'RunSummary'))
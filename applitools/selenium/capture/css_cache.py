@@ -0,0 +1,230 @@
+"""
+Two-level cache of the stylesheets downloaded for DOM captures, keyed by absolute url.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import typing as tp
+from email.utils import mktime_tz, parsedate_tz
+
+from applitools.core import logger
+from applitools.utils.caching import SizedLRUCache
+
+if tp.TYPE_CHECKING:
+    from requests.models import Response
+
+__all__ = ('CssCache', 'CssCacheEntry')
+
+# A stylesheet is parsed into segments, which are either serialized css or the href of an @import.
+CSS_SEGMENT = 'css'
+IMPORT_SEGMENT = 'import'
+
+
+def _max_age(headers, default_max_age):
+    # type: (tp.Mapping[tp.Text, tp.Text], float) -> tp.Optional[float]
+    """
+    Returns the number of seconds a response is fresh for, or None if it must not be stored.
+    """
+    directives = {}
+    for directive in headers.get('Cache-Control', '').lower().split(','):
+        name, _, value = directive.strip().partition('=')
+        directives[name] = value.strip('"')
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    if 'max-age' in directives:
+        try:
+            return max(0.0, float(directives['max-age']))
+        except ValueError:
+            return 0
+    expires = headers.get('Expires')
+    if expires is not None:
+        parsed = parsedate_tz(expires)
+        return max(0.0, mktime_tz(parsed) - time.time()) if parsed else 0
+    return default_max_age
+
+
+class CssCacheEntry(object):
+    """
+    A downloaded stylesheet: its raw text, and its segments once parsed and serialized.
+    """
+
+    def __init__(self, url, text, etag=None, expires=None, segments=None, minimized=True):
+        # type: (tp.Text, tp.Text, tp.Optional[tp.Text], tp.Optional[float], tp.Optional[tp.List], bool) -> None
+        self.url = url
+        self.text = text
+        self.etag = etag
+        # The time until which the entry may be used without revalidating it, None if it must not be cached.
+        self.expires = expires
+        self.segments = segments  # type: tp.Optional[tp.List[tp.List[tp.Text]]]
+        self.minimized = minimized
+
+    @classmethod
+    def from_response(cls, url, response, default_max_age):
+        # type: (tp.Text, Response, float) -> tp.Optional[CssCacheEntry]
+        """
+        Returns the entry of the response, or None if it must not be cached.
+        """
+        max_age = _max_age(response.headers, default_max_age)
+        if not response.ok or max_age is None:
+            return None
+        return cls(url, response.text.strip(), response.headers.get('ETag'), time.time() + max_age)
+
+    def revalidated(self, response, default_max_age):
+        # type: (Response, float) -> None
+        """
+        Renews the entry after the server answered a conditional request with 304 Not Modified.
+        """
+        self.expires = time.time() + (_max_age(response.headers, default_max_age) or 0)
+        self.etag = response.headers.get('ETag', self.etag)
+
+    @property
+    def fresh(self):
+        # type: () -> bool
+        return self.expires is not None and time.time() < self.expires
+
+    @property
+    def size(self):
+        # type: () -> int
+        return len(self.text) + sum(len(value) for _, value in self.segments or ())
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        return dict(url=self.url, text=self.text, etag=self.etag, expires=self.expires,
+                    segments=self.segments, minimized=self.minimized)
+
+
+class CssCache(object):
+    """
+    Keeps downloaded stylesheets in memory, up to max_bytes, and optionally in a directory, so they
+    are shared by all checks (and, on disk, all runs). Entries are used while fresh according to
+    their Cache-Control or Expires headers, and revalidated with their ETag once stale.
+    """
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+    # How long responses without caching headers are fresh for, in seconds.
+    DEFAULT_MAX_AGE = 300
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None, default_max_age=DEFAULT_MAX_AGE):
+        # type: (int, tp.Optional[tp.Text], float) -> None
+        """
+        :param max_bytes: The budget of the in-memory cache, in characters of css.
+        :param directory: The directory of the on-disk cache, or None to keep entries in memory only.
+        :param default_max_age: How long responses without caching headers are fresh for, in seconds.
+        """
+        self._memory = SizedLRUCache(max_bytes, sizeof=lambda entry: entry.size)
+        self.directory = directory
+        self.default_max_age = default_max_age
+        self._lock = threading.Lock()
+        self._counts = dict(memory_hits=0, disk_hits=0, revalidations=0, misses=0)
+
+    def _path(self, url):
+        # type: (tp.Text) -> tp.Text
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _load(self, url):
+        # type: (tp.Text) -> tp.Optional[CssCacheEntry]
+        try:
+            with open(self._path(url)) as f:
+                entry = CssCacheEntry(**json.load(f))
+        except (EnvironmentError, ValueError, TypeError):
+            return None
+        return entry if entry.url == url else None
+
+    def _store(self, entry):
+        # type: (CssCacheEntry) -> None
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # Written aside and renamed, so concurrent runs never read partial files.
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry.as_dict(), f)
+            replace = getattr(os, 'replace', os.rename)
+            replace(tmp_path, self._path(entry.url))
+        except EnvironmentError as e:
+            logger.debug("Failed to store {} in the css cache: {}", entry.url, e)
+
+    def _count(self, name):
+        # type: (tp.Text) -> None
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, url):
+        # type: (tp.Text) -> tp.Optional[CssCacheEntry]
+        """
+        Returns the cached entry of url, fresh or stale, or None.
+        """
+        entry = self._memory.get(url)
+        if entry is not None:
+            return entry
+        if self.directory is not None:
+            entry = self._load(url)
+            if entry is not None:
+                self._memory.put(url, entry)
+        return entry
+
+    def put(self, entry):
+        # type: (CssCacheEntry) -> None
+        if entry.expires is None:
+            return
+        self._memory.put(entry.url, entry)
+        if self.directory is not None:
+            self._store(entry)
+
+    def lookup(self, url, download):
+        # type: (tp.Text, tp.Callable[[tp.Optional[CssCacheEntry]], tp.Tuple[Response, bool]]) -> CssCacheEntry
+        """
+        Returns the entry of url, from the cache if fresh, or from download otherwise.
+
+        :param download: Downloads url, conditionally on the stale entry passed to it (if any).
+            Returns the response and whether the server answered it's not modified.
+        """
+        in_memory = url in self._memory
+        entry = self.get(url)
+        if entry is not None and entry.fresh:
+            self._count('memory_hits' if in_memory else 'disk_hits')
+            return entry
+        response, not_modified = download(entry)
+        if entry is not None and not_modified:
+            self._count('revalidations')
+            entry.revalidated(response, self.default_max_age)
+        else:
+            self._count('misses')
+            new_entry = CssCacheEntry.from_response(url, response, self.default_max_age)
+            if new_entry is None:
+                self._memory.pop(url)
+                return CssCacheEntry(url, response.text.strip())
+            entry = new_entry
+        self.put(entry)
+        return entry
+
+    def clear(self):
+        # type: () -> None
+        """
+        Clears the in-memory cache. The on-disk one is kept.
+        """
+        self._memory.clear()
+
+    @property
+    def stats(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        """
+        Returns the number of lookups answered from memory, from disk, after revalidation and by a
+        download (misses), and the rate of those which didn't download the stylesheet again.
+        """
+        with self._lock:
+            stats = dict(self._counts)
+        lookups = sum(stats.values())
+        stats['hit_rate'] = float(lookups - stats['misses']) / lookups if lookups else 0.0
+        stats['memory_bytes'] = self._memory.total_size
+        return stats
+
+
+# Shared by all the CssFetcher instances in the process.
+css_cache = CssCache()
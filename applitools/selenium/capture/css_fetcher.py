@@ -0,0 +1,117 @@
+"""
+Downloading of the stylesheets referenced by captured DOMs.
+"""
+from __future__ import absolute_import
+
+import threading
+import typing as tp
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+from applitools.core import logger, tracing
+from applitools.core.http_transport import ConnectionSettings, HttpTransport
+from applitools.utils import general_utils
+from .css_cache import CssCache, CssCacheEntry, css_cache
+
+if tp.TYPE_CHECKING:
+    from requests.models import Response
+
+__all__ = ('CssFetcher',)
+
+CSS_DOWNLOAD_TIMEOUT = 3  # Secs
+
+T = tp.TypeVar('T')
+
+
+class CssFetcher(object):
+    """
+    Downloads stylesheets over pooled HTTP connections, processing them on a bounded pool of
+    threads which lives as long as the fetcher. Shared by all the checks of an Eyes instance and
+    closed by Eyes.close().
+    """
+    DEFAULT_WORKERS = 8
+
+    def __init__(self, workers=DEFAULT_WORKERS, timeout=CSS_DOWNLOAD_TIMEOUT, transport=None, cache=None):
+        # type: (int, float, tp.Optional[HttpTransport], tp.Optional[CssCache]) -> None
+        """
+        :param workers: The number of threads. 1 or less processes the stylesheets on the calling thread.
+        :param timeout: The timeout of every download, in seconds.
+        :param transport: The transport to download with. Defaults to one pooling a connection per worker.
+        :param cache: The cache of the stylesheets. Defaults to the one shared by the process.
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.cache = cache if cache is not None else css_cache
+        self._transport = transport or HttpTransport(ConnectionSettings(pool_maxsize=max(workers, 1)))
+        self._pool = None  # type: tp.Optional[ThreadPool]
+        self._lock = threading.Lock()
+
+    @general_utils.retry()
+    def _download(self, url, stale_entry):
+        # type: (tp.Text, tp.Optional[CssCacheEntry]) -> tp.Tuple[Response, bool]
+        headers = {}
+        if stale_entry is not None and stale_entry.etag:
+            headers['If-None-Match'] = stale_entry.etag
+        with tracing.span('css_fetch', url=url):
+            response = self._transport.get(url, timeout=self.timeout, headers=headers)
+        return response, response.status_code == requests.codes.not_modified
+
+    def _entry(self, url):
+        # type: (tp.Text) -> CssCacheEntry
+        return self.cache.lookup(url, lambda stale_entry: self._download(url, stale_entry))
+
+    def fetch(self, url):
+        # type: (tp.Text) -> tp.Text
+        """
+        Returns the text of the stylesheet at url.
+        """
+        if url.startswith('blob:'):
+            logger.warning('Passing blob URL: {}'.format(url))
+            return ''
+        return self._entry(url).text
+
+    def fetch_segments(self, url, parse, minimize=True):
+        # type: (tp.Text, tp.Callable[[tp.Text], tp.List], bool) -> tp.List[tp.List[tp.Text]]
+        """
+        Returns the stylesheet at url parsed into segments by parse, which are cached along with it.
+
+        :param minimize: Whether parse minimizes the css, which the cached segments must match.
+        """
+        if url.startswith('blob:'):
+            logger.warning('Passing blob URL: {}'.format(url))
+            return []
+        entry = self._entry(url)
+        if entry.segments is None or entry.minimized != minimize:
+            entry.segments = parse(entry.text)
+            entry.minimized = minimize
+            self.cache.put(entry)
+        return entry.segments
+
+    def map(self, func, items):
+        # type: (tp.Callable[[T], tp.Any], tp.Sequence[T]) -> tp.List[tp.Any]
+        """
+        Calls func on every item on the pool, and returns the results in order.
+        func must not wait for other tasks of the pool, but may call fetch.
+        """
+        if self.workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.workers)
+            pool = self._pool
+        return pool.map(logger.bind_context(func), items)
+
+    @property
+    def connection_stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        return self._transport.connection_stats
+
+    def close(self):
+        # type: () -> None
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+        self._transport.close()
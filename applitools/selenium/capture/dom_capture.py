@@ -1,21 +1,29 @@
 from __future__ import absolute_import, unicode_literals
 
+import contextlib
 import json
+import sys
 import typing as tp
-import multiprocessing as mp
 from collections import OrderedDict
 
-import requests
 import tinycss2
+from selenium.common.exceptions import WebDriverException
 
 from applitools.core import logger
 from applitools.utils import general_utils
-from applitools.utils.compat import urljoin
+from applitools.utils.compat import iteritems, urljoin
+from applitools.utils.streaming import GzipSpool
+from .css_cache import CSS_SEGMENT, IMPORT_SEGMENT
+from .css_fetcher import CSS_DOWNLOAD_TIMEOUT, CssFetcher  # noqa
 
 if tp.TYPE_CHECKING:
     from applitools.selenium.webdriver import EyesWebDriver
 
-__all__ = ('get_full_window_dom',)
+__all__ = ('get_full_window_dom', 'get_full_window_dom_stream', 'DomSnapshot')
+
+# Plain dicts keep the order of the keys since Python 3.7, and take less memory than OrderedDicts.
+_OBJECT_PAIRS_HOOK = None if sys.version_info >= (3, 7) else OrderedDict
+_encode = json.JSONEncoder(separators=(',', ':')).encode
 _CAPTURE_CSSOM_SCRIPT = """
 function extractCssResources() {
     cssAndText = Array.from(document.querySelectorAll('link[rel="stylesheet"],style')).map(el => {
@@ -126,6 +134,142 @@ _CAPTURE_FRAME_SCRIPT = """function captureFrame({ styleProps, attributeProps, r
 
 return JSON.stringify(captureFrame(arguments[0]));
 """
+# Collects the stylesheets of the document and of all the frames nested in it which the page can
+# access, in a single round trip. A frame which can't be accessed is planned as null.
+_PLAN_FRAMES_SCRIPT = """
+function planFrames(doc) {
+    var css = Array.prototype.map.call(doc.querySelectorAll('link[rel="stylesheet"],style'), function (el) {
+        if (el.tagName.toUpperCase() === 'LINK') {
+            return [null, el.getAttribute('href')];
+        } else {
+            return [el.textContent, null];
+        }
+    });
+    var frames = Array.prototype.map.call(doc.querySelectorAll('iframe'), function (frame) {
+        try {
+            return frame.contentDocument ? planFrames(frame.contentDocument) : null;
+        } catch (ex) {
+            return null;
+        }
+    });
+    return {url: doc.location.href, css: css, frames: frames};
+}
+return planFrames(document);
+"""
+# Captures the DOM like _CAPTURE_FRAME_SCRIPT, but remembers a hash of every captured subtree in
+# the page, by node. Nodes get ids, and a subtree which didn't change since the capture the caller
+# knows (by its token) is returned as {"$ref": id} instead of being captured again.
+_CAPTURE_FRAME_INCREMENTAL_SCRIPT = """function captureFrameIncrementally(
+    { styleProps, attributeProps, rectProps, ignoredTagNames }, knownToken) {
+  const NODE_TYPES = {
+    ELEMENT: 1,
+    TEXT: 3,
+  };
+  let state = window.__applitoolsDomCapture;
+  const full = !state || state.token !== knownToken;
+  if (full) {
+    state = window.__applitoolsDomCapture = {
+      token: Date.now() + '-' + Math.random(),
+      ids: new WeakMap(),
+      hashes: {},
+      nextId: 1,
+    };
+  }
+  const hashes = {};
+
+  function hash(str) {
+    let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+    for (let i = 0; i < str.length; i++) {
+      const ch = str.charCodeAt(i);
+      h1 = Math.imul(h1 ^ ch, 2654435761);
+      h2 = Math.imul(h2 ^ ch, 1597334677);
+    }
+    h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+    h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+    return 4294967296 * (2097151 & h2) + (h1 >>> 0);
+  }
+
+  function idOf(node) {
+    let id = state.ids.get(node);
+    if (id === undefined) {
+      id = state.nextId++;
+      state.ids.set(node, id);
+    }
+    return id;
+  }
+
+  function notEmptyObj(obj) {
+    return Object.keys(obj).length ? obj : undefined;
+  }
+
+  function finish(node, obj, children) {
+    const id = idOf(node);
+    const childHashes = children ? children.map(child => child.hash).join(',') : '';
+    const h = hash(JSON.stringify(obj) + '|' + childHashes);
+    hashes[id] = h;
+    if (!full && state.hashes[id] === h) {
+      return { hash: h, json: { $ref: id } };
+    }
+    obj.$id = id;
+    if (children) obj.childNodes = children.map(child => child.json);
+    return { hash: h, json: obj };
+  }
+
+  function captureElement(el) {
+    const tagName = el.tagName.toUpperCase();
+    if (ignoredTagNames.indexOf(tagName) > -1) return null;
+    const computedStyle = window.getComputedStyle(el);
+    const boundingClientRect = el.getBoundingClientRect();
+
+    const style = {};
+    for (const p of styleProps) style[p] = computedStyle.getPropertyValue(p);
+
+    const rect = {};
+    for (const p of rectProps) rect[p] = boundingClientRect[p];
+
+    const attributes = {};
+    if (!attributeProps) {
+      for (const p of el.attributes) attributes[p.name] = p.value;
+    } else {
+      for (const p of (attributeProps.all || []).concat(attributeProps[tagName] || [])) {
+        if (el.hasAttribute(p)) attributes[p] = el.getAttribute(p);
+      }
+    }
+    const obj = {
+      tagName,
+      style: notEmptyObj(style),
+      rect: notEmptyObj(rect),
+      attributes: notEmptyObj(attributes),
+    };
+
+    let childNodes = el.childNodes;
+    if (tagName === 'IFRAME') {
+      try {
+        if (el.contentDocument) childNodes = [el.contentDocument.documentElement];
+      } catch (ex) {
+      }
+    }
+    return finish(el, obj, Array.prototype.map.call(childNodes, captureNode).filter(x => !!x));
+  }
+
+  function captureNode(node) {
+    switch (node.nodeType) {
+      case NODE_TYPES.TEXT:
+        return finish(node, { tagName: '#text', text: node.textContent }, null);
+      case NODE_TYPES.ELEMENT:
+        return captureElement(node);
+      default:
+        return null;
+    }
+  }
+
+  const tree = captureNode(document.documentElement).json;
+  state.hashes = hashes;
+  return { token: state.token, full, tree };
+}
+
+return JSON.stringify(captureFrameIncrementally(arguments[0], arguments[1]));
+"""
 _ARGS_OBJ = {
     'styleProps': [
         "background-color",
@@ -150,25 +294,193 @@ _ARGS_OBJ = {
         "SCRIPT"
     ]
 }
-CSS_DOWNLOAD_TIMEOUT = 3  # Secs
+
+
+@contextlib.contextmanager
+def _css_fetcher_for_capture(css_fetcher):
+    # type: (tp.Optional[CssFetcher]) -> tp.Generator[CssFetcher, None, None]
+    if css_fetcher is not None:
+        yield css_fetcher
+        return
+    css_fetcher = CssFetcher()
+    try:
+        yield css_fetcher
+    finally:
+        css_fetcher.close()
 
 
 @general_utils.timeit
-def get_full_window_dom(driver, return_as_dict=False):
-    # type: (EyesWebDriver, bool) -> tp.Union[str, dict]
+def get_full_window_dom(driver, return_as_dict=False, css_fetcher=None, snapshot=None):
+    # type: (EyesWebDriver, bool, tp.Optional[CssFetcher], tp.Optional[DomSnapshot]) -> tp.Union[str, dict]
+    """
+    :param css_fetcher: The fetcher which downloads the stylesheets. If None, a fetcher is created
+                        and closed for this capture only.
+    :param snapshot: The snapshot of the previous capture of the page, to capture incrementally
+                     from. The returned tree shares the unchanged nodes with it. If None, the
+                     whole DOM is captured.
+    """
+    with _css_fetcher_for_capture(css_fetcher) as fetcher:
+        dom_tree = _capture_dom_tree(driver, fetcher, snapshot)
+    if return_as_dict:
+        return dom_tree
+    return json.dumps(dom_tree)
+
 
-    dom_tree = json.loads(driver.execute_script(_CAPTURE_FRAME_SCRIPT, _ARGS_OBJ), object_pairs_hook=OrderedDict)
+@general_utils.timeit
+def get_full_window_dom_stream(driver, css_fetcher=None, compress_level=GzipSpool.DEFAULT_COMPRESS_LEVEL,
+                               snapshot=None):
+    # type: (EyesWebDriver, tp.Optional[CssFetcher], int, tp.Optional[DomSnapshot]) -> GzipSpool
+    """
+    Captures the DOM like get_full_window_dom, but serializes it a node at a time into a gzip
+    stream, so neither the JSON document nor its compressed form are ever held whole.
+    The caller should close the returned stream once uploaded.
+
+    :param compress_level: The gzip compression level, from 1 (fastest) to 9 (smallest).
+    """
+    with _css_fetcher_for_capture(css_fetcher) as fetcher:
+        dom_tree = _capture_dom_tree(driver, fetcher, snapshot)
+    spool = GzipSpool(compress_level)
+    try:
+        _write_dom_node(dom_tree, spool.write)
+    except Exception:
+        spool.close()
+        raise
+    spool.finish()
+    logger.debug('DOM serialized: {}'.format(spool.stats))
+    return spool
+
+
+def _capture_dom_tree(driver, css_fetcher, snapshot=None):
+    # type: (EyesWebDriver, CssFetcher, tp.Optional[DomSnapshot]) -> tp.Dict
+    if snapshot is None:
+        dom_tree = json.loads(driver.execute_script(_CAPTURE_FRAME_SCRIPT, _ARGS_OBJ),
+                              object_pairs_hook=_OBJECT_PAIRS_HOOK)
+    else:
+        dom_tree = snapshot.capture(driver)
 
     logger.debug('Traverse DOM Tree')
-    _traverse_dom_tree(driver, {'childNodes': [dom_tree], 'tagName': 'OUTER_HTML'})
+    frame_css = []  # type: tp.List[tp.Tuple[tp.Dict, tp.List[CssNode]]]
+    _match_frame_plan(driver, {'childNodes': [dom_tree], 'tagName': 'OUTER_HTML'}, _plan_frames(driver), [],
+                      css_fetcher, frame_css)
+    _bundle_frame_css(frame_css, css_fetcher)
 
     # After traversing page could be scrolled down. Reset to origin position
     driver.reset_origin()
+    return dom_tree
 
-    if return_as_dict:
+
+def _write_dom_node(node, write):
+    # type: (tp.Dict, tp.Callable[[tp.Text], None]) -> None
+    """
+    Writes the JSON of node through write, encoding the node itself (with the bundled CSS of its
+    frame, if any) in one piece and its child nodes one by one, so the whole document is never
+    built as a single string.
+    """
+    child_nodes = node.get('childNodes')
+    if not child_nodes:
+        write(_encode(node))
+        return
+    head = _encode(OrderedDict((key, value) for key, value in iteritems(node) if key != 'childNodes'))
+    # The child nodes are written in place of the closing brace.
+    write(head[:-1])
+    write(',"childNodes":[' if len(head) > 2 else '"childNodes":[')
+    for i, child_node in enumerate(child_nodes):
+        if i:
+            write(',')
+        _write_dom_node(child_node, write)
+    write(']}')
+
+
+class DomSnapshot(object):
+    """
+    The DOM tree of the last incremental capture of a page, with its nodes indexed by the ids the
+    capture script gave them, so that the next capture only returns the subtrees which changed
+    and reuses the others. Kept per driver (e.g. by Eyes) across checks.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        # Identifies the capture state of the page the tree was captured from.
+        self.token = None  # type: tp.Optional[tp.Text]
+        self._nodes = {}  # type: tp.Dict[int, tp.Dict]
+        # The id of every node of the tree, by the identity of its dict.
+        self._ids = {}  # type: tp.Dict[int, int]
+        self.last_stats = {}  # type: tp.Dict[tp.Text, tp.Any]
+
+    def reset(self):
+        # type: () -> None
+        self.token = None
+        self._nodes = {}
+        self._ids = {}
+
+    def capture(self, driver):
+        # type: (EyesWebDriver) -> tp.Dict
+        """
+        Captures the DOM of the page, incrementally if it was captured into this snapshot before.
+        """
+        try:
+            return self._capture(driver)
+        except KeyError as e:
+            logger.info('DOM snapshot is missing node {}, capturing the whole DOM'.format(e))
+            self.reset()
+            return self._capture(driver)
+
+    def _capture(self, driver):
+        # type: (EyesWebDriver) -> tp.Dict
+        result = driver.execute_script(_CAPTURE_FRAME_INCREMENTAL_SCRIPT, _ARGS_OBJ, self.token)
+        capture = json.loads(result, object_pairs_hook=_OBJECT_PAIRS_HOOK)
+        if capture['full']:
+            self._nodes, self._ids = {}, {}
+        dom_tree = self.patch(capture['tree'])
+        self.token = capture['token']
+        self.last_stats = dict(full=capture['full'], payload_chars=len(result),
+                               nodes=len(self._nodes), **self.last_stats)
+        logger.debug('Incremental DOM capture: {}'.format(self.last_stats))
         return dom_tree
 
-    return json.dumps(dom_tree)
+    def patch(self, tree):
+        # type: (tp.Dict) -> tp.Dict
+        """
+        Replaces the references of the captured tree by the subtrees of the previous one, and
+        makes it the previous one.
+
+        :raise KeyError: If a reference is to a node which isn't in the previous tree.
+        """
+        nodes = {}  # type: tp.Dict[int, tp.Dict]
+        ids = {}  # type: tp.Dict[int, int]
+        counts = dict(captured_nodes=0, reused_subtrees=0)
+
+        def register(node, node_id):
+            nodes[node_id] = node
+            ids[id(node)] = node_id
+
+        def register_reused(node):
+            node_id = self._ids.get(id(node))
+            if node_id is not None:
+                register(node, node_id)
+            for child_node in node.get('childNodes', ()):
+                register_reused(child_node)
+
+        def resolve(node):
+            ref = node.get('$ref')
+            if ref is not None:
+                reused = self._nodes[ref]
+                register_reused(reused)
+                counts['reused_subtrees'] += 1
+                return reused
+            counts['captured_nodes'] += 1
+            node_id = node.pop('$id', None)
+            if node_id is not None:
+                register(node, node_id)
+            child_nodes = node.get('childNodes')
+            if child_nodes:
+                node['childNodes'] = [resolve(child_node) for child_node in child_nodes]
+            return node
+
+        dom_tree = resolve(tree)
+        self._nodes, self._ids = nodes, ids
+        self.last_stats = counts
+        return dom_tree
 
 
 class DomNode(object):
@@ -189,24 +501,109 @@ class DomNode(object):
         return cls(tag_name, child_nodes)
 
 
-def _traverse_dom_tree(driver, dom_tree):
-    # type: (EyesWebDriver, tp.Dict) -> None
+def _plan_frames(driver):
+    # type: (EyesWebDriver) -> tp.Optional[tp.Dict]
+    try:
+        return driver.execute_script(_PLAN_FRAMES_SCRIPT)
+    except WebDriverException as e:
+        logger.info('Failed to plan the frames of the DOM: {}'.format(e))
+        return None
+
+
+def _iterate_frame_nodes(child_nodes):
+    # type: (tp.List[tp.Dict]) -> tp.Iterable[tp.Tuple[DomNode, tp.Dict]]
     """
-    Walk through all IFRAMEs and add CSS to them
+    Yields the HTML and IFRAME nodes of a document in order, without descending into the IFRAMEs.
+    """
+    for sub_dom_tree in child_nodes:
+        sub_node = DomNode.create_from_dom_tree(sub_dom_tree)
+        if sub_node.is_html or sub_node.is_iframe:
+            yield sub_node, sub_dom_tree
+            if sub_node.is_iframe:
+                continue
+        # yield from
+        for res in _iterate_frame_nodes(sub_node.child_nodes):
+            yield res
+
+
+@contextlib.contextmanager
+def _switched_to_frames(driver, frame_path):
+    # type: (EyesWebDriver, tp.List[int]) -> tp.Generator
+    entered = 0
+    try:
+        for index in frame_path:
+            driver.switch_to.frame(index)
+            entered += 1
+        yield
+    finally:
+        # Even if the capture failed, the driver is left in the frame it was in.
+        for _ in range(entered):
+            driver.switch_to.parent_frame()
+
+
+def _match_frame_plan(driver, dom_tree, plan, frame_path, css_fetcher, frame_css):
+    # type: (EyesWebDriver, tp.Dict, tp.Optional[tp.Dict], tp.List[int], CssFetcher, tp.List) -> None
+    """
+    Pairs the HTML nodes of the DOM tree with the stylesheets of their documents in the plan,
+    appending them to frame_css. Documents the plan doesn't match are traversed by switching to
+    their frame instead, like without a plan.
+    """
+    nodes = list(_iterate_frame_nodes(dom_tree.get('childNodes', [])))
+    if plan is None or sum(1 for node, _ in nodes if node.is_iframe) != len(plan['frames']):
+        with _switched_to_frames(driver, frame_path):
+            _traverse_dom_tree(driver, dom_tree, css_fetcher)
+        return
+
+    base_url = plan['url']
+    if not general_utils.is_absolute_url(base_url):
+        logger.info('Base URL is not an absolute URL!')
+    css_nodes = [CssNode.create(base_url, css_href, css_text) for css_text, css_href in plan['css']]
+    frame_index = 0
+    for node, sub_dom_tree in nodes:
+        if node.is_html:
+            frame_css.append((sub_dom_tree, css_nodes))
+            continue
+        if node.child_nodes:
+            _match_frame_plan(driver, sub_dom_tree, plan['frames'][frame_index], frame_path + [frame_index],
+                              css_fetcher, frame_css)
+        frame_index += 1
+
+
+@general_utils.timeit
+def _bundle_frame_css(frame_css, css_fetcher):
+    # type: (tp.List[tp.Tuple[tp.Dict, tp.List[CssNode]]], CssFetcher) -> None
+    """
+    Downloads and processes the stylesheets of all the frames concurrently, then adds the bundled
+    CSS of every frame to its HTML node.
+    """
+    jobs = [(i, css_node) for i, (_, css_nodes) in enumerate(frame_css) for css_node in css_nodes]
+    results = css_fetcher.map(lambda job: _process_raw_css_node(job[1], css_fetcher), jobs)
+    bundles = [[] for _ in frame_css]  # type: tp.List[tp.List[tp.Text]]
+    for (i, _), css in zip(jobs, results):
+        bundles[i].append(css)
+    for (html_tree, _), bundle in zip(frame_css, bundles):
+        html_tree['css'] = ''.join(bundle)
+
+
+def _traverse_dom_tree(driver, dom_tree, css_fetcher):
+    # type: (EyesWebDriver, tp.Dict, CssFetcher) -> None
+    """
+    Walk through all IFRAMEs and add CSS to them, switching to every frame. Used for the documents
+    which couldn't be planned.
     """
     node = DomNode.create_from_dom_tree(dom_tree)
     if not node.tag_name:
         return None
-    for index, sub_dom_tree in enumerate(_loop(driver, dom_tree)):
+    for index, sub_dom_tree in enumerate(_loop(driver, dom_tree, css_fetcher)):
         # Reduce recursion optimization. Save from extra _loop calls
         if not sub_dom_tree['childNodes']:
             continue
         with driver.switch_to.frame_and_back(index):
-            _traverse_dom_tree(driver, sub_dom_tree)
+            _traverse_dom_tree(driver, sub_dom_tree, css_fetcher)
 
 
-def _loop(driver, dom_tree):
-    # type: (EyesWebDriver, tp.Dict) -> tp.Iterable
+def _loop(driver, dom_tree, css_fetcher):
+    # type: (EyesWebDriver, tp.Dict, CssFetcher) -> tp.Iterable
     node = DomNode.create_from_dom_tree(dom_tree)
     if not node.child_nodes:
         return []
@@ -219,7 +616,7 @@ def _loop(driver, dom_tree):
                 continue
 
             if sub_node.is_html:
-                sub_dom_tree['css'] = _get_frame_bundled_css(driver)
+                sub_dom_tree['css'] = _get_frame_bundled_css(driver, css_fetcher)
             if sub_node.child_nodes:
                 # yield from iterate_child_nodes() in python 3
                 for sub in iterate_child_nodes(sub_node.child_nodes):
@@ -229,8 +626,8 @@ def _loop(driver, dom_tree):
 
 
 @general_utils.timeit
-def _get_frame_bundled_css(driver):
-    # type: (EyesWebDriver) -> tp.Text
+def _get_frame_bundled_css(driver, css_fetcher):
+    # type: (EyesWebDriver, CssFetcher) -> tp.Text
     base_url = driver.current_url  # type: ignore
     if not general_utils.is_absolute_url(base_url):
         logger.info('Base URL is not an absolute URL!')
@@ -239,55 +636,48 @@ def _get_frame_bundled_css(driver):
     raw_css_nodes = [CssNode.create(base_url, css_href, css_text)
                      for css_text, css_href in cssom_results]
 
-    if len(raw_css_nodes) > 5:
-        pool = mp.Pool(processes=mp.cpu_count() * 2)
-        results = pool.map(_process_raw_css_node, raw_css_nodes)
-    else:
-        results = [_process_raw_css_node(node) for node in raw_css_nodes]
+    results = css_fetcher.map(lambda node: _process_raw_css_node(node, css_fetcher), raw_css_nodes)
     return ''.join(results)
 
 
-def _process_raw_css_node(node, minimize_css=True):
-    # type: (CssNode, bool) -> tp.Text
-
-    @general_utils.retry()
-    def get_css(url):
-        if url.startswith('blob:'):
-            logger.warning('Passing blob URL: {}'.format(url))
-            return ''
-        return requests.get(url, timeout=CSS_DOWNLOAD_TIMEOUT).text.strip()
-
-    def iterate_css_sub_nodes(node, text=None):
-        if text is None:
-            text = node.text
-            if node.text is None:
-                text = get_css(node.url)
+def _process_raw_css_node(node, css_fetcher, minimize_css=True):
+    # type: (CssNode, CssFetcher, bool) -> tp.Text
+    parse = lambda text: _parse_and_serialize_css(text, minimize_css)
 
-        for sub_node in _parse_and_serialize_css(node, text, minimize_css):
-            if sub_node.url:
-                text = get_css(sub_node.url)
+    def iterate_css_sub_nodes(node, segments):
+        for kind, value in segments:
+            if kind == IMPORT_SEGMENT:
+                sub_node = CssNode.create_sub_node(parent_node=node, href=value)
+                sub_segments = css_fetcher.fetch_segments(sub_node.url, parse, minimize_css)
                 # yield from
-                for res in iterate_css_sub_nodes(sub_node, text):
+                for res in iterate_css_sub_nodes(sub_node, sub_segments):
                     yield res
                 continue
-            yield sub_node.text
+            yield value
 
-    return ''.join(iterate_css_sub_nodes(node))
+    if node.text is None:
+        # Downloaded stylesheets are parsed once, and their segments cached along with them.
+        segments = css_fetcher.fetch_segments(node.url, parse, minimize_css)
+    else:
+        segments = parse(node.text)
+    return ''.join(iterate_css_sub_nodes(node, segments))
 
 
-def _parse_and_serialize_css(node, text, minimize=False):
-    # type: (CssNode, tp.Text, bool) -> tp.Generator
+def _parse_and_serialize_css(text, minimize=False):
+    # type: (tp.Text, bool) -> tp.List[tp.List[tp.Text]]
+    """
+    Returns the segments of the stylesheet: [CSS_SEGMENT, serialized css] or [IMPORT_SEGMENT, href].
+    """
     is_import_node = lambda n: n.type == 'at-rule' and n.lower_at_keyword == 'import'
     stylesheet = tinycss2.parse_stylesheet(text, skip_comments=True,
                                            skip_whitespace=True)
+    segments = []
     for style_node in stylesheet:
         if is_import_node(style_node):
             for tag in style_node.prelude:
                 if tag.type == 'url':
                     logger.debug('The node has import')
-                    yield CssNode.create_sub_node(
-                        parent_node=node,
-                        href=tag.value)
+                    segments.append([IMPORT_SEGMENT, tag.value])
             continue
 
         try:
@@ -304,7 +694,8 @@ def _parse_and_serialize_css(node, text, minimize=False):
         except TypeError as e:
             logger.warning(str(e))
             continue
-        yield CssNode.create_serialized_node(text=serialized)
+        segments.append([CSS_SEGMENT, serialized])
+    return segments
 
 
 def _make_url(base_url, value):
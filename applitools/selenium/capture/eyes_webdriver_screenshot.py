@@ -62,7 +62,7 @@ class EyesWebDriverScreenshot(EyesScreenshot):
             raise EyesError("both screenshot and screenshot64 are None!")
 
         if screenshot64:
-            screenshot = image_utils.image_from_bytes(base64.b64decode(screenshot64))
+            screenshot = image_utils.load_image(base64.b64decode(screenshot64))
 
         # initializing of screenshot
         super(EyesWebDriverScreenshot, self).__init__(image=screenshot)
@@ -1,6 +1,5 @@
 from __future__ import absolute_import
 
-import base64
 import contextlib
 import typing as tp
 
@@ -8,7 +7,7 @@ from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
 
 # noinspection PyProtectedMember
-from applitools.core import logger
+from applitools.core import logger, tracing
 from applitools.core.eyes_base import FailureReports, EyesBase
 from applitools.core.match_window_task import MatchWindowTask
 from applitools.core.triggers import MouseTrigger, TextTrigger
@@ -16,15 +15,21 @@ from applitools.core.errors import EyesError, TestFailedError
 from applitools.core.geometry import Region
 from applitools.core.scaling import ContextBasedScaleProvider, FixedScaleProvider
 from applitools.utils import image_utils
+from applitools.utils.streaming import GzipSpool
+from applitools.utils.stitching import PartDecoder, StitchingEngine
 from . import eyes_selenium_utils
 from .webdriver import EyesWebDriver
 from .capture import EyesWebDriverScreenshot, dom_capture
+from .capture.css_cache import CssCache, css_cache
+from .capture.css_fetcher import CssFetcher
 from .target import Target
 from .positioning import StitchMode, ElementPositionProvider
 from .webelement import EyesWebElement
+from .instrumentation import DriverCallRecorder
 
 if tp.TYPE_CHECKING:
     from applitools.core.scaling import ScaleProvider
+    from applitools.core.upload_pipeline import MatchHandle
     from applitools.utils.custom_types import (ViewPort, AnyWebDriver, FrameReference, AnyWebElement)
 
 
@@ -80,6 +85,29 @@ class Eyes(EyesBase):
         # If true, Eyes will remove the scrollbars from the pages before taking the screenshot.
         self.hide_scrollbars = False  # type: bool
 
+        # The canvas implementation full page screenshots are stitched on. See StitchingEngine.
+        self.stitching_engine = StitchingEngine.PIL  # type: tp.Text
+
+        # The number of threads decoding and scaling the parts of stitched screenshots while the next part is
+        # captured. 1 or less processes them on the calling thread.
+        self.stitching_workers = PartDecoder.DEFAULT_WORKERS  # type: int
+
+        # If set, records the WebDriver round trips of every checkpoint, checks them against its budget
+        # and logs a report when the test ends.
+        self.driver_call_recorder = None  # type: tp.Optional[DriverCallRecorder]
+
+        # The number of threads downloading the stylesheets of captured DOMs.
+        self.css_fetch_workers = CssFetcher.DEFAULT_WORKERS  # type: int
+        self._css_fetcher = None  # type: tp.Optional[CssFetcher]
+        # The cache of the stylesheets, shared by the Eyes instances of the process unless replaced
+        # (e.g. by CssCache(directory=...) to keep them on disk across runs).
+        self.css_cache = css_cache  # type: CssCache
+        # The gzip compression level of captured DOMs, from 1 (fastest) to 9 (smallest).
+        self.dom_compress_level = GzipSpool.DEFAULT_COMPRESS_LEVEL  # type: int
+        # Whether DOM captures only capture the subtrees which changed since the previous one.
+        self.incremental_dom_capture = False  # type: bool
+        self._dom_snapshot = dom_capture.DomSnapshot()
+
     @property
     def stitch_mode(self):
         # type: () -> tp.Text
@@ -103,6 +131,24 @@ class Eyes(EyesBase):
             self.hide_scrollbars = True
             self.send_dom = True
 
+    @property
+    def css_fetcher(self):
+        # type: () -> CssFetcher
+        """
+        Returns the fetcher of the stylesheets of captured DOMs, shared by the checks until close.
+        """
+        if self._css_fetcher is None:
+            self._css_fetcher = CssFetcher(self.css_fetch_workers, cache=self.css_cache)
+        return self._css_fetcher
+
+    @property
+    def css_cache_stats(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        """
+        Returns the hits, misses and hit rate of the cache of the stylesheets of captured DOMs.
+        """
+        return self.css_cache.stats
+
     @property
     def driver(self):
         # type: () -> EyesWebDriver
@@ -192,7 +238,11 @@ class Eyes(EyesBase):
 
         logger.info('Trying to extract device pixel ratio...')
         try:
-            device_pixel_ratio = image_utils.get_device_pixel_ratio(self._driver)
+            page_metrics = self._driver.get_page_metrics()
+            if page_metrics is not None and page_metrics.device_pixel_ratio:
+                device_pixel_ratio = page_metrics.device_pixel_ratio
+            else:
+                device_pixel_ratio = image_utils.get_device_pixel_ratio(self._driver)
         except Exception as e:
             logger.info('Failed to extract device pixel ratio! Using default. Error %s ' % e)
             device_pixel_ratio = self._DEFAULT_DEVICE_PIXEL_RATIO
@@ -217,22 +267,59 @@ class Eyes(EyesBase):
     @contextlib.contextmanager
     def _hide_scrollbars_if_needed(self):
         if self.hide_scrollbars:
-            original_overflow = self._driver.hide_scrollbars()
-            eyes_selenium_utils.add_data_overflow_to_element(self.driver, None, original_overflow)
+            with tracing.span('hide_scrollbars'):
+                original_overflow = self._driver.hide_scrollbars()
+                eyes_selenium_utils.add_data_overflow_to_element(self.driver, None, original_overflow)
         yield
         if self.hide_scrollbars:
             self._driver.set_overflow(original_overflow)
 
+    def _before_match_window(self):
+        super(Eyes, self)._before_match_window()
+        self._driver.begin_check()
+
+    def _after_match_window(self):
+        self._driver.end_check()
+        super(Eyes, self)._after_match_window()
+
+    def _close_resources(self):
+        super(Eyes, self)._close_resources()
+        if self._driver is not None:
+            self._driver.close_part_decoder()
+        if self._css_fetcher is not None:
+            self._css_fetcher.close()
+            self._css_fetcher = None
+            logger.debug('CSS cache stats: {}'.format(self.css_cache_stats))
+        self._dom_snapshot.reset()
+        if self.driver_call_recorder is not None and self.driver_call_recorder.attached:
+            self.driver_call_recorder.detach()
+            logger.info(self.driver_call_recorder.format_report())
+
+    @contextlib.contextmanager
+    def _driver_checkpoint(self, name):
+        # type: (tp.Text) -> tp.Generator
+        if self.driver_call_recorder is None or self.is_disabled:
+            yield
+        else:
+            with self.driver_call_recorder.checkpoint(name):
+                yield
+
+    @tracing.traced('dom_capture')
     def _try_capture_dom(self):
         try:
-            dom_json = dom_capture.get_full_window_dom(self._driver)
-            return dom_json
+            snapshot = self._dom_snapshot if self.incremental_dom_capture else None
+            return dom_capture.get_full_window_dom_stream(self._driver, css_fetcher=self.css_fetcher,
+                                                          compress_level=self.dom_compress_level,
+                                                          snapshot=snapshot)
         except Exception as e:
             logger.warning(
                 'Exception raising during capturing DOM Json. Passing...\n Got next error: {}'.format(str(e)))
             return None
 
+    @tracing.traced('capture')
     def _get_screenshot(self):
+        # The page may have changed since the last screenshot, e.g. while waiting to retry a match.
+        self._driver.invalidate_page_metrics()
         scale_provider = self._update_scaling_params()
 
         if self._screenshot_type == ScreenshotType.ENTIRE_ELEMENT_SCREENSHOT:
@@ -287,11 +374,10 @@ class Eyes(EyesBase):
 
         self._driver._wait_before_screenshot(self._seconds_to_wait_screenshot)
         if not self._driver.is_mobile_device():
-            image64 = self._driver.get_screesnhot_as_base64_from_main_frame()
+            image = self._driver.get_screenshot_as_image_from_main_frame()
         else:
-            image64 = self._driver.get_screenshot_as_base64()
+            image = self._driver.get_screenshot_as_image()
 
-        image = image_utils.image_from_bytes(base64.b64decode(image64))
         scale_provider.update_scale_ratio(image.width)
         pixel_ratio = 1 / scale_provider.scale_ratio
         if pixel_ratio != 1.0:
@@ -301,11 +387,14 @@ class Eyes(EyesBase):
     def _ensure_viewport_size(self):
         if self._viewport_size is None:
             self._viewport_size = self._driver.get_default_content_viewport_size()
-            if not eyes_selenium_utils.is_mobile_device(self._driver):
+            if not self._driver.is_mobile_device():
                 eyes_selenium_utils.set_viewport_size(self._driver, self._viewport_size)
 
+    @tracing.traced('open')
     def open(self, driver, app_name, test_name, viewport_size=None):
         # type: (AnyWebDriver, tp.Text, tp.Text, tp.Optional[ViewPort]) -> EyesWebDriver
+        # Before the viewport is set, so that the records of doing so are logged for the test too.
+        self._open_logger(test_name)
         if self.is_disabled:
             logger.debug('open(): ignored (disabled)')
             return driver
@@ -319,6 +408,9 @@ class Eyes(EyesBase):
                 logger.info("WARNING: driver is not a RemoteWebDriver (class: {0})".format(driver.__class__))
             self._driver = EyesWebDriver(driver, self, self._stitch_mode)
 
+        if self.driver_call_recorder is not None:
+            self.driver_call_recorder.attach(self._driver.driver)
+
         if viewport_size is not None:
             self._viewport_size = viewport_size
             eyes_selenium_utils.set_viewport_size(self._driver, viewport_size)
@@ -329,7 +421,7 @@ class Eyes(EyesBase):
         return self._driver
 
     def check_window(self, tag=None, match_timeout=-1, target=None):
-        # type: (tp.Optional[tp.Text], int, tp.Optional[Target]) -> None
+        # type: (tp.Optional[tp.Text], int, tp.Optional[Target]) -> tp.Optional[MatchHandle]
         """
         Takes a snapshot from the browser using the web driver and matches it with the expected
         output.
@@ -337,17 +429,18 @@ class Eyes(EyesBase):
         :param tag: (str) Description of the visual validation checkpoint.
         :param match_timeout: (int) Timeout for the visual validation checkpoint (milliseconds).
         :param target: (Target) The target for the check_window call
-        :return: None
+        :return: None, or a MatchHandle if pipeline_uploads is enabled.
         """
         logger.info("check_window('%s')" % tag)
-        self._screenshot_type = self._obtain_screenshot_type(is_element=False,
-                                                             inside_a_frame=bool(self._driver.frame_chain),
-                                                             stitch_content=False,
-                                                             force_fullpage=self.force_full_page_screenshot)
-        self._check_window_base(tag, match_timeout, target)
+        with self._driver_checkpoint(tag or 'check_window'):
+            self._screenshot_type = self._obtain_screenshot_type(is_element=False,
+                                                                 inside_a_frame=bool(self._driver.frame_chain),
+                                                                 stitch_content=False,
+                                                                 force_fullpage=self.force_full_page_screenshot)
+            return self._check_window_base(tag, match_timeout, target)
 
     def check_region(self, region, tag=None, match_timeout=-1, target=None, stitch_content=False):
-        # type: (Region, tp.Optional[tp.Text], int, tp.Optional[Target], bool) -> None
+        # type: (Region, tp.Optional[tp.Text], int, tp.Optional[Target], bool) -> tp.Optional[MatchHandle]
         """
         Takes a snapshot of the given region from the browser using the web driver and matches it
         with the expected output. If the current context is a frame, the region is offsetted
@@ -358,21 +451,22 @@ class Eyes(EyesBase):
         :param tag: (str) Description of the visual validation checkpoint.
         :param match_timeout: (int) Timeout for the visual validation checkpoint (milliseconds).
         :param target: (Target) The target for the check_window call
-        :return: None
+        :return: None, or a MatchHandle if pipeline_uploads is enabled.
         """
         logger.info("check_region([%s], '%s')" % (region, tag))
         if region.is_empty():
             raise EyesError("region cannot be empty!")
-        self._screenshot_type = self._obtain_screenshot_type(is_element=False,
-                                                             inside_a_frame=bool(self._driver.frame_chain),
-                                                             stitch_content=stitch_content,
-                                                             force_fullpage=self.force_full_page_screenshot,
-                                                             is_region=True)
-        self._region_to_check = region
-        self._check_window_base(tag, match_timeout, target)
+        with self._driver_checkpoint(tag or 'check_region'):
+            self._screenshot_type = self._obtain_screenshot_type(is_element=False,
+                                                                 inside_a_frame=bool(self._driver.frame_chain),
+                                                                 stitch_content=stitch_content,
+                                                                 force_fullpage=self.force_full_page_screenshot,
+                                                                 is_region=True)
+            self._region_to_check = region
+            return self._check_window_base(tag, match_timeout, target)
 
     def check_region_by_element(self, element, tag=None, match_timeout=-1, target=None, stitch_content=False):
-        # type: (AnyWebElement, tp.Optional[tp.Text], int, tp.Optional[Target], bool) -> None
+        # type: (AnyWebElement, tp.Optional[tp.Text], int, tp.Optional[Target], bool) -> tp.Optional[MatchHandle]
         """
         Takes a snapshot of the region of the given element from the browser using the web driver
         and matches it with the expected output.
@@ -381,28 +475,30 @@ class Eyes(EyesBase):
         :param tag: (str) Description of the visual validation checkpoint.
         :param match_timeout: (int) Timeout for the visual validation checkpoint (milliseconds).
         :param target: (Target) The target for the check_window call
-        :return: None
+        :return: None, or a MatchHandle if pipeline_uploads is enabled.
         """
         logger.info("check_region_by_element('%s')" % tag)
-        self._screenshot_type = self._obtain_screenshot_type(is_element=True,
-                                                             inside_a_frame=bool(self._driver.frame_chain),
-                                                             stitch_content=stitch_content,
-                                                             force_fullpage=self.force_full_page_screenshot)
-        if not isinstance(element, EyesWebElement):
-            element = EyesWebElement(element, self.driver)
-        self._element_position_provider = ElementPositionProvider(self._driver, element)
-
-        origin_overflow = element.get_overflow()
-        eyes_selenium_utils.add_data_overflow_to_element(self.driver, element, origin_overflow)
-        element.set_overflow('hidden')
-
-        element_region = self._get_element_region(element)
-        self._region_to_check = element_region
-        self._check_window_base(tag, match_timeout, target)
-        self._element_position_provider = None
-
-        if origin_overflow:
-            element.set_overflow(origin_overflow)
+        with self._driver_checkpoint(tag or 'check_region_by_element'):
+            self._screenshot_type = self._obtain_screenshot_type(is_element=True,
+                                                                 inside_a_frame=bool(self._driver.frame_chain),
+                                                                 stitch_content=stitch_content,
+                                                                 force_fullpage=self.force_full_page_screenshot)
+            if not isinstance(element, EyesWebElement):
+                element = EyesWebElement(element, self.driver)
+            self._element_position_provider = ElementPositionProvider(self._driver, element)
+
+            origin_overflow = element.get_overflow()
+            eyes_selenium_utils.add_data_overflow_to_element(self.driver, element, origin_overflow)
+            element.set_overflow('hidden')
+
+            element_region = self._get_element_region(element)
+            self._region_to_check = element_region
+            handle = self._check_window_base(tag, match_timeout, target)
+            self._element_position_provider = None
+
+            if origin_overflow:
+                element.set_overflow(origin_overflow)
+            return handle
 
     def _get_element_region(self, element):
         #  We use a smaller size than the actual screenshot size in order to eliminate duplication
@@ -421,7 +517,7 @@ class Eyes(EyesBase):
         return element_region
 
     def check_region_by_selector(self, by, value, tag=None, match_timeout=-1, target=None, stitch_content=False):
-        # type: (tp.Text, tp.Text, tp.Optional[tp.Text], int, tp.Optional[Target], bool) -> None
+        # type: (tp.Text, tp.Text, tp.Optional[tp.Text], int, tp.Optional[Target], bool) -> tp.Optional[MatchHandle]
         """
         Takes a snapshot of the region of the element found by calling find_element(by, value)
         and matches it with the expected output.
@@ -431,13 +527,14 @@ class Eyes(EyesBase):
         :param tag: (str) Description of the visual validation checkpoint.
         :param match_timeout: (int) Timeout for the visual validation checkpoint (milliseconds).
         :param target: (Target) The target for the check_window call
-        :return: None
+        :return: None, or a MatchHandle if pipeline_uploads is enabled.
         """
         logger.debug("calling 'check_region_by_selector'...")
         # hack: prevent stale element exception by saving viewport value before catching element
-        self._driver.get_default_content_viewport_size()
-        self.check_region_by_element(self._driver.find_element(by, value), tag,
-                                     match_timeout, target, stitch_content)
+        with self._driver_checkpoint(tag or 'check_region_by_selector'):
+            self._driver.get_default_content_viewport_size()
+            return self.check_region_by_element(self._driver.find_element(by, value), tag,
+                                                match_timeout, target, stitch_content)
 
     def check_region_in_frame_by_selector(self, frame_reference,  # type: FrameReference
                                           by,  # type: tp.Text
@@ -447,7 +544,7 @@ class Eyes(EyesBase):
                                           target=None,  # type: tp.Optional[Target]
                                           stitch_content=False  # type: bool
                                           ):
-        # type: (...) -> None
+        # type: (...) -> tp.Optional[MatchHandle]
         """
         Checks a region within a frame, and returns to the current frame.
 
@@ -457,7 +554,7 @@ class Eyes(EyesBase):
         :param tag: (str) Description of the visual validation checkpoint.
         :param match_timeout: (int) Timeout for the visual validation checkpoint (milliseconds).
         :param target: (Target) The target for the check_window call
-        :return: None
+        :return: None, or a MatchHandle if pipeline_uploads is enabled.
         """
         # TODO: remove this disable
         if self.is_disabled:
@@ -466,9 +563,10 @@ class Eyes(EyesBase):
         logger.info("check_region_in_frame_by_selector('%s')" % tag)
 
         # Switching to the relevant frame
-        with self._driver.switch_to.frame_and_back(frame_reference):
+        with self._driver_checkpoint(tag or 'check_region_in_frame_by_selector'), \
+                self._driver.switch_to.frame_and_back(frame_reference):
             logger.debug("calling 'check_region_by_selector'...")
-            self.check_region_by_selector(by, value, tag, match_timeout, target, stitch_content)
+            return self.check_region_by_selector(by, value, tag, match_timeout, target, stitch_content)
 
     def add_mouse_trigger_by_element(self, action, element):
         # type: (tp.Text, AnyWebElement) -> None
@@ -7,7 +7,7 @@ from contextlib import contextmanager
 from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.remote.webdriver import WebDriver
 
-from ..core import logger, EyesError
+from ..core import logger, tracing, EyesError, Point
 
 if tp.TYPE_CHECKING:
     from applitools.utils.custom_types import AnyWebDriver, ViewPort, AnyWebElement
@@ -15,7 +15,7 @@ if tp.TYPE_CHECKING:
 
 __all__ = ('get_current_frame_content_entire_size', 'get_device_pixel_ratio', 'get_viewport_size', 'get_window_size',
            'set_window_size', 'set_browser_size', 'set_browser_size_by_viewport_size', 'set_viewport_size',
-           'hide_scrollbars', 'set_overflow')
+           'hide_scrollbars', 'set_overflow', 'PageMetrics', 'get_page_metrics')
 
 _NATIVE_APP = 'NATIVE_APP'
 _JS_GET_VIEWPORT_SIZE = """
@@ -59,6 +59,24 @@ _JS_GET_CONTENT_ENTIRE_SIZE = """
     var totalHeight = Math.max(maxDocElementHeight, maxBodyHeight);
     return [totalWidth, totalHeight];";
 """
+_JS_GET_PAGE_METRICS = """
+    var doc = document.documentElement;
+    var body = document.body;
+    var totalWidth = Math.max(doc.scrollWidth, body.scrollWidth);
+    var totalHeight = Math.max(Math.max(doc.clientHeight, doc.scrollHeight),
+                               Math.max(body.clientHeight, body.scrollHeight));
+    var width = window.innerWidth || doc.clientWidth || body.clientWidth;
+    var height = window.innerHeight || doc.clientHeight || body.clientHeight;
+    var x = window.scrollX || ((window.pageXOffset || doc.scrollLeft) - (doc.clientLeft || 0));
+    var y = window.scrollY || ((window.pageYOffset || doc.scrollTop) - (doc.clientTop || 0));
+    return {
+        entireSize: [totalWidth, totalHeight],
+        viewportSize: [width, height],
+        scrollPosition: [x, y],
+        devicePixelRatio: window.devicePixelRatio,
+        overflow: doc.style.overflow,
+        userAgent: navigator.userAgent
+    };"""
 _JS_SET_OVERFLOW = """
   return (function() {
     var origOF = document.documentElement.style.overflow;
@@ -139,6 +157,44 @@ def get_current_frame_content_entire_size(driver):
     return dict(width=width, height=height)
 
 
+class PageMetrics(object):
+    """
+    A snapshot of the metrics of the current frame's page.
+    """
+
+    def __init__(self, entire_size, viewport_size, scroll_position, device_pixel_ratio, overflow, user_agent):
+        # type: (ViewPort, ViewPort, Point, float, tp.Optional[tp.Text], tp.Optional[tp.Text]) -> None
+        self.entire_size = entire_size
+        self.viewport_size = viewport_size
+        self.scroll_position = scroll_position
+        self.device_pixel_ratio = device_pixel_ratio
+        self.overflow = overflow
+        self.user_agent = user_agent
+
+    def __str__(self):
+        return "PageMetrics(entire_size={}, viewport_size={}, scroll_position={}, device_pixel_ratio={})".format(
+            self.entire_size, self.viewport_size, self.scroll_position, self.device_pixel_ratio)
+
+
+def get_page_metrics(driver):
+    # type: (AnyWebDriver) -> PageMetrics
+    """
+    Gathers the entire size, viewport size, scroll position, device pixel ratio, overflow and
+    user agent of the current frame in a single script, rather than a round trip for each.
+
+    :raise WebDriverException: If the script failed (e.g. in native mobile contexts).
+    """
+    metrics = driver.execute_script(_JS_GET_PAGE_METRICS)
+    entire_width, entire_height = metrics['entireSize']
+    width, height = metrics['viewportSize']
+    return PageMetrics(entire_size=dict(width=int(round(entire_width)), height=int(round(entire_height))),
+                       viewport_size=dict(width=width, height=height),
+                       scroll_position=Point(*metrics['scrollPosition']),
+                       device_pixel_ratio=metrics['devicePixelRatio'],
+                       overflow=metrics['overflow'],
+                       user_agent=metrics['userAgent'])
+
+
 def get_device_pixel_ratio(driver):
     # type: (AnyWebDriver) -> float
     return driver.execute_script('return window.devicePixelRatio;')
@@ -205,6 +261,7 @@ def set_browser_size_by_viewport_size(driver, actual_viewport_size, required_siz
     return set_browser_size(driver, required_browser_size)
 
 
+@tracing.traced('set_viewport_size')
 def set_viewport_size(driver, required_size):
     # type: (AnyWebDriver, ViewPort) -> None
 
@@ -0,0 +1,216 @@
+"""
+Instrumentation of the WebDriver round trips made during checkpoints.
+"""
+from __future__ import absolute_import
+
+import contextlib
+import json
+import threading
+import time
+import typing as tp
+
+from applitools.core import logger
+from applitools.core.errors import DriverBudgetExceededError
+
+if tp.TYPE_CHECKING:
+    from applitools.utils.custom_types import AnyWebDriver
+
+__all__ = ('DriverBudget', 'DriverCallRecorder')
+
+
+def _payload_size(response):
+    # type: (tp.Optional[tp.Dict]) -> int
+    value = (response or {}).get('value')
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, tp.Text)):
+        return len(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class DriverBudget(object):
+    """
+    The maximal number of WebDriver round trips and seconds of driver time of a checkpoint.
+    """
+    WARN = "warn"
+    FAIL = "fail"
+
+    def __init__(self, max_round_trips=None, max_seconds=None, on_exceed=WARN):
+        # type: (tp.Optional[int], tp.Optional[float], tp.Text) -> None
+        """
+        :param max_round_trips: The maximal number of round trips, or None for no limit.
+        :param max_seconds: The maximal driver time in seconds, or None for no limit.
+        :param on_exceed: WARN to log a warning, or FAIL to raise DriverBudgetExceededError.
+        """
+        self.max_round_trips = max_round_trips
+        self.max_seconds = max_seconds
+        self.on_exceed = on_exceed
+
+    def violations(self, checkpoint):
+        # type: (_Checkpoint) -> tp.List[tp.Text]
+        violations = []
+        if self.max_round_trips is not None and checkpoint.round_trips > self.max_round_trips:
+            violations.append("{} round trips (budget {})".format(checkpoint.round_trips, self.max_round_trips))
+        if self.max_seconds is not None and checkpoint.seconds > self.max_seconds:
+            violations.append("{:.2f} s of driver time (budget {} s)".format(checkpoint.seconds, self.max_seconds))
+        return violations
+
+
+class _Checkpoint(object):
+    def __init__(self, name):
+        # type: (tp.Text) -> None
+        self.name = name
+        # command -> [count, seconds, payload bytes]
+        self.commands = {}  # type: tp.Dict[tp.Text, tp.List]
+
+    def record(self, command, seconds, size):
+        # type: (tp.Text, float, int) -> None
+        totals = self.commands.setdefault(command, [0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += size
+
+    @property
+    def round_trips(self):
+        # type: () -> int
+        return sum(totals[0] for totals in self.commands.values())
+
+    @property
+    def seconds(self):
+        # type: () -> float
+        return sum(totals[1] for totals in self.commands.values())
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        return dict(name=self.name,
+                    round_trips=self.round_trips,
+                    ms=int(self.seconds * 1000),
+                    commands={command: dict(count=count, ms=int(seconds * 1000), bytes=size)
+                              for command, (count, seconds, size) in self.commands.items()})
+
+
+class DriverCallRecorder(object):
+    """
+    Records the command, latency and response payload size of every WebDriver round trip made
+    during a checkpoint, including those of scripts, screenshots, frame switches and element reads.
+    Round trips made outside of checkpoints (i.e. by the test itself) are not recorded.
+    """
+
+    def __init__(self, budget=None):
+        # type: (tp.Optional[DriverBudget]) -> None
+        """
+        :param budget: An optional budget which every checkpoint is checked against.
+        """
+        self.budget = budget
+        self._checkpoints = []  # type: tp.List[_Checkpoint]
+        self._current = None  # type: tp.Optional[_Checkpoint]
+        self._driver = None  # type: tp.Optional[AnyWebDriver]
+        self._own_execute = None  # type: tp.Optional[tp.Callable]
+        self._lock = threading.Lock()
+
+    def attach(self, driver):
+        # type: (AnyWebDriver) -> None
+        """
+        Starts recording the round trips of the given (non-Eyes) driver, forgetting previous checkpoints.
+        """
+        self.detach()
+        self._checkpoints = []
+        # All the commands of the driver and its elements go through its execute method.
+        execute = driver.execute
+
+        def recorded_execute(driver_command, params=None):
+            checkpoint = self._current
+            if checkpoint is None:
+                return execute(driver_command, params)
+            response = None
+            start = time.time()
+            try:
+                response = execute(driver_command, params)
+                return response
+            finally:
+                elapsed = time.time() - start
+                with self._lock:
+                    checkpoint.record(driver_command, elapsed, _payload_size(response))
+
+        # Keeping the execute overridden on the instance, if any, to restore it on detach.
+        self._own_execute = vars(driver).get('execute')
+        driver.execute = recorded_execute
+        self._driver = driver
+
+    @property
+    def attached(self):
+        # type: () -> bool
+        return self._driver is not None
+
+    def detach(self):
+        # type: () -> None
+        """
+        Stops recording. The recorded checkpoints are kept.
+        """
+        if self._driver is not None:
+            if self._own_execute is None:
+                del self._driver.execute
+            else:
+                self._driver.execute = self._own_execute
+            self._driver = None
+
+    @contextlib.contextmanager
+    def checkpoint(self, name):
+        # type: (tp.Text) -> tp.Generator
+        """
+        Records the round trips made in the block as a checkpoint. Nested checkpoints are part of
+        the outer one.
+
+        :raise DriverBudgetExceededError: If the checkpoint exceeded a budget which fails.
+        """
+        if self._current is not None:
+            yield self._current
+            return
+        checkpoint = _Checkpoint(name)
+        self._current = checkpoint
+        try:
+            yield checkpoint
+        finally:
+            self._current = None
+            self._checkpoints.append(checkpoint)
+        self._enforce_budget(checkpoint)
+
+    def _enforce_budget(self, checkpoint):
+        # type: (_Checkpoint) -> None
+        if self.budget is None:
+            return
+        violations = self.budget.violations(checkpoint)
+        if not violations:
+            return
+        message = "Checkpoint '{}' exceeded its driver budget: {}".format(checkpoint.name, ", ".join(violations))
+        if self.budget.on_exceed == DriverBudget.FAIL:
+            raise DriverBudgetExceededError(message)
+        logger.warning(message)
+
+    def report(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        """
+        Returns the recorded checkpoints, and the totals of every command across them.
+        """
+        totals = _Checkpoint('total')
+        for checkpoint in self._checkpoints:
+            for command, (count, seconds, size) in checkpoint.commands.items():
+                command_totals = totals.commands.setdefault(command, [0, 0.0, 0])
+                command_totals[0] += count
+                command_totals[1] += seconds
+                command_totals[2] += size
+        return dict(checkpoints=[checkpoint.as_dict() for checkpoint in self._checkpoints],
+                    total=totals.as_dict())
+
+    def format_report(self):
+        # type: () -> tp.Text
+        report = self.report()
+        lines = ["WebDriver round trips per checkpoint:"]
+        for checkpoint in report['checkpoints'] + [report['total']]:
+            lines.append("  {name}: {round_trips} round trips, {ms} ms".format(**checkpoint))
+            for command, stats in sorted(checkpoint['commands'].items(), key=lambda item: -item[1]['ms']):
+                lines.append("    {}: {count} x, {ms} ms, {bytes} bytes".format(command, **stats))
+        return "\n".join(lines)
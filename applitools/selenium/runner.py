@@ -0,0 +1,189 @@
+"""
+Running many visual tests concurrently in one process, each with its own driver and Eyes.
+"""
+from __future__ import absolute_import
+
+import time
+import traceback
+import typing as tp
+from multiprocessing.pool import ThreadPool
+
+from applitools.core import logger
+from applitools.core.http_transport import ConnectionSettings, HttpTransport
+from applitools.core.test_results import TestResults
+from .eyes import Eyes
+
+if tp.TYPE_CHECKING:
+    from applitools.utils.custom_types import AnyWebDriver
+
+    DriverFactory = tp.Callable[[], AnyWebDriver]
+    TestCallable = tp.Callable[[Eyes, AnyWebDriver], tp.Any]
+
+__all__ = ('RunnerJob', 'JobResult', 'RunSummary', 'ConcurrentRunner')
+
+
+class RunnerJob(object):
+    """
+    A test to run: creates its driver with driver_factory, and is run by calling test with an
+    unopened Eyes and the driver. The test opens, checks and (optionally) closes the Eyes.
+    """
+
+    def __init__(self, driver_factory, test, name=None):
+        # type: (DriverFactory, TestCallable, tp.Optional[tp.Text]) -> None
+        self.driver_factory = driver_factory
+        self.test = test
+        self.name = name or getattr(test, '__name__', 'job')
+
+    def __str__(self):
+        return "RunnerJob({})".format(self.name)
+
+
+class JobResult(object):
+    """
+    The outcome of a job: its test results, or the error which failed it.
+    """
+
+    def __init__(self, job, test_results=None, error=None, error_traceback=None, duration=0.0):
+        # type: (RunnerJob, tp.Optional[TestResults], tp.Optional[BaseException], tp.Optional[tp.Text], float) -> None
+        self.job = job
+        self.test_results = test_results
+        self.error = error
+        self.error_traceback = error_traceback
+        self.duration = duration
+
+    @property
+    def name(self):
+        # type: () -> tp.Text
+        return self.job.name
+
+    @property
+    def is_passed(self):
+        # type: () -> bool
+        return self.error is None and self.test_results is not None and self.test_results.is_passed
+
+    def __str__(self):
+        if self.error is not None:
+            return "{}: error: {!r} ({:.1f} s)".format(self.name, self.error, self.duration)
+        return "{}: {} ({:.1f} s)".format(self.name, self.test_results, self.duration)
+
+
+class RunSummary(object):
+    """
+    The results of all the jobs of a run, in the order of the jobs.
+    """
+
+    def __init__(self, results, duration):
+        # type: (tp.List[JobResult], float) -> None
+        self.results = results
+        self.duration = duration
+
+    @property
+    def passed(self):
+        # type: () -> int
+        return sum(1 for result in self.results if result.is_passed)
+
+    @property
+    def errors(self):
+        # type: () -> int
+        return sum(1 for result in self.results if result.error is not None)
+
+    @property
+    def failed(self):
+        # type: () -> int
+        return len(self.results) - self.passed - self.errors
+
+    @property
+    def all_passed(self):
+        # type: () -> bool
+        return self.passed == len(self.results)
+
+    @property
+    def test_results(self):
+        # type: () -> tp.List[tp.Optional[TestResults]]
+        return [result.test_results for result in self.results]
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def __str__(self):
+        lines = ["{} jobs in {:.1f} s: {} passed, {} failed, {} errors".format(
+            len(self.results), self.duration, self.passed, self.failed, self.errors)]
+        lines.extend("  {}".format(result) for result in self.results)
+        return '\n'.join(lines)
+
+
+class ConcurrentRunner(object):
+    """
+    Runs jobs on a bounded pool of threads. Every job gets its own driver and Eyes instance, while
+    the connection pool to the Eyes server (and the process-wide render info and stylesheet caches)
+    are shared by all of them. A job failing doesn't affect the others.
+    """
+    DEFAULT_WORKERS = 4
+
+    def __init__(self,
+                 max_workers=DEFAULT_WORKERS,  # type: int
+                 eyes_factory=Eyes,  # type: tp.Callable[[], Eyes]
+                 connection_settings=None,  # type: tp.Optional[ConnectionSettings]
+                 quit_drivers=True,  # type: bool
+                 ):
+        # type: (...) -> None
+        """
+        :param max_workers: The number of jobs run at once.
+        :param eyes_factory: Creates (and configures) the Eyes instance of every job.
+        :param connection_settings: The settings of the shared connection pool. Defaults to keeping
+            a connection per worker.
+        :param quit_drivers: Whether to quit the drivers of the jobs once they end.
+        """
+        self.max_workers = max(1, max_workers)
+        self.eyes_factory = eyes_factory
+        self.connection_settings = connection_settings or ConnectionSettings(pool_maxsize=self.max_workers)
+        self.quit_drivers = quit_drivers
+        self.connection_stats = None  # type: tp.Optional[tp.Dict[tp.Text, int]]
+
+    def _run_job(self, job, transport):
+        # type: (RunnerJob, HttpTransport) -> JobResult
+        start = time.time()
+        driver = None
+        eyes = self.eyes_factory()
+        eyes.transport = transport
+        try:
+            driver = job.driver_factory()
+            returned = job.test(eyes, driver)
+            if eyes.is_open:
+                test_results = eyes.close(raise_ex=False)
+            else:
+                test_results = returned if isinstance(returned, TestResults) else None
+            return JobResult(job, test_results, duration=time.time() - start)
+        except Exception as e:
+            logger.info("{} failed: {!r}".format(job, e))
+            return JobResult(job, error=e, error_traceback=traceback.format_exc(), duration=time.time() - start)
+        finally:
+            eyes.abort_if_not_closed()
+            if driver is not None and self.quit_drivers:
+                try:
+                    driver.quit()
+                except Exception as e:
+                    logger.info("Failed to quit the driver of {}: {!r}".format(job, e))
+
+    def run(self, jobs):
+        # type: (tp.Iterable[tp.Union[RunnerJob, tp.Tuple[DriverFactory, TestCallable]]]) -> RunSummary
+        """
+        Runs the jobs, given as RunnerJob or (driver factory, test) tuples, and waits for all of them.
+        """
+        jobs = [job if isinstance(job, RunnerJob) else RunnerJob(*job) for job in jobs]
+        transport = HttpTransport(self.connection_settings)
+        start = time.time()
+        pool = ThreadPool(min(self.max_workers, max(len(jobs), 1)))
+        try:
+            results = pool.map(lambda job: self._run_job(job, transport), jobs)
+        finally:
+            pool.close()
+            pool.join()
+            self.connection_stats = transport.connection_stats
+            transport.close()
+        summary = RunSummary(results, time.time() - start)
+        logger.info(str(summary))
+        return summary
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 import base64
 import contextlib
+import functools
 import time
 import typing as tp
 
@@ -16,6 +17,8 @@ from applitools.core import logger
 from applitools.core.errors import EyesError
 from applitools.core.geometry import Point, Region
 from applitools.utils import cached_property, image_utils, general_utils
+from applitools.utils.caching import ScopedCache
+from applitools.utils.stitching import PartDecoder, PartStitcher, StageTimings, create_canvas
 from . import eyes_selenium_utils, StitchMode
 from .positioning import ElementPositionProvider, build_position_provider_for, ScrollPositionProvider
 from .webelement import EyesWebElement
@@ -25,6 +28,7 @@ if tp.TYPE_CHECKING:
     from applitools.core.scaling import ScaleProvider
     from applitools.utils.custom_types import Num, ViewPort, FrameReference, AnyWebDriver, AnyWebElement
     from .eyes import Eyes
+    from .eyes_selenium_utils import PageMetrics
 
 
 class FrameResolver(object):
@@ -84,6 +88,7 @@ class _EyesSwitchTo(object):
         frame = FrameResolver(frame_reference, self._driver)
         self.will_switch_to_frame(frame.eyes_webelement)
         self._switch_to.frame(frame.webelement)
+        self._driver.invalidate_page_metrics()
 
     def frames(self, frame_chain):
         # type: (FrameChain) -> None
@@ -93,6 +98,7 @@ class _EyesSwitchTo(object):
         :param frame_chain: A list of frames.
         """
         self._switch_to.default_content()
+        self._driver.invalidate_page_metrics()
         for frame in frame_chain:
             self.frame(frame.reference)
 
@@ -103,6 +109,7 @@ class _EyesSwitchTo(object):
         """
         self._driver.frame_chain.clear()
         self._switch_to.default_content()
+        self._driver.invalidate_page_metrics()
 
     def parent_frame(self):
         """
@@ -111,6 +118,7 @@ class _EyesSwitchTo(object):
         frames = self._driver.frame_chain
         if frames:
             frames.pop()
+            self._driver.invalidate_page_metrics()
 
             try:
                 self._switch_to.parent_frame()
@@ -126,6 +134,7 @@ class _EyesSwitchTo(object):
         """
         self._driver.frame_chain.clear()
         self._switch_to.window(window_name)
+        self._driver.invalidate_page_metrics()
 
     def will_switch_to_frame(self, target_frame):
         # type: (EyesWebElement) -> None
@@ -188,6 +197,13 @@ class EyesWebDriver(object):
         # calculate elements' coordinates
         self._frame_chain = FrameChain()
         self._default_content_viewport_size = None  # type: tp.Optional[ViewPort]
+        # Memoizes read-only queries (page metrics, capabilities) for the duration of a check.
+        self.command_cache = ScopedCache()
+        # The counts of real and cached queries of the last check.
+        self.last_check_command_stats = None  # type: tp.Optional[tp.Dict[tp.Text, int]]
+        self._part_decoder = None  # type: tp.Optional[PartDecoder]
+        # The time spent in every stage of the last stitched screenshot.
+        self.stitching_timings = None  # type: tp.Optional[StageTimings]
 
         self.driver_takes_screenshot = driver.capabilities.get('takesScreenshot', False)
 
@@ -210,7 +226,8 @@ class EyesWebDriver(object):
 
         :return: The rotation of the screenshot we get from the webdriver in (degrees).
         """
-        if self.platform_name == 'Android' and self.driver.orientation == "LANDSCAPE":
+        if self.platform_name == 'Android' and \
+                self.command_cache.get('orientation', lambda: self.driver.orientation) == "LANDSCAPE":
             return -90
         return 0
 
@@ -251,6 +268,9 @@ class EyesWebDriver(object):
 
     @cached_property
     def user_agent(self):
+        page_metrics = self.get_page_metrics()
+        if page_metrics is not None and page_metrics.user_agent:
+            return page_metrics.user_agent
         try:
             user_agent = self.driver.execute_script("return navigator.userAgent")
             logger.info("user agent: {}".format(user_agent))
@@ -266,7 +286,7 @@ class EyesWebDriver(object):
 
         :return: True if the platform running the test is a mobile platform. False otherwise.
         """
-        return eyes_selenium_utils.is_mobile_device(self.driver)
+        return self.command_cache.get('is_mobile_device', lambda: eyes_selenium_utils.is_mobile_device(self.driver))
 
     def get(self, url):
         # type: (tp.Text) -> tp.Optional[tp.Any]
@@ -278,6 +298,7 @@ class EyesWebDriver(object):
         """
         # We're loading a new page, so the frame location resets
         self._frame_chain.clear()
+        self.command_cache.invalidate()
         return self.driver.get(url)
 
     def find_element(self, by=By.ID, value=None):
@@ -459,6 +480,49 @@ class EyesWebDriver(object):
         """
         return self.find_elements(by=By.CSS_SELECTOR, value=css_selector)
 
+    @staticmethod
+    def _rotate_screenshot(screenshot, display_rotation):
+        # type: (Image.Image, int) -> Image.Image
+        if display_rotation == -90:
+            logger.debug('Rotating...')
+            return screenshot.rotate(90)
+        return screenshot
+
+    @staticmethod
+    def _rotating_transform(display_rotation, transform=None):
+        # type: (int, tp.Optional[tp.Callable[[Image.Image], Image.Image]]) -> tp.Optional[tp.Callable]
+        """
+        Returns transform preceded by the rotation of the screenshot, for decoding parts in the background.
+        """
+        if display_rotation == 0:
+            return transform
+
+        def rotate_and_transform(image):
+            image = EyesWebDriver._rotate_screenshot(image, display_rotation)
+            return image if transform is None else transform(image)
+        return rotate_and_transform
+
+    def get_screenshot_as_image(self):
+        # type: () -> Image.Image
+        """
+        Gets the screenshot of the current window as a decoded image, rotated as displayed.
+        """
+        # The base64 string is freed once decoded and the png bytes once loaded, so at most
+        # two of the three are alive at any time.
+        screenshot = image_utils.load_image(base64.b64decode(self.driver.get_screenshot_as_base64()))
+        return self._rotate_screenshot(screenshot, self.get_display_rotation())
+
+    def get_screenshot_as_image_from_main_frame(self):
+        # type: () -> Image.Image
+        """
+        Make screenshot from main frame
+        """
+        original_frame = self.frame_chain.clone()
+        self.switch_to.default_content()
+        screenshot = self.get_screenshot_as_image()
+        self.switch_to.frames(original_frame)
+        return screenshot
+
     def get_screenshot_as_base64(self):
         # type: () -> tp.Text
         """
@@ -469,15 +533,8 @@ class EyesWebDriver(object):
         display_rotation = self.get_display_rotation()
         if display_rotation != 0:
             logger.info('Rotation required.')
-            # num_quadrants = int(-(display_rotation / 90))
-            logger.debug('Done! Creating image object...')
-            screenshot = image_utils.image_from_base64(screenshot64)
-
-            # rotating
-            if display_rotation == -90:
-                screenshot64 = image_utils.get_base64(screenshot.rotate(90))
-            logger.debug('Done! Rotating...')
-
+            screenshot = image_utils.load_image(base64.b64decode(screenshot64))
+            screenshot64 = image_utils.get_base64(self._rotate_screenshot(screenshot, display_rotation))
         return screenshot64
 
     def get_screesnhot_as_base64_from_main_frame(self):
@@ -498,6 +555,9 @@ class EyesWebDriver(object):
 
         :return: The width of the full page.
         """
+        page_metrics = self.get_page_metrics()
+        if page_metrics is not None:
+            return page_metrics.entire_size['width']
         # noinspection PyUnresolvedReferences
         default_scroll_width = int(round(self.driver.execute_script(
                 "return document.documentElement.scrollWidth")))
@@ -515,6 +575,9 @@ class EyesWebDriver(object):
         scrollHeight might be smaller(!) than the clientHeight, which is why we take the
         maximum between them.
         """
+        page_metrics = self.get_page_metrics()
+        if page_metrics is not None:
+            return page_metrics.entire_size['height']
         # noinspection PyUnresolvedReferences
         default_client_height = int(round(self.driver.execute_script(
                 "return document.documentElement.clientHeight")))
@@ -536,6 +599,9 @@ class EyesWebDriver(object):
 
         :return: The scroll position.
         """
+        page_metrics = self.get_page_metrics()
+        if page_metrics is not None:
+            return page_metrics.scroll_position
         return self._origin_position_provider.get_current_position()
 
     def scroll_to(self, point):
@@ -546,6 +612,7 @@ class EyesWebDriver(object):
         :param point: The point to scroll to.
         """
         self._origin_position_provider.set_position(point)
+        self.invalidate_page_metrics()
 
     def get_entire_page_size(self):
         # type: () -> tp.Dict[tp.Text, int]
@@ -554,6 +621,9 @@ class EyesWebDriver(object):
 
         :return: The page width and height.
         """
+        page_metrics = self.get_page_metrics()
+        if page_metrics is not None:
+            return dict(page_metrics.entire_size)
         return {'width':  self.extract_full_page_width(),
                 'height': self.extract_full_page_height()}
 
@@ -579,6 +649,7 @@ class EyesWebDriver(object):
                      "return origOverflow;".format(overflow)
         # noinspection PyUnresolvedReferences
         original_overflow = self.driver.execute_script(script)
+        self.invalidate_page_metrics()
         logger.debug("Original overflow: %s" % original_overflow)
         if stabilization_time is not None:
             time.sleep(stabilization_time / 1000)
@@ -631,7 +702,60 @@ class EyesWebDriver(object):
         Returns:
             The viewport size of the current frame.
         """
-        return eyes_selenium_utils.get_viewport_size(self)
+        page_metrics = self.get_page_metrics()
+        if page_metrics is not None:
+            return dict(page_metrics.viewport_size)
+        return eyes_selenium_utils.get_viewport_size(self.driver)
+
+    def get_page_metrics(self, force_query=False):
+        # type: (bool) -> tp.Optional[PageMetrics]
+        """
+        Gets the entire size, viewport size, scroll position, device pixel ratio, overflow and user agent
+        of the current frame in a single script. During a check they are cached until the next
+        navigation, scroll, frame switch, overflow or window size change, or script executed through
+        this driver.
+
+        :return: The page metrics, or None if they can't be gathered by script.
+        """
+        if force_query:
+            self.invalidate_page_metrics()
+        # False is cached if the script failed, so it isn't retried during the check.
+        return self.command_cache.get('page_metrics', self._query_page_metrics) or None
+
+    def _query_page_metrics(self):
+        # type: () -> tp.Union[PageMetrics, bool]
+        try:
+            page_metrics = eyes_selenium_utils.get_page_metrics(self.driver)
+            logger.debug("{}", page_metrics)
+            return page_metrics
+        except WebDriverException as e:
+            logger.debug("Failed to get page metrics: {}".format(e))
+            return False
+
+    def invalidate_page_metrics(self):
+        # type: () -> None
+        """
+        Discards the cached page metrics, so they are queried again on next use.
+        """
+        self.command_cache.invalidate('page_metrics')
+
+    def begin_check(self):
+        # type: () -> None
+        """
+        Starts caching read-only queries, until end_check.
+        """
+        self.command_cache.begin()
+
+    def end_check(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Stops caching read-only queries.
+
+        :return: The number of queries which were run (real) and answered from the cache (cached) during the check.
+        """
+        self.last_check_command_stats = self.command_cache.end()
+        logger.debug("WebDriver queries of the check: {real} real, {cached} cached", **self.last_check_command_stats)
+        return self.last_check_command_stats
 
     def get_default_content_viewport_size(self, force_query=False):
         # type: (bool) -> ViewPort
@@ -664,6 +788,7 @@ class EyesWebDriver(object):
         """
         self._origin_position_provider.push_state()
         self._origin_position_provider.set_position(Point(0, 0))
+        self.invalidate_page_metrics()
         current_scroll_position = self._origin_position_provider.get_current_position()
         if current_scroll_position.x != 0 or current_scroll_position.y != 0:
             self._origin_position_provider.pop_state()
@@ -675,6 +800,7 @@ class EyesWebDriver(object):
         Restore the origin position.
         """
         self._origin_position_provider.pop_state()
+        self.invalidate_page_metrics()
 
     def save_position(self):
         """
@@ -687,10 +813,11 @@ class EyesWebDriver(object):
         Restore the position.
         """
         self._position_provider.pop_state()
+        self.invalidate_page_metrics()
 
     @staticmethod
     def _wait_before_screenshot(seconds):
-        logger.debug("Waiting {} ms before taking screenshot..".format(int(seconds * 1000)))
+        logger.debug("Waiting {:.0f} ms before taking screenshot..", seconds * 1000)
         time.sleep(seconds)
         logger.debug("Finished waiting!")
 
@@ -711,17 +838,18 @@ class EyesWebDriver(object):
         self.reset_origin()
 
         entire_page_size = self.get_entire_page_size()
+        canvas = create_canvas(self._eyes.stitching_engine,
+                               (entire_page_size['width'], entire_page_size['height']))
 
         # Starting with the screenshot at 0,0
         EyesWebDriver._wait_before_screenshot(wait_before_screenshots)
-        part64 = self.get_screenshot_as_base64()
-        screenshot = image_utils.image_from_bytes(base64.b64decode(part64))
+        screenshot = self.get_screenshot_as_image()
 
         scale_provider.update_scale_ratio(screenshot.width)
         pixel_ratio = 1.0 / scale_provider.scale_ratio
         need_to_scale = True if pixel_ratio != 1.0 else False
         if need_to_scale:
-            screenshot = image_utils.scale_image(screenshot, 1.0 / pixel_ratio)
+            screenshot = canvas.scale(screenshot, 1.0 / pixel_ratio)
 
         # IMPORTANT This is required! Since when calculating the screenshot parts for full size,
         # we use a screenshot size which is a bit smaller (see comment below).
@@ -738,43 +866,67 @@ class EyesWebDriver(object):
                                 'height': max(screenshot.height - self._MAX_SCROLL_BAR_SIZE,
                                               self._MIN_SCREENSHOT_PART_HEIGHT)}
 
-        logger.debug("Total size: {0}, Screenshot part size: {1}".format(entire_page_size,
-                                                                         screenshot_part_size))
+        logger.debug("Total size: {0}, Screenshot part size: {1}", entire_page_size, screenshot_part_size)
 
         entire_page = Region(0, 0, entire_page_size['width'], entire_page_size['height'])
         screenshot_parts = entire_page.get_sub_regions(screenshot_part_size)
 
         # Starting with the screenshot we already captured at (0,0).
-        stitched_image = Image.new('RGBA', (entire_page.width, entire_page.height))
-        stitched_image.paste(screenshot, box=(0, 0))
+        canvas.paste(screenshot, (0, 0))
+        timings = StageTimings()
+        transform = functools.partial(canvas.scale, scale_ratio=1.0 / pixel_ratio) if need_to_scale else None
+        stitcher = PartStitcher(self.part_decoder, canvas, timings)
         self.save_position()
         for part in screenshot_parts:
             # Since we already took the screenshot for 0,0
             if part.left == 0 and part.top == 0:
                 logger.debug('Skipping screenshot for 0,0 (already taken)')
                 continue
-            logger.debug("Taking screenshot for {0}".format(part))
+            logger.debug("Taking screenshot for {0}", part)
             # Scroll to the part's top/left and give it time to stabilize.
-            self._position_provider.set_position(Point(part.left, part.top))
+            with timings.stage('scroll'):
+                self._position_provider.set_position(Point(part.left, part.top))
+                self.invalidate_page_metrics()
             # self.scroll_to(Point(part.left, part.top))
             EyesWebDriver._wait_before_screenshot(wait_before_screenshots)
-            # Since screen size might cause the scroll to reach only part of the way
-            current_scroll_position = self._position_provider.get_current_position()
-            logger.debug("Scrolled To ({0},{1})".format(current_scroll_position.x,
-                                                        current_scroll_position.y))
-            part64 = self.get_screenshot_as_base64()
-            part_image = image_utils.image_from_bytes(base64.b64decode(part64))
-
-            if need_to_scale:
-                part_image = image_utils.scale_image(part_image, 1.0 / pixel_ratio)
-
-            stitched_image.paste(part_image, box=(current_scroll_position.x, current_scroll_position.y))
+            with timings.stage('capture'):
+                # Since screen size might cause the scroll to reach only part of the way
+                current_scroll_position = self._position_provider.get_current_position()
+                logger.debug("Scrolled To ({0},{1})", current_scroll_position.x, current_scroll_position.y)
+                # The part is decoded and rotated once, on the decoder, rather than re-encoded here.
+                part64 = self.driver.get_screenshot_as_base64()
+                part_transform = self._rotating_transform(self.get_display_rotation(), transform)
+            # Decoding and scaling happen in the background while the browser moves to the next part.
+            stitcher.add(part64, part_transform, (current_scroll_position.x, current_scroll_position.y))
 
         self.restore_position()
         self.restore_origin()
         self.switch_to.frames(original_frame)
 
-        return stitched_image
+        stitcher.finish()
+        self._report_stitching_timings(timings)
+        return canvas.to_image()
+
+    @property
+    def part_decoder(self):
+        # type: () -> PartDecoder
+        """
+        Returns the pool on which screenshot parts are decoded and scaled.
+        """
+        if self._part_decoder is None:
+            self._part_decoder = PartDecoder(self._eyes.stitching_workers)
+        return self._part_decoder
+
+    def close_part_decoder(self):
+        # type: () -> None
+        if self._part_decoder is not None:
+            self._part_decoder.close()
+            self._part_decoder = None
+
+    def _report_stitching_timings(self, timings):
+        # type: (StageTimings) -> None
+        self.stitching_timings = timings
+        logger.debug("Stitching timings: {}", timings)
 
     def get_stitched_screenshot(self, element_region, wait_before_screenshots, scale_provider):
         # type: (Region, int, ScaleProvider) -> Image.Image
@@ -789,7 +941,7 @@ class EyesWebDriver(object):
         logger.info('getting stitched element screenshot..')
         self._position_provider = self._eyes._element_position_provider
         entire_size = self._position_provider.get_entire_size()
-        logger.debug("Element region: {}".format(element_region))
+        logger.debug("Element region: {}", element_region)
         # Firefox 60 and above make a screenshot of the current frame when other browsers
         # make a screenshot of the viewport. So we scroll down to frame at _will_switch_to method
         # and add a left margin here.
@@ -806,7 +958,7 @@ class EyesWebDriver(object):
 
         screenshot_parts = entire_element.get_sub_regions(screenshot_part_size)
         viewport = self.get_viewport_size()
-        screenshot = image_utils.image_from_bytes(base64.b64decode(self.get_screenshot_as_base64()))
+        screenshot = self.get_screenshot_as_image()
         scale_provider.update_scale_ratio(screenshot.width)
         pixel_ratio = 1 / scale_provider.scale_ratio
         need_to_scale = True if pixel_ratio != 1.0 else False
@@ -815,40 +967,49 @@ class EyesWebDriver(object):
             element_region = element_region.scale(scale_provider.device_pixel_ratio)
 
         # Starting with element region size part of the screenshot. Use it as a size template.
-        stitched_image = Image.new('RGBA', (entire_element.width, entire_element.height))
-        for part in screenshot_parts:
-            logger.debug("Taking screenshot for {0}".format(part))
-            # Scroll to the part's top/left and give it time to stabilize.
-            self._position_provider.set_position(Point(part.left, part.top))
-            EyesWebDriver._wait_before_screenshot(wait_before_screenshots)
-            # Since screen size might cause the scroll to reach only part of the way
-            current_scroll_position = self._position_provider.get_current_position()
-            logger.debug("Scrolled To ({0},{1})".format(current_scroll_position.x,
-                                                        current_scroll_position.y))
-            part64 = self.get_screenshot_as_base64()
-            part_image = image_utils.image_from_bytes(base64.b64decode(part64))
-            # Cut to viewport size the full page screenshot of main frame for some browsers
-            if self._frame_chain:
-                if (self.browser_name == 'firefox' and self.browser_version < 60.0
-                        or self.browser_name in ('internet explorer', 'safari')):
-                    # TODO: Refactor this to make main screenshot only once
-                    frame_scroll_position = int(self._frame_chain.peek.location.y)
-                    part_image = image_utils.get_image_part(part_image, Region(top=frame_scroll_position,
-                                                                               height=viewport['height'],
-                                                                               width=viewport['width']))
+        canvas = create_canvas(self._eyes.stitching_engine, (entire_element.width, entire_element.height))
+        # Cut to viewport size the full page screenshot of main frame for some browsers
+        frame_region = None
+        if self._frame_chain:
+            if (self.browser_name == 'firefox' and self.browser_version < 60.0
+                    or self.browser_name in ('internet explorer', 'safari')):
+                # TODO: Refactor this to make main screenshot only once
+                frame_scroll_position = int(self._frame_chain.peek.location.y)
+                frame_region = Region(top=frame_scroll_position,
+                                      height=viewport['height'],
+                                      width=viewport['width'])
+
+        def transform(part_image):
+            if frame_region is not None:
+                part_image = image_utils.get_image_part(part_image, frame_region)
             # We cut original image before scaling to prevent appearing of artifacts
             part_image = image_utils.get_image_part(part_image, element_region)
             if need_to_scale:
-                part_image = image_utils.scale_image(part_image, 1.0 / pixel_ratio)
-
-            # first iteration
-            if stitched_image is None:
-                stitched_image = part_image
-                continue
-            stitched_image.paste(part_image, box=(current_scroll_position.x, current_scroll_position.y))
+                part_image = canvas.scale(part_image, 1.0 / pixel_ratio)
+            return part_image
 
+        timings = StageTimings()
+        stitcher = PartStitcher(self.part_decoder, canvas, timings)
+        for part in screenshot_parts:
+            logger.debug("Taking screenshot for {0}", part)
+            # Scroll to the part's top/left and give it time to stabilize.
+            with timings.stage('scroll'):
+                self._position_provider.set_position(Point(part.left, part.top))
+                self.invalidate_page_metrics()
+            EyesWebDriver._wait_before_screenshot(wait_before_screenshots)
+            with timings.stage('capture'):
+                # Since screen size might cause the scroll to reach only part of the way
+                current_scroll_position = self._position_provider.get_current_position()
+                logger.debug("Scrolled To ({0},{1})", current_scroll_position.x, current_scroll_position.y)
+                # The part is decoded and rotated once, on the decoder, rather than re-encoded here.
+                part64 = self.driver.get_screenshot_as_base64()
+                part_transform = self._rotating_transform(self.get_display_rotation(), transform)
+            stitcher.add(part64, part_transform, (current_scroll_position.x, current_scroll_position.y))
+
+        stitcher.finish()
+        self._report_stitching_timings(timings)
         self._position_provider = self._origin_position_provider
-        return stitched_image
+        return canvas.to_image()
 
     @property
     def switch_to(self):
@@ -867,6 +1028,8 @@ class EyesWebDriver(object):
         return Point(x, y)
 
     def execute_script(self, script, *args):
+        # The script may change anything on the page.
+        self.invalidate_page_metrics()
         return self.driver.execute_script(script, *args)
 
     def get_window_size(self, windowHandle='current'):
@@ -874,6 +1037,8 @@ class EyesWebDriver(object):
 
     def set_window_size(self, width, height, windowHandle='current'):
         self.driver.set_window_size(width, height, windowHandle)
+        # Resizing may change the orientation as well.
+        self.command_cache.invalidate()
 
     def set_window_position(self, x, y, windowHandle='current'):
         self.driver.set_window_position(x, y, windowHandle)
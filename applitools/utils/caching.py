@@ -0,0 +1,193 @@
+"""
+Thread-safe caches.
+"""
+from __future__ import absolute_import
+
+import threading
+import typing as tp
+from collections import OrderedDict
+
+__all__ = ('LRUCache', 'SizedLRUCache', 'ScopedCache')
+
+_MISSING = object()
+
+
+class LRUCache(object):
+    """
+    A thread-safe mapping which keeps up to maxsize entries, evicting the least recently used.
+    """
+
+    def __init__(self, maxsize=1024):
+        # type: (int) -> None
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        # type: (tp.Hashable, tp.Any) -> tp.Any
+        with self._lock:
+            value = self._data.pop(key, _MISSING)
+            if value is _MISSING:
+                return default
+            # Re-inserting moves the key to the most recently used end.
+            self._data[key] = value
+            return value
+
+    def put(self, key, value):
+        # type: (tp.Hashable, tp.Any) -> None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        # type: (tp.Hashable, tp.Any) -> tp.Any
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        # type: () -> None
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SizedLRUCache(LRUCache):
+    """
+    An LRUCache bounded by the total size of its values, as measured by sizeof, rather than by
+    their number. A value larger than max_size is not kept.
+    """
+
+    def __init__(self, max_size, sizeof=len):
+        # type: (int, tp.Callable[[tp.Any], int]) -> None
+        super(SizedLRUCache, self).__init__(maxsize=0)
+        self.max_size = max_size
+        self._sizeof = sizeof
+        self._sizes = {}  # type: tp.Dict[tp.Hashable, int]
+        self._total_size = 0
+
+    @property
+    def total_size(self):
+        # type: () -> int
+        with self._lock:
+            return self._total_size
+
+    def _discard(self, key):
+        # type: (tp.Hashable) -> tp.Any
+        value = self._data.pop(key, _MISSING)
+        if value is not _MISSING:
+            self._total_size -= self._sizes.pop(key)
+        return value
+
+    def put(self, key, value):
+        # type: (tp.Hashable, tp.Any) -> None
+        size = self._sizeof(value)
+        with self._lock:
+            self._discard(key)
+            if size > self.max_size:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self._total_size += size
+            while self._total_size > self.max_size:
+                self._discard(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        # type: (tp.Hashable, tp.Any) -> tp.Any
+        with self._lock:
+            value = self._discard(key)
+            return default if value is _MISSING else value
+
+    def clear(self):
+        # type: () -> None
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._total_size = 0
+
+
+class ScopedCache(object):
+    """
+    Memoizes the results of queries while a scope (e.g. a check) is open, and counts how many
+    queries were run and how many were answered from the cache. Outside a scope every query is run.
+    """
+
+    def __init__(self):
+        self._data = {}  # type: tp.Dict[tp.Hashable, tp.Any]
+        self._lock = threading.Lock()
+        self._active = False
+        self._real = 0
+        self._cached = 0
+
+    @property
+    def active(self):
+        # type: () -> bool
+        return self._active
+
+    def begin(self):
+        # type: () -> None
+        """
+        Opens a scope, starting with an empty cache and zeroed counts.
+        """
+        with self._lock:
+            self._data.clear()
+            self._real = self._cached = 0
+            self._active = True
+
+    def end(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Closes the scope and empties the cache.
+
+        :return: The counts of the scope, as `stats`.
+        """
+        with self._lock:
+            self._data.clear()
+            self._active = False
+            return dict(real=self._real, cached=self._cached)
+
+    def get(self, key, query):
+        # type: (tp.Hashable, tp.Callable[[], tp.Any]) -> tp.Any
+        """
+        Returns the cached result of key, or runs query and caches its result if a scope is open.
+        """
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._cached += 1
+                return value
+            self._real += 1
+        # Not holding the lock while querying, as the query may invalidate other keys.
+        value = query()
+        with self._lock:
+            if self._active:
+                self._data[key] = value
+        return value
+
+    def invalidate(self, *keys):
+        # type: (*tp.Hashable) -> None
+        """
+        Drops the given keys, or all of them if none are given.
+        """
+        with self._lock:
+            if not keys:
+                self._data.clear()
+            for key in keys:
+                self._data.pop(key, None)
+
+    @property
+    def stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        """
+        Returns the number of queries run (real) and answered from the cache (cached) in the scope.
+        """
+        with self._lock:
+            return dict(real=self._real, cached=self._cached)
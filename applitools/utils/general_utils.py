@@ -10,7 +10,7 @@ import itertools
 import typing as tp
 from datetime import timedelta, tzinfo
 
-from applitools.core import logger
+from applitools.core import logger, tracing
 from .compat import urlparse, Queue
 
 if tp.TYPE_CHECKING:
@@ -151,7 +151,8 @@ def is_url_with_scheme(url):
 def timeit(method):
     def timed(*args, **kw):
         ts = time.time()
-        result = method(*args, **kw)
+        with tracing.span(method.__name__):
+            result = method(*args, **kw)
         te = time.time()
 
         if 'log_time' in kw:
@@ -4,19 +4,28 @@ Utilities for image manipulation.
 from __future__ import absolute_import
 
 import base64
+import hashlib
 import io
 import math
+import struct
+import threading
+import time
 import typing as tp
+import zlib
+from multiprocessing.pool import ThreadPool
 
-from PIL import Image
+from PIL import Image, ImageChops
 
+from applitools.core import tracing
 from applitools.core.errors import EyesError
+from .compat import PY3
 
 if tp.TYPE_CHECKING:
     from ..core.geometry import Region
 
-__all__ = ('image_from_file', 'image_from_bytes', 'image_from_base64',
-           'scale_image', 'get_base64', 'get_bytes', 'get_image_part')
+__all__ = ('image_from_file', 'image_from_bytes', 'image_from_base64', 'load_image',
+           'scale_image', 'get_base64', 'get_bytes', 'get_image_part',
+           'ImageFingerprint', 'get_fingerprint', 'PngEncoder')
 
 
 def image_from_file(f):
@@ -48,15 +57,36 @@ def image_from_base64(base64_str):
     return Image.open(io.BytesIO(base64.b64decode(base64_str)))
 
 
-def scale_image(image, scale_ratio):
-    # type: (Image.Image, float) -> Image.Image
+def load_image(png_bytes):
+    # type: (bytes) -> Image.Image
+    """
+    Decodes the given png bytes right away, rather than on first access as image_from_bytes does.
+    The returned image keeps no reference to png_bytes, so they can be freed as soon as it returns.
+
+    :param png_bytes: Png bytes.
+    :return: Image instance.
+    """
+    image = Image.open(io.BytesIO(png_bytes))
+    image.load()
+    return image
+
+
+@tracing.traced('scale')
+def scale_image(image, scale_ratio, keep_mode=False):
+    # type: (Image.Image, float, bool) -> Image.Image
+    """
+    Scales the image by scale_ratio.
+
+    :param keep_mode: If True, RGB and RGBA images are scaled in their own mode rather than converted to RGBA.
+    """
     if scale_ratio == 1:
         return image
 
     image_ratio = float(image.height) / float(image.width)
     scale_width = int(math.ceil(image.width * scale_ratio))
     scale_height = int(math.ceil(scale_width * image_ratio))
-    image = image.convert('RGBA')
+    if not (keep_mode and image.mode in ('RGB', 'RGBA')):
+        image = image.convert('RGBA')
     scaled_image = image.resize((scale_width, scale_height), resample=Image.BICUBIC)
     return scaled_image
 
@@ -79,13 +109,16 @@ def get_base64(image):
     return image64
 
 
-def get_bytes(image):
-    # type: (Image.Image) -> bytes
+def get_bytes(image, encoder=None):
+    # type: (Image.Image, tp.Optional[PngEncoder]) -> bytes
     """
     Gets the image bytes.
 
+    :param encoder: The encoder to use. None means Pillow's defaults.
     :return: The image bytes.
     """
+    if encoder is not None:
+        return encoder.encode(image)
     image_bytes_stream = io.BytesIO()
     image.save(image_bytes_stream, format='PNG')
     image_bytes = image_bytes_stream.getvalue()
@@ -103,3 +136,211 @@ def get_image_part(image, region):
     if region.is_empty():
         raise EyesError('region is empty!')
     return image.crop(box=(region.left, region.top, region.right, region.bottom))
+
+
+class ImageFingerprint(object):
+    """
+    A compact summary of an image: an exact digest of its pixels and a perceptual difference
+    hash, which is robust to tiny changes (e.g., antialiasing) but not to layout changes.
+    """
+    __slots__ = ('size', 'digest', 'dhash')
+
+    HASH_SIZE = 8
+
+    def __init__(self, size, digest, dhash):
+        # type: (tp.Tuple[int, int], tp.Text, int) -> None
+        self.size = size
+        self.digest = digest
+        self.dhash = dhash
+
+    def __eq__(self, other):
+        return isinstance(other, ImageFingerprint) and self.size == other.size and self.digest == other.digest
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.size, self.digest))
+
+    def distance(self, other):
+        # type: (ImageFingerprint) -> int
+        """
+        Returns the number of differing bits of the perceptual hashes, from 0 (similar) to 64.
+        """
+        return bin(self.dhash ^ other.dhash).count('1')
+
+    def __str__(self):
+        return "ImageFingerprint(size={}, digest={}, dhash={:016x})".format(self.size, self.digest, self.dhash)
+
+
+def get_fingerprint(image):
+    # type: (Image.Image) -> ImageFingerprint
+    """
+    Computes the fingerprint of the image, which is much cheaper than encoding it as PNG.
+    """
+    digest = hashlib.sha1(image.mode.encode('ascii'))
+    digest.update(image.tobytes())
+    hash_size = ImageFingerprint.HASH_SIZE
+    small = image.convert('L').resize((hash_size + 1, hash_size), resample=Image.BILINEAR)
+    pixels = bytearray(small.tobytes())
+    dhash = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            dhash = (dhash << 1) | (left > right)
+    return ImageFingerprint(image.size, digest.hexdigest(), dhash)
+
+
+class PngEncoder(object):
+    """
+    Encodes images as PNG with configurable trade-offs between CPU time and size, and keeps
+    statistics of the time spent and bytes produced.
+    """
+    _SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    _COLOR_TYPES = {'L': 0, 'RGB': 2, 'RGBA': 6}
+    _WINDOW_SIZE = 32 * 1024
+
+    def __init__(self,
+                 compress_level=6,  # type: int
+                 strategy=zlib.Z_DEFAULT_STRATEGY,  # type: int
+                 reduce_colors=False,  # type: bool
+                 threads=1,  # type: int
+                 chunk_size=4 * 1024 * 1024,  # type: int
+                 ):
+        # type: (...) -> None
+        """
+        :param compress_level: The zlib level, 0 (none) to 9 (best).
+        :param strategy: The zlib strategy, e.g. zlib.Z_RLE or zlib.Z_FILTERED.
+        :param reduce_colors: Whether to drop an all-opaque alpha channel, and to use a palette when
+            the image has at most 256 colors. The pixels are preserved exactly.
+        :param threads: If more than 1, the image data is split into chunks deflated in parallel.
+            Only L, RGB and RGBA images are encoded this way, without PNG row filters.
+        :param chunk_size: The size of the uncompressed chunks deflated by each thread.
+        """
+        self.compress_level = compress_level
+        self.strategy = strategy
+        self.reduce_colors = reduce_colors
+        self.threads = threads
+        self.chunk_size = chunk_size
+        self._pool = None  # type: tp.Optional[ThreadPool]
+        self._lock = threading.Lock()
+        self._images = 0
+        self._raw_bytes = 0
+        self._encoded_bytes = 0
+        self._seconds = 0.0
+
+    @classmethod
+    def fast(cls, threads=1):
+        # type: (int) -> PngEncoder
+        """
+        Returns an encoder which optimizes for speed over size.
+        """
+        return cls(compress_level=1, strategy=zlib.Z_RLE, threads=threads)
+
+    @staticmethod
+    def _reduce(image):
+        # type: (Image.Image) -> Image.Image
+        if image.mode == 'RGBA' and image.getextrema()[3] == (255, 255):
+            image = image.convert('RGB')
+        if image.mode == 'RGB' and image.getcolors(256) is not None:
+            palette_image = image.convert('P', palette=Image.ADAPTIVE, colors=256)
+            # The adaptive palette is exact for up to 256 colors, but making sure.
+            if ImageChops.difference(palette_image.convert('RGB'), image).getbbox() is None:
+                return palette_image
+        return image
+
+    def _get_pool(self):
+        # type: () -> ThreadPool
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.threads)
+            return self._pool
+
+    def _deflate_chunk(self, args):
+        # type: (tp.Tuple[bytes, tp.Optional[bytes], bool]) -> bytes
+        data, zdict, last = args
+        kwargs = dict(zdict=zdict) if zdict else {}
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, -15, 8, self.strategy, **kwargs)
+        # A sync flush ends the chunk at a byte boundary, so the raw deflate streams can be concatenated.
+        return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    @classmethod
+    def _png_chunk(cls, chunk_type, data):
+        # type: (bytes, bytes) -> bytes
+        return (struct.pack('>I', len(data)) + chunk_type + data
+                + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def _encode_parallel(self, image):
+        # type: (Image.Image) -> bytes
+        width, height = image.size
+        stride = width * len(image.getbands())
+        pixels = image.tobytes()
+        # Every row is prefixed by its filter type, 0 (None). Python 2 can't delete pixels once a
+        # generator refers to it, hence the loop.
+        rows = []
+        for row in range(height):
+            rows.append(b'\x00')
+            rows.append(pixels[row * stride:(row + 1) * stride])
+        raw = b''.join(rows)
+        del pixels, rows
+        chunk_size = max(self.chunk_size, stride + 1)
+        offsets = list(range(0, len(raw), chunk_size)) or [0]
+        # Every chunk is primed with the end of the previous one, which keeps the ratio close to serial deflate.
+        tasks = [(raw[offset:offset + chunk_size],
+                  raw[max(0, offset - self._WINDOW_SIZE):offset] if offset and PY3 else None,
+                  i == len(offsets) - 1)
+                 for i, offset in enumerate(offsets)]
+        deflated = self._get_pool().map(self._deflate_chunk, tasks)
+        level_flags = 0 if self.compress_level < 2 else (1 if self.compress_level < 6 else 2)
+        header = 0x7800 | (level_flags << 6)
+        header += (31 - header % 31) % 31
+        idat = struct.pack('>H', header) + b''.join(deflated) + struct.pack('>I', zlib.adler32(raw) & 0xffffffff)
+        ihdr = struct.pack('>IIBBBBB', width, height, 8, self._COLOR_TYPES[image.mode], 0, 0, 0)
+        return (self._SIGNATURE + self._png_chunk(b'IHDR', ihdr) + self._png_chunk(b'IDAT', idat)
+                + self._png_chunk(b'IEND', b''))
+
+    @tracing.traced('encode')
+    def encode(self, image):
+        # type: (Image.Image) -> bytes
+        """
+        Returns the PNG bytes of image.
+        """
+        start = time.time()
+        raw_bytes = image.width * image.height * len(image.getbands())
+        if self.reduce_colors:
+            image = self._reduce(image)
+        if self.threads > 1 and image.mode in self._COLOR_TYPES:
+            png_bytes = self._encode_parallel(image)
+        else:
+            stream = io.BytesIO()
+            image.save(stream, format='PNG', compress_level=self.compress_level, compress_type=self.strategy)
+            png_bytes = stream.getvalue()
+        with self._lock:
+            self._images += 1
+            self._raw_bytes += raw_bytes
+            self._encoded_bytes += len(png_bytes)
+            self._seconds += time.time() - start
+        return png_bytes
+
+    @property
+    def stats(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        """
+        Returns the number of images encoded, their total raw and encoded sizes and the time spent.
+        """
+        with self._lock:
+            return dict(images=self._images, raw_bytes=self._raw_bytes, encoded_bytes=self._encoded_bytes,
+                        ms=int(self._seconds * 1000))
+
+    def close(self):
+        # type: () -> None
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+    def __str__(self):
+        return "PngEncoder(level={}, strategy={}, reduce_colors={}, threads={})".format(
+            self.compress_level, self.strategy, self.reduce_colors, self.threads)
@@ -0,0 +1,36 @@
+"""
+Aggregation of observed values, e.g. of latencies, for statistics.
+"""
+from __future__ import absolute_import
+
+import bisect
+import typing as tp
+
+__all__ = ('Histogram',)
+
+
+class Histogram(object):
+    """
+    Counts observed values in non-cumulative buckets, where bucket i holds values <= bounds[i]
+    (and the last bucket everything above the last bound).
+    """
+
+    def __init__(self, bounds):
+        # type: (tp.Sequence[float]) -> None
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # type: (float) -> None
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        labels = ["<={}".format(bound) for bound in self.bounds] + [">{}".format(self.bounds[-1])]
+        return dict(buckets=dict(zip(labels, self.counts)),
+                    count=self.count,
+                    mean=self.total / self.count if self.count else 0.0)
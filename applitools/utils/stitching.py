@@ -0,0 +1,283 @@
+"""
+Stitching of full-page screenshots: the canvases the parts are pasted on and the parallel
+decoding of the parts.
+"""
+from __future__ import absolute_import
+
+import abc
+import base64
+import collections
+import contextlib
+import threading
+import time
+import typing as tp
+from multiprocessing.pool import ThreadPool
+
+from PIL import Image
+
+from applitools.core import logger, tracing
+from . import image_utils
+from .compat import ABC
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = ('StitchingEngine', 'create_canvas', 'PartDecoder', 'PartStitcher', 'StageTimings')
+
+
+class StitchingEngine(object):
+    """
+    The implementations of the stitching canvas.
+    """
+    # Pastes every part into a RGBA PIL image.
+    PIL = "PIL"
+    # Copies every part into a single preallocated NumPy buffer, in the mode of the parts.
+    # Requires numpy (the `eyes-selenium[numpy]` extra), falls back to PIL if it isn't installed.
+    NUMPY = "NumPy"
+
+
+class _Canvas(ABC):
+    def __init__(self, size):
+        # type: (tp.Tuple[int, int]) -> None
+        self.size = size
+
+    def scale(self, image, scale_ratio):
+        # type: (Image.Image, float) -> Image.Image
+        """
+        Scales a part before it is pasted.
+        """
+        return image_utils.scale_image(image, scale_ratio)
+
+    @abc.abstractmethod
+    def paste(self, image, position):
+        # type: (Image.Image, tp.Tuple[int, int]) -> None
+        """
+        Pastes the part at position (left, top). Parts which exceed the canvas are clipped.
+        """
+
+    @abc.abstractmethod
+    def to_image(self):
+        # type: () -> Image.Image
+        """
+        Returns the stitched image.
+        """
+
+
+class _PILCanvas(_Canvas):
+    def __init__(self, size):
+        # type: (tp.Tuple[int, int]) -> None
+        super(_PILCanvas, self).__init__(size)
+        self._image = Image.new('RGBA', size)
+
+    def paste(self, image, position):
+        # type: (Image.Image, tp.Tuple[int, int]) -> None
+        self._image.paste(image, box=position)
+
+    def to_image(self):
+        # type: () -> Image.Image
+        return self._image
+
+
+class _NumpyCanvas(_Canvas):
+    _CHANNELS = {'RGB': 3, 'RGBA': 4}
+
+    def __init__(self, size):
+        # type: (tp.Tuple[int, int]) -> None
+        super(_NumpyCanvas, self).__init__(size)
+        self._mode = None  # type: tp.Optional[tp.Text]
+        self._buffer = None
+
+    def scale(self, image, scale_ratio):
+        # type: (Image.Image, float) -> Image.Image
+        return image_utils.scale_image(image, scale_ratio, keep_mode=True)
+
+    def _allocate(self, mode):
+        # type: (tp.Text) -> None
+        # The buffer is allocated in the mode of the first part, which is RGB for most browsers.
+        self._mode = mode if mode in self._CHANNELS else 'RGBA'
+        width, height = self.size
+        self._buffer = np.zeros((height, width, self._CHANNELS[self._mode]), dtype=np.uint8)
+
+    def paste(self, image, position):
+        # type: (Image.Image, tp.Tuple[int, int]) -> None
+        if self._buffer is None:
+            self._allocate(image.mode)
+        if image.mode != self._mode:
+            image = image.convert(self._mode)
+        left, top = position
+        width, height = self.size
+        # Clipping the part to the canvas, as PIL's paste does.
+        src_left, src_top = max(0, -left), max(0, -top)
+        right, bottom = min(width, left + image.width), min(height, top + image.height)
+        left, top = max(0, left), max(0, top)
+        if right <= left or bottom <= top:
+            return
+        part = np.asarray(image)
+        self._buffer[top:bottom, left:right] = part[src_top:src_top + bottom - top,
+                                                    src_left:src_left + right - left]
+
+    def to_image(self):
+        # type: () -> Image.Image
+        if self._buffer is None:
+            self._allocate('RGBA')
+        # Shares the memory of the buffer instead of copying it.
+        return Image.frombuffer(self._mode, self.size, self._buffer, 'raw', self._mode, 0, 1)
+
+
+def create_canvas(engine, size):
+    # type: (tp.Text, tp.Tuple[int, int]) -> _Canvas
+    """
+    Creates a canvas of size (width, height) for the given stitching engine.
+    """
+    if engine == StitchingEngine.NUMPY:
+        if np is not None:
+            return _NumpyCanvas(size)
+        logger.warning("numpy is not installed. Stitching with {}...".format(StitchingEngine.PIL))
+    return _PILCanvas(size)
+
+
+class StageTimings(object):
+    """
+    Thread-safe accumulator of the time spent in every stage of stitching (capture, decode, ...).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds = {}  # type: tp.Dict[tp.Text, float]
+        self._counts = {}  # type: tp.Dict[tp.Text, int]
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        # type: (tp.Text) -> tp.Generator
+        start = time.time()
+        try:
+            with tracing.span('stitch', stage=name):
+                yield
+        finally:
+            elapsed = time.time() - start
+            with self._lock:
+                self._seconds[name] = self._seconds.get(name, 0.0) + elapsed
+                self._counts[name] = self._counts.get(name, 0) + 1
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, tp.Dict[tp.Text, tp.Any]]
+        """
+        Returns the total milliseconds and the number of times of every stage.
+        """
+        with self._lock:
+            return {name: dict(ms=int(self._seconds[name] * 1000), count=self._counts[name])
+                    for name in self._seconds}
+
+    def __str__(self):
+        return ", ".join("{}: {ms} ms / {count}".format(name, **stage)
+                         for name, stage in sorted(self.as_dict().items()))
+
+
+class _DoneResult(object):
+    """
+    The result of a part processed on the calling thread, with the interface of AsyncResult.
+    """
+
+    def __init__(self, func):
+        # type: (tp.Callable[[], Image.Image]) -> None
+        self._value = func()
+
+    def get(self, timeout=None):
+        # type: (tp.Optional[float]) -> Image.Image
+        return self._value
+
+    def ready(self):
+        # type: () -> bool
+        return True
+
+
+class PartDecoder(object):
+    """
+    Decodes and transforms (crops, scales) captured screenshot parts on a pool of threads, so the
+    browser can scroll to and capture the next part meanwhile. Pillow releases the GIL while
+    decoding and resizing, so the parts are processed in parallel.
+    """
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        # type: (int) -> None
+        """
+        :param workers: The number of threads. 1 or less processes the parts on the calling thread.
+        """
+        self.workers = workers
+        self._pool = None  # type: tp.Optional[ThreadPool]
+
+    @staticmethod
+    def _process(part64, transform, timings):
+        # type: (tp.Text, tp.Optional[tp.Callable[[Image.Image], Image.Image]], StageTimings) -> Image.Image
+        with timings.stage('decode'):
+            # Decoded here rather than lazily on paste. The png bytes are dropped once decoded.
+            image = image_utils.load_image(base64.b64decode(part64))
+        if transform is not None:
+            with timings.stage('transform'):
+                image = transform(image)
+        return image
+
+    def submit(self, part64, transform=None, timings=None):
+        # type: (tp.Text, tp.Optional[tp.Callable[[Image.Image], Image.Image]], tp.Optional[StageTimings]) -> tp.Any
+        """
+        Schedules the decoding of a base64 PNG part followed by transform.
+
+        :return: An object whose `get()` returns the processed image.
+        """
+        timings = timings or StageTimings()
+        if self.workers <= 1:
+            return _DoneResult(lambda: self._process(part64, transform, timings))
+        if self._pool is None:
+            self._pool = ThreadPool(self.workers)
+        return self._pool.apply_async(logger.bind_context(self._process), (part64, transform, timings))
+
+    def close(self):
+        # type: () -> None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+class PartStitcher(object):
+    """
+    Pastes screenshot parts into a canvas as soon as the decoder processed them, in the order they
+    were added, so only a few decoded parts are held besides the canvas at any time.
+    """
+
+    def __init__(self, decoder, canvas, timings):
+        # type: (PartDecoder, _Canvas, StageTimings) -> None
+        self.decoder = decoder
+        self.canvas = canvas
+        self.timings = timings
+        # Beyond this many parts being decoded, adding a part waits for the oldest one.
+        self.max_pending = max(1, decoder.workers)
+        self._pending = collections.deque()  # type: tp.Deque[tp.Tuple[tp.Any, tp.Tuple[int, int]]]
+
+    def add(self, part64, transform, position):
+        # type: (tp.Text, tp.Optional[tp.Callable[[Image.Image], Image.Image]], tp.Tuple[int, int]) -> None
+        """
+        Schedules the decoding of a base64 PNG part, to be pasted at position.
+        """
+        self._pending.append((self.decoder.submit(part64, transform, self.timings), position))
+        self._paste(lambda: len(self._pending) > self.max_pending or self._pending[0][0].ready())
+
+    def finish(self):
+        # type: () -> None
+        """
+        Waits for the remaining parts and pastes them.
+        """
+        self._paste(lambda: True)
+
+    def _paste(self, should_paste):
+        # type: (tp.Callable[[], bool]) -> None
+        while self._pending and should_paste():
+            result, position = self._pending.popleft()
+            part_image = result.get()
+            with self.timings.stage('paste'):
+                self.canvas.paste(part_image, position)
+            # The decoded part is released once pasted.
+            del result, part_image
@@ -0,0 +1,131 @@
+"""
+Incremental compression of large payloads (e.g. captured DOMs), spooled to a temporary file once
+they outgrow memory, so they are never held whole before being uploaded.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import tempfile
+import typing as tp
+from gzip import GzipFile
+
+__all__ = ('GzipSpool',)
+
+
+class GzipSpool(object):
+    """
+    A gzip stream written a piece at a time, and read back (e.g. by an upload) once finished.
+    The compressed output is kept in memory up to max_memory bytes, and in a temporary file beyond.
+    """
+    DEFAULT_COMPRESS_LEVEL = 6
+    DEFAULT_MAX_MEMORY = 4 * 1024 * 1024
+    # The size of the uncompressed pieces buffered before compressing them.
+    BUFFER_SIZE = 64 * 1024
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, compress_level=DEFAULT_COMPRESS_LEVEL, max_memory=DEFAULT_MAX_MEMORY):
+        # type: (int, int) -> None
+        """
+        :param compress_level: The gzip compression level, from 1 (fastest) to 9 (smallest).
+        :param max_memory: The number of compressed bytes kept in memory before spooling to disk.
+        """
+        self.compress_level = compress_level
+        self.max_memory = max_memory
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        # A fixed mtime keeps the output of identical payloads identical.
+        self._gzip = GzipFile(fileobj=self._file, mode='wb', compresslevel=compress_level, mtime=0)
+        self._buffer = []  # type: tp.List[bytes]
+        self._buffered = 0
+        self._sha256 = hashlib.sha256()
+        self.raw_size = 0
+        self.size = 0
+        # The most bytes held in memory at once, by the buffer and the in-memory part of the file.
+        self.peak_memory = 0
+        self.finished = False
+
+    def write(self, text):
+        # type: (tp.Union[tp.Text, bytes]) -> None
+        if isinstance(text, tp.Text):
+            text = text.encode('utf-8')
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.BUFFER_SIZE:
+            self._flush()
+
+    def _flush(self):
+        # type: () -> None
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._gzip.write(data)
+        self._sha256.update(data)
+        self.raw_size += len(data)
+        compressed = self._file.tell()
+        in_memory = compressed if compressed <= self.max_memory else 0
+        self.peak_memory = max(self.peak_memory, len(data) + in_memory)
+
+    def finish(self):
+        # type: () -> GzipSpool
+        """
+        Compresses the rest of the payload, and rewinds the stream for reading.
+        """
+        if not self.finished:
+            self._flush()
+            self._gzip.close()
+            self.size = self._file.tell()
+            self._file.seek(0)
+            self.finished = True
+        return self
+
+    @property
+    def digest(self):
+        # type: () -> tp.Text
+        """
+        The SHA-256 of the uncompressed payload.
+        """
+        return self._sha256.hexdigest()
+
+    @property
+    def stats(self):
+        # type: () -> tp.Dict[tp.Text, int]
+        return dict(raw_bytes=self.raw_size, compressed_bytes=self.size, peak_memory_bytes=self.peak_memory)
+
+    def read(self, size=-1):
+        # type: (int) -> bytes
+        return self._file.read(size)
+
+    def seek(self, offset, whence=0):
+        # type: (int, int) -> None
+        self._file.seek(offset, whence)
+
+    def tell(self):
+        # type: () -> int
+        return self._file.tell()
+
+    def getvalue(self):
+        # type: () -> bytes
+        """
+        Returns the whole compressed payload. Mostly for tests, as it holds it in memory.
+        """
+        self._file.seek(0)
+        try:
+            return self._file.read()
+        finally:
+            self._file.seek(0)
+
+    def __iter__(self):
+        self._file.seek(0)
+        return iter(lambda: self._file.read(self.READ_SIZE), b'')
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        # type: () -> None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,4 @@
+"""
+Offline benchmarks of the SDK's overhead, which drive Eyes end to end against a scripted fake
+WebDriver and a local stand-in for the Eyes server. Run with `python -m benchmarks`.
+"""
@@ -0,0 +1,53 @@
+"""
+Usage: python -m benchmarks [--json] [--in-process] [--no-warmup] [scenario ...]
+
+Runs the given scenarios (all by default), each in a process of its own unless --in-process,
+and prints their measurements as a table, or as JSON.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import logging
+import sys
+
+from .harness import get_scenario, run_isolated, run_scenario
+from .scenarios import SCENARIOS
+
+
+def _format_table(results):
+    rows = [('scenario', 'wall s', 'cpu s', 'peak rss MB', 'sent KB', 'webdriver calls')]
+    for result in results:
+        rss = result.peak_rss_bytes
+        rows.append((result.scenario, '{:.3f}'.format(result.wall_seconds), '{:.3f}'.format(result.cpu_seconds),
+                     '{:.1f}'.format(rss / 1024.0 / 1024) if rss is not None else '-',
+                     '{:.1f}'.format(result.bytes_sent / 1024.0), str(result.webdriver_calls)))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Runs the offline benchmarks of the SDK.')
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help='One of: {}'.format(', '.join(scenario.name for scenario in SCENARIOS)))
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    parser.add_argument('--in-process', action='store_true', help='Run all the scenarios in this process.')
+    parser.add_argument('--no-warmup', action='store_true', help="Don't run the scenarios once before measuring.")
+    args = parser.parse_args(argv)
+
+    # The SDK's warnings would otherwise mix with the results.
+    logging.captureWarnings(True)
+    scenarios = [get_scenario(name) for name in args.scenarios] or SCENARIOS
+    run = run_scenario if args.in_process else run_isolated
+    results = [run(scenario, warmup=not args.no_warmup) for scenario in scenarios]
+    if args.json:
+        print(json.dumps([result.as_dict() for result in results], indent=2))
+    else:
+        print(_format_table(results))
+        for result in results:
+            if result.unhandled:
+                print('{}: unhandled WebDriver calls: {}'.format(result.scenario, result.unhandled), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+A local stand-in for the Eyes server, which implements the parts of its protocol the SDK uses
+(sessions, render info, blob uploads and long requests answered by 202 + Location) and counts
+the bytes it receives.
+"""
+from __future__ import absolute_import
+
+import itertools
+import json
+import threading
+import typing as tp
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # type: ignore
+    from SocketServer import ThreadingMixIn  # type: ignore
+
+try:
+    from urllib.parse import urlparse
+except ImportError:  # Python 2
+    from urlparse import urlparse  # type: ignore
+
+__all__ = ('FakeEyesServer',)
+
+_SESSIONS_PATH = '/api/sessions/running'
+_RENDER_INFO_PATH = '/api/sessions/renderinfo'
+_TASKS_PATH = '/api/tasks/'
+_BLOBS_PATH = '/blobs/'
+_CSS_PATH = '/css/'
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server = None  # type: _ThreadingHTTPServer
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def _eyes(self):
+        # type: () -> FakeEyesServer
+        return self.server.eyes_server  # type: ignore
+
+    def _read_body(self):
+        # type: () -> bytes
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                chunks.append(self.rfile.read(size + 2)[:size])
+                if not size:
+                    break
+            body = b''.join(chunks)
+        else:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+        self._eyes.record(self.command, urlparse(self.path).path, len(body))
+        return body
+
+    def _send(self, status, body=b'', headers=None, content_type='application/json'):
+        # type: (int, tp.Union[bytes, tp.Dict, tp.Text], tp.Optional[tp.Dict[tp.Text, tp.Text]], tp.Text) -> None
+        if isinstance(body, dict):
+            body = json.dumps(body)
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_task(self, result):
+        # type: (tp.Dict[tp.Text, tp.Any]) -> None
+        """
+        Answers a long request with 202 + Location, for the task which completes with result.
+        """
+        task_url = self._eyes.add_task(result)
+        self._send(202, headers={'Location': task_url, 'Retry-After': '0'})
+
+    def do_GET(self):
+        self._read_body()
+        path = urlparse(self.path).path
+        eyes = self._eyes
+        if path == _RENDER_INFO_PATH:
+            self._send(200, dict(accessToken='fake-token', resultsUrl=eyes.url + _BLOBS_PATH + '__random__'))
+        elif path.startswith(_TASKS_PATH):
+            # The task is done; its result is fetched (and the task deleted) at the Location.
+            self._send(201, headers={'Location': eyes.url + path + '/result'})
+        elif path.startswith(_CSS_PATH):
+            index = int(path[len(_CSS_PATH):].split('.')[0])
+            self._send(200, eyes.stylesheet(index), headers={'Cache-Control': 'max-age=3600'},
+                       content_type='text/css')
+        else:
+            self._send(404)
+
+    def do_POST(self):
+        self._read_body()
+        path = urlparse(self.path).path
+        if path == _SESSIONS_PATH:
+            session_id = self._eyes.new_id()
+            self._start_task(dict(id=session_id, url='{}/app/sessions/{}'.format(self._eyes.url, session_id),
+                                  isNew=False))
+        elif path.startswith(_SESSIONS_PATH + '/'):
+            self._start_task(dict(asExpected=True))
+        else:
+            self._send(404)
+
+    def do_PUT(self):
+        self._read_body()
+        if urlparse(self.path).path.startswith(_BLOBS_PATH):
+            self._send(201)
+        else:
+            self._send(404)
+
+    def do_DELETE(self):
+        self._read_body()
+        path = urlparse(self.path).path
+        if path.startswith(_TASKS_PATH):
+            result = self._eyes.pop_task(path[len(_TASKS_PATH):].split('/')[0])
+            self._send(200 if result is not None else 410, result or b'')
+        elif path.startswith(_SESSIONS_PATH + '/'):
+            steps = self._eyes.matches
+            self._start_task(dict(steps=steps, matches=steps, mismatches=0, missing=0, exactMatches=0,
+                                  strictMatches=steps, contentMatches=0, layoutMatches=0, noneMatches=0,
+                                  status='Passed'))
+        else:
+            self._send(404)
+
+
+class FakeEyesServer(object):
+    """
+    Serves the Eyes API on a free local port, on a thread of its own, until closed.
+    Also serves the stylesheets of a page from /css/<index>.css.
+    """
+
+    def __init__(self, stylesheet=lambda index: ''):
+        # type: (tp.Callable[[int], tp.Text]) -> None
+        """
+        :param stylesheet: Returns the text of the stylesheet of an index.
+        """
+        self.stylesheet = stylesheet
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.eyes_server = self  # type: ignore
+        self.url = 'http://127.0.0.1:{}'.format(self._httpd.server_address[1])
+        self._ids = itertools.count(1)
+        self._tasks = {}  # type: tp.Dict[tp.Text, tp.Dict[tp.Text, tp.Any]]
+        self._lock = threading.Lock()
+        self.bytes_received = 0
+        self.requests = {}  # type: tp.Dict[tp.Text, int]
+        self.matches = 0
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='FakeEyesServer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def new_id(self):
+        # type: () -> tp.Text
+        return str(next(self._ids))
+
+    def add_task(self, result):
+        # type: (tp.Dict[tp.Text, tp.Any]) -> tp.Text
+        task_id = self.new_id()
+        with self._lock:
+            self._tasks[task_id] = result
+            if 'asExpected' in result:
+                self.matches += 1
+        return self.url + _TASKS_PATH + task_id
+
+    def pop_task(self, task_id):
+        # type: (tp.Text) -> tp.Optional[tp.Dict[tp.Text, tp.Any]]
+        with self._lock:
+            return self._tasks.pop(task_id, None)
+
+    def record(self, method, path, size):
+        # type: (tp.Text, tp.Text, int) -> None
+        # Ids (and blob names) are dropped from the path, so requests are counted per endpoint.
+        parts = [part for part in path.split('/') if not any(c.isdigit() for c in part)]
+        endpoint = '{} {}'.format(method, '/'.join(parts))
+        with self._lock:
+            self.bytes_received += size
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def reset_counts(self):
+        # type: () -> None
+        with self._lock:
+            self.bytes_received = 0
+            self.requests = {}
+            self.matches = 0
+
+    def close(self):
+        # type: () -> None
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,412 @@
+"""
+A scripted WebDriver which serves pre-rendered tiles of a synthetic page, and answers the scripts
+the SDK runs (page metrics, scrolling, CSS transforms, element scrolling and DOM capture) from a
+model of the page, without any browser.
+"""
+from __future__ import absolute_import
+
+import base64
+import io
+import json
+import random
+import re
+import threading
+import typing as tp
+
+from PIL import Image, ImageDraw
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+
+__all__ = ('render_page', 'FakeElement', 'FakePage', 'FakeCommandExecutor', 'FakeWebDriver')
+
+CHROME_USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                     'Chrome/78.0.3904.97 Safari/537.36')
+# The height of the browser's toolbars, which the window is taller than the viewport by.
+_WINDOW_CHROME_HEIGHT = 74
+
+_TRANSLATE_RE = re.compile(r"translate\(\s*(-?[\d.]+)px,\s*(-?[\d.]+)px\s*\)")
+_WINDOW_SCROLL_TO_RE = re.compile(r"window\.scrollTo\(\s*(-?[\d.]+),\s*(-?[\d.]+)\s*\)")
+_ELEMENT_SCROLL_TO_RE = re.compile(r"scrollLeft = (-?\d+);\s*arguments\[0\]\.scrollTop = (-?\d+);")
+
+
+def render_page(size, seed):
+    # type: (tp.Tuple[int, int], int) -> Image.Image
+    """
+    Draws rows of differently colored and sized blocks, which compress about as well as pages of
+    text and pictures do.
+    """
+    rnd = random.Random(seed)
+    image = Image.new('RGB', size, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    for top in range(0, height, 40):
+        left = 10
+        while left < width:
+            block_width = rnd.randint(20, 200)
+            color = (rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(0, 255))
+            draw.rectangle([left, top + 5, min(left + block_width, width - 1), top + 35], fill=color)
+            left += block_width + rnd.randint(5, 30)
+    return image
+
+
+class FakeElement(object):
+    """
+    A scrollable element of the page, with its own content.
+    """
+
+    def __init__(self, element_id, selector, location, client_size, scroll_size=None, tag_name='div'):
+        # type: (tp.Text, tp.Text, tp.Tuple[int, int], tp.Tuple[int, int], tp.Optional[tp.Tuple[int, int]], str) -> None
+        self.id = element_id
+        self.selector = selector
+        self.location = location
+        self.client_size = client_size
+        self.scroll_size = scroll_size or client_size
+        self.tag_name = tag_name
+        self.scroll = [0, 0]
+        self.overflow = ''
+        self._content = None  # type: tp.Optional[Image.Image]
+
+    def content(self, device_pixel_ratio):
+        # type: (float) -> Image.Image
+        if self._content is None:
+            width, height = self.scroll_size
+            self._content = render_page((int(width * device_pixel_ratio), int(height * device_pixel_ratio)), seed=2)
+        return self._content
+
+    def scroll_to(self, x, y):
+        # type: (int, int) -> None
+        self.scroll = [max(0, min(x, self.scroll_size[0] - self.client_size[0])),
+                       max(0, min(y, self.scroll_size[1] - self.client_size[1]))]
+
+
+class FakePage(object):
+    """
+    The model of the page the fake driver shows: its size, the viewport, the device pixel ratio, the
+    scroll position and CSS translation of the document, its elements, stylesheets and DOM.
+    """
+
+    def __init__(self,
+                 entire_size=(800, 600),  # type: tp.Tuple[int, int]
+                 viewport_size=(800, 600),  # type: tp.Tuple[int, int]
+                 device_pixel_ratio=1.0,  # type: float
+                 elements=(),  # type: tp.Iterable[FakeElement]
+                 stylesheets=0,  # type: int
+                 dom_nodes=200,  # type: int
+                 url='https://example.com/index.html',  # type: tp.Text
+                 title='Benchmark page',  # type: tp.Text
+                 user_agent=CHROME_USER_AGENT,  # type: tp.Text
+                 ):
+        # type: (...) -> None
+        """
+        :param stylesheets: The number of linked stylesheets. Their hrefs are relative to css_base_url.
+        :param dom_nodes: The number of elements in the body of the captured DOM.
+        """
+        self.entire_size = entire_size
+        self.viewport_size = list(viewport_size)
+        self.device_pixel_ratio = device_pixel_ratio
+        self.elements = {element.id: element for element in elements}
+        # Found (e.g. to mark it scrolled) but not scrolled or drawn itself, as the page is.
+        self.document_element = FakeElement('document', 'html', (0, 0), entire_size, tag_name='html')
+        self.stylesheets = stylesheets
+        self.dom_nodes = dom_nodes
+        self.url = url
+        self.title = title
+        self.user_agent = user_agent
+        # Where the stylesheets are served from, e.g. the benchmark's stand-in server.
+        self.css_base_url = url
+        self.scroll = [0, 0]
+        self.translate = [0, 0]
+        self.overflow = ''
+        self._image = None  # type: tp.Optional[Image.Image]
+        self._tiles = {}  # type: tp.Dict[tp.Tuple, tp.Text]
+        self._dom = None  # type: tp.Optional[tp.Text]
+
+    @property
+    def window_size(self):
+        # type: () -> tp.Tuple[int, int]
+        return self.viewport_size[0], self.viewport_size[1] + _WINDOW_CHROME_HEIGHT
+
+    def set_window_size(self, width, height):
+        # type: (int, int) -> None
+        self.viewport_size = [width, height - _WINDOW_CHROME_HEIGHT]
+        self.scroll_to(*self.scroll)
+
+    def scroll_to(self, x, y):
+        # type: (float, float) -> None
+        self.scroll = [int(max(0, min(x, self.entire_size[0] - self.viewport_size[0]))),
+                       int(max(0, min(y, self.entire_size[1] - self.viewport_size[1])))]
+
+    def element(self, element_id):
+        # type: (tp.Text) -> tp.Optional[FakeElement]
+        if element_id == self.document_element.id:
+            return self.document_element
+        return self.elements.get(element_id)
+
+    def find(self, selector):
+        # type: (tp.Text) -> tp.Optional[FakeElement]
+        for element in [self.document_element] + list(self.elements.values()):
+            if element.selector == selector:
+                return element
+        return None
+
+    def _page_image(self):
+        # type: () -> Image.Image
+        if self._image is None:
+            width, height = self.entire_size
+            ratio = self.device_pixel_ratio
+            self._image = render_page((int(width * ratio), int(height * ratio)), seed=1)
+        return self._image
+
+    def screenshot(self):
+        # type: () -> tp.Text
+        """
+        Returns the PNG of the viewport as base64. Tiles are rendered once per position.
+        """
+        x, y = self.scroll[0] + self.translate[0], self.scroll[1] + self.translate[1]
+        key = (x, y, tuple(self.viewport_size),
+               tuple((element.id, tuple(element.scroll)) for element in self.elements.values()))
+        tile = self._tiles.get(key)
+        if tile is None:
+            tile = self._tiles[key] = self._render_tile(x, y)
+        return tile
+
+    def _render_tile(self, x, y):
+        # type: (int, int) -> tp.Text
+        ratio = self.device_pixel_ratio
+        width, height = self.viewport_size
+        box = [int(v * ratio) for v in (x, y, x + width, y + height)]
+        image = self._page_image().crop(box)
+        for element in self.elements.values():
+            left, top = element.location[0] - x, element.location[1] - y
+            client_width, client_height = element.client_size
+            scroll_x, scroll_y = element.scroll
+            part = element.content(ratio).crop([int(v * ratio) for v in (
+                scroll_x, scroll_y, scroll_x + client_width, scroll_y + client_height)])
+            image.paste(part, (int(left * ratio), int(top * ratio)))
+        stream = io.BytesIO()
+        image.save(stream, format='PNG')
+        return base64.b64encode(stream.getvalue()).decode('ascii')
+
+    def stylesheet(self, index):
+        # type: (int) -> tp.Text
+        rules = ['.c{0}-{1} {{ color: #{1:06x}; margin: {2}px; background: url("img/{1}.png") }}'.format(
+            index, i, i % 17) for i in range(100)]
+        return '\n'.join(rules)
+
+    def plan_frames(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        css = [[None, '{}/css/{}.css'.format(self.css_base_url.rstrip('/'), i)] for i in range(self.stylesheets)]
+        css.append(['body { margin: 0 }', None])
+        return dict(url=self.url, css=css, frames=[])
+
+    def cssom(self):
+        # type: () -> tp.List[tp.List[tp.Optional[tp.Text]]]
+        return self.plan_frames()['css']
+
+    def dom(self):
+        # type: () -> tp.Text
+        """
+        Returns the DOM as the capture script serializes it.
+        """
+        if self._dom is None:
+            style = {'background-color': 'rgba(0, 0, 0, 0)', 'background-image': 'none', 'background-size': 'auto',
+                     'color': 'rgb(0, 0, 0)', 'border-width': '0px', 'border-color': 'rgb(0, 0, 0)',
+                     'border-style': 'none', 'padding': '0px', 'margin': '0px'}
+
+            def element(tag_name, i, child_nodes):
+                rect = {'width': 100 + i % 300, 'height': 20, 'top': i * 20, 'left': 8}
+                return {'tagName': tag_name, 'style': style, 'rect': rect,
+                        'attributes': {'class': 'c{}-{}'.format(i % max(self.stylesheets, 1), i % 100)},
+                        'childNodes': child_nodes}
+
+            body = [element('DIV', i, [{'tagName': '#text', 'text': 'Item number {}'.format(i)}])
+                    for i in range(self.dom_nodes)]
+            html = element('HTML', 0, [element('HEAD', 0, []), element('BODY', 0, body)])
+            self._dom = json.dumps(html)
+        return self._dom
+
+
+class FakeCommandExecutor(object):
+    """
+    Executes the commands of a RemoteWebDriver against a FakePage, counting them.
+    Commands and scripts it doesn't know are counted as unhandled, and answered with null.
+    """
+
+    def __init__(self, page):
+        # type: (FakePage) -> None
+        self.page = page
+        self.w3c = False
+        self.commands = {}  # type: tp.Dict[tp.Text, int]
+        self.unhandled = {}  # type: tp.Dict[tp.Text, int]
+        self._lock = threading.Lock()
+        self._handlers = {
+            Command.NEW_SESSION: lambda params: {
+                'browserName': 'chrome', 'version': '78.0', 'platform': 'LINUX', 'javascriptEnabled': True},
+            Command.QUIT: lambda params: None,
+            Command.GET: lambda params: None,
+            Command.GET_CURRENT_URL: lambda params: self.page.url,
+            Command.GET_TITLE: lambda params: self.page.title,
+            Command.SCREENSHOT: lambda params: self.page.screenshot(),
+            Command.EXECUTE_SCRIPT: self._execute_script,
+            Command.GET_WINDOW_SIZE: lambda params: dict(zip(('width', 'height'), self.page.window_size)),
+            Command.SET_WINDOW_SIZE: lambda params: self.page.set_window_size(params['width'], params['height']),
+            Command.GET_WINDOW_POSITION: lambda params: {'x': 0, 'y': 0},
+            Command.SET_WINDOW_POSITION: lambda params: None,
+            Command.FIND_ELEMENT: self._find_element,
+            Command.FIND_ELEMENTS: lambda params: [
+                {'ELEMENT': element.id} for element in [self.page.find(params['value'])] if element],
+            Command.GET_ELEMENT_LOCATION: lambda params: dict(
+                zip(('x', 'y'), self._element(params).location)),
+            Command.GET_ELEMENT_LOCATION_ONCE_SCROLLED_INTO_VIEW: lambda params: dict(
+                zip(('x', 'y'), self._element(params).location)),
+            Command.GET_ELEMENT_SIZE: lambda params: dict(
+                zip(('width', 'height'), self._element(params).client_size)),
+            Command.GET_ELEMENT_TAG_NAME: lambda params: self._element(params).tag_name,
+            Command.GET_ELEMENT_ATTRIBUTE: lambda params: None,
+            Command.GET_ELEMENT_VALUE_OF_CSS_PROPERTY: lambda params: '0px',
+            Command.IS_ELEMENT_DISPLAYED: lambda params: True,
+            Command.SWITCH_TO_FRAME: lambda params: None,
+            Command.SWITCH_TO_PARENT_FRAME: lambda params: None,
+        }
+
+    def _count(self, counts, name):
+        # type: (tp.Dict[tp.Text, int], tp.Text) -> None
+        with self._lock:
+            counts[name] = counts.get(name, 0) + 1
+
+    @property
+    def round_trips(self):
+        # type: () -> int
+        return sum(self.commands.values())
+
+    def reset_counts(self):
+        # type: () -> None
+        with self._lock:
+            self.commands = {}
+            self.unhandled = {}
+
+    def execute(self, command, params):
+        # type: (tp.Text, tp.Dict[tp.Text, tp.Any]) -> tp.Dict[tp.Text, tp.Any]
+        self._count(self.commands, command)
+        handler = self._handlers.get(command)
+        if handler is None:
+            self._count(self.unhandled, command)
+            value = None
+        else:
+            value = handler(params)
+        if command == Command.NEW_SESSION:
+            # A JSON wire protocol (not W3C) answer, as it carries a status.
+            return {'status': 0, 'sessionId': 'fake-session', 'value': value}
+        return {'status': 0, 'value': value}
+
+    def _element(self, params):
+        # type: (tp.Dict[tp.Text, tp.Any]) -> FakeElement
+        return self.page.element(params['id'])
+
+    def _find_element(self, params):
+        # type: (tp.Dict[tp.Text, tp.Any]) -> tp.Dict[tp.Text, tp.Text]
+        element = self.page.find(params['value'])
+        if element is None:
+            raise KeyError('No element matches {}'.format(params['value']))
+        return {'ELEMENT': element.id}
+
+    def _script_element(self, args):
+        # type: (tp.List[tp.Any]) -> tp.Optional[FakeElement]
+        for arg in args:
+            if isinstance(arg, dict) and 'ELEMENT' in arg:
+                return self.page.element(arg['ELEMENT'])
+        return None
+
+    def _execute_script(self, params):
+        # type: (tp.Dict[tp.Text, tp.Any]) -> tp.Any
+        script, args = params['script'], params.get('args', [])
+        page = self.page
+        element = self._script_element(args)
+        if element is not None:
+            return self._execute_element_script(element, script)
+        if 'function captureFrame(' in script:
+            return page.dom()
+        if 'function planFrames(' in script:
+            return page.plan_frames()
+        if 'function extractCssResources(' in script:
+            return page.cssom()
+        if 'entireSize:' in script:
+            return dict(entireSize=list(page.entire_size), viewportSize=list(page.viewport_size),
+                        scrollPosition=list(page.scroll), devicePixelRatio=page.device_pixel_ratio,
+                        overflow=page.overflow, userAgent=page.user_agent)
+        if 'navigator.userAgent.match(' in script:
+            return False
+        if 'return navigator.userAgent' in script:
+            return page.user_agent
+        if 'return window.devicePixelRatio' in script:
+            return page.device_pixel_ratio
+        if 'maxDocElementHeight' in script:
+            return list(page.entire_size)
+        if 'window.innerHeight' in script:
+            return list(page.viewport_size)
+        if 'window.scrollX' in script:
+            return list(page.scroll)
+        if 'document.readyState' in script:
+            return 'complete'
+        if 'document.documentElement.style.overflow' in script:
+            original, page.overflow = page.overflow, script.split("overflow = ")[-1].split(';')[0].strip('\'" ')
+            return original
+        match = _WINDOW_SCROLL_TO_RE.search(script)
+        if match:
+            page.scroll_to(float(match.group(1)), float(match.group(2)))
+            return None
+        if "document.documentElement.style['transform']" in script or 'style[\'-webkit-transform\']' in script:
+            if script.startswith('return {'):
+                transform = 'translate({}px, {}px)'.format(-page.translate[0], -page.translate[1])
+                return {'transform': transform, '-webkit-transform': transform}
+            matches = _TRANSLATE_RE.findall(script)
+            if matches:
+                x, y = matches[-1]
+                page.translate = [-int(float(x)), -int(float(y))]
+            return None
+        self._count(self.unhandled, 'script: ' + ' '.join(script.split())[:60])
+        return None
+
+    def _execute_element_script(self, element, script):
+        # type: (FakeElement, tp.Text) -> tp.Any
+        if 'setAttribute(' in script:
+            return None
+        match = _ELEMENT_SCROLL_TO_RE.search(script)
+        if match:
+            element.scroll_to(int(match.group(1)), int(match.group(2)))
+            return None
+        if 'retVal = [arguments[0].clientWidth' in script:
+            return list(element.client_size) + ['0px'] * 4
+        if 'getComputedStyle' in script:
+            return ['0px'] * 4 if 'retVal' in script else '0px'
+        if 'origOverflow' in script:
+            original, element.overflow = element.overflow, 'hidden'
+            return original
+        for suffix, value in (('scrollLeft;', element.scroll[0]), ('scrollTop;', element.scroll[1]),
+                              ('scrollWidth;', element.scroll_size[0]), ('scrollHeight;', element.scroll_size[1]),
+                              ('clientWidth;', element.client_size[0]), ('clientHeight;', element.client_size[1]),
+                              ('style.overflow;', element.overflow)):
+            if script.strip().endswith(suffix):
+                return value
+        if 'style.overflow =' in script:
+            element.overflow = script.split("=")[-1].strip('\'"; ')
+            return None
+        self._count(self.unhandled, 'element script: ' + ' '.join(script.split())[:60])
+        return None
+
+
+class FakeWebDriver(WebDriver):
+    """
+    A RemoteWebDriver whose commands are executed by a FakeCommandExecutor, rather than sent to a browser.
+    """
+
+    def __init__(self, page):
+        # type: (FakePage) -> None
+        self.fake_executor = FakeCommandExecutor(page)
+        super(FakeWebDriver, self).__init__(command_executor=self.fake_executor,
+                                            desired_capabilities={'browserName': 'chrome'})
+
+    @property
+    def page(self):
+        # type: () -> FakePage
+        return self.fake_executor.page
@@ -0,0 +1,140 @@
+"""
+Runs the scenarios end to end (Eyes.open, the checks and Eyes.close) against the fake driver and
+the stand-in server, and measures the wall time, CPU time, peak RSS, bytes sent to the server and
+WebDriver calls of each.
+"""
+from __future__ import absolute_import
+
+import json
+import subprocess
+import sys
+import time
+import typing as tp
+
+from applitools.selenium import Eyes
+
+from .fake_server import FakeEyesServer
+from .fake_webdriver import FakeWebDriver
+from .scenarios import SCENARIOS, Scenario
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+__all__ = ('BenchmarkResult', 'get_scenario', 'run_scenario', 'run_isolated')
+
+try:
+    _process_time = time.process_time
+except AttributeError:  # Python 2
+    _process_time = time.clock  # type: ignore
+
+
+def _peak_rss_bytes():
+    # type: () -> tp.Optional[int]
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class BenchmarkResult(object):
+    """
+    The measurements of a scenario's run.
+    """
+
+    def __init__(self, scenario, wall_seconds, cpu_seconds, peak_rss_bytes, bytes_sent, webdriver_calls,
+                 requests=None, commands=None, unhandled=None):
+        # type: (tp.Text, float, float, tp.Optional[int], int, int, tp.Dict, tp.Dict, tp.Dict) -> None
+        self.scenario = scenario
+        self.wall_seconds = wall_seconds
+        # Includes the (small) work of the stand-in server, which runs in the same process.
+        self.cpu_seconds = cpu_seconds
+        # The peak of the whole process, up to the end of the run.
+        self.peak_rss_bytes = peak_rss_bytes
+        # The bytes of the bodies of the requests sent to the server.
+        self.bytes_sent = bytes_sent
+        self.webdriver_calls = webdriver_calls
+        # The number of requests per endpoint, of WebDriver calls per command, and of the calls
+        # (and scripts) the fake driver didn't know, which should be none.
+        self.requests = requests or {}
+        self.commands = commands or {}
+        self.unhandled = unhandled or {}
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        return dict(scenario=self.scenario, wall_seconds=self.wall_seconds, cpu_seconds=self.cpu_seconds,
+                    peak_rss_bytes=self.peak_rss_bytes, bytes_sent=self.bytes_sent,
+                    webdriver_calls=self.webdriver_calls, requests=self.requests, commands=self.commands,
+                    unhandled=self.unhandled)
+
+    @classmethod
+    def from_dict(cls, d):
+        # type: (tp.Dict[tp.Text, tp.Any]) -> BenchmarkResult
+        return cls(**d)
+
+    def __str__(self):
+        return "BenchmarkResult({}, {:.3f} s, {:.3f} s CPU, {} bytes sent, {} WebDriver calls)".format(
+            self.scenario, self.wall_seconds, self.cpu_seconds, self.bytes_sent, self.webdriver_calls)
+
+
+def get_scenario(name):
+    # type: (tp.Text) -> Scenario
+    for scenario in SCENARIOS:
+        if scenario.name == name:
+            return scenario
+    raise ValueError("Unknown scenario: {}".format(name))
+
+
+def _run_test(scenario, server, driver):
+    # type: (Scenario, FakeEyesServer, FakeWebDriver) -> None
+    eyes = Eyes(server.url)
+    eyes.api_key = 'benchmark'
+    # Only the SDK's own work is measured, not the waits meant for real pages to settle.
+    eyes.wait_before_screenshots = 0
+    scenario.configure(eyes)
+    try:
+        eyes_driver = eyes.open(driver, 'Benchmarks', scenario.name, {'width': 800, 'height': 600})
+        scenario.check(eyes, eyes_driver)
+        eyes.close()
+    finally:
+        eyes.abort_if_not_closed()
+
+
+def run_scenario(scenario, warmup=True):
+    # type: (Scenario, bool) -> BenchmarkResult
+    """
+    Runs the scenario in this process, after a warm-up run (which also renders the page's tiles)
+    unless warmup is False.
+    """
+    page = scenario.page()
+    with FakeEyesServer(page.stylesheet) as server:
+        page.css_base_url = server.url
+        driver = FakeWebDriver(page)
+        executor = driver.fake_executor
+        if warmup:
+            _run_test(scenario, server, driver)
+            page.scroll_to(0, 0)
+        server.reset_counts()
+        executor.reset_counts()
+
+        start, start_cpu = time.time(), _process_time()
+        _run_test(scenario, server, driver)
+        wall_seconds, cpu_seconds = time.time() - start, _process_time() - start_cpu
+
+        return BenchmarkResult(scenario.name, wall_seconds, cpu_seconds, _peak_rss_bytes(), server.bytes_received,
+                               executor.round_trips, dict(server.requests), dict(executor.commands),
+                               dict(executor.unhandled))
+
+
+def run_isolated(scenario, warmup=True):
+    # type: (Scenario, bool) -> BenchmarkResult
+    """
+    Runs the scenario in a process of its own, so that its peak RSS isn't that of others.
+    """
+    command = [sys.executable, '-m', 'benchmarks', '--in-process', '--json', scenario.name]
+    if not warmup:
+        command.append('--no-warmup')
+    output = subprocess.check_output(command)
+    return BenchmarkResult.from_dict(json.loads(output.decode('utf-8'))[0])
@@ -0,0 +1,393 @@
+"""
+Micro-benchmarks of the image and geometry functions run per screenshot part and per check, on
+synthetic images of 1 to 50 megapixels. Runs are saved to a history of baselines, which later
+runs are compared against to catch regressions. Timings are only comparable on the same machine,
+so the history is kept locally (it isn't committed): run with --save first, on every machine
+(or CI worker) that runs with --compare.
+
+Usage: python -m benchmarks.micro [-k filter] [--sizes 1,5,20,50] [--save] [--compare] [--json]
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import typing as tp
+from timeit import default_timer
+
+from applitools.core import logger
+from applitools.core.geometry import Point, Region
+from applitools.core.triggers import MouseTrigger
+from applitools.utils import general_utils, image_utils
+
+from .fake_webdriver import render_page
+
+__all__ = ('MicroBenchmark', 'BenchmarkStats', 'BENCHMARKS', 'run', 'BaselineHistory', 'compare')
+
+# Megapixels of the synthetic images: a viewport, a short page, a long page and a huge one.
+DEFAULT_SIZES = (1, 5, 20, 50)
+# The width of the synthetic images, whose height grows with their size, as full page screenshots' does.
+IMAGE_WIDTH = 1280
+DEFAULT_BASELINES = os.path.join(os.path.dirname(__file__), 'baselines', 'micro.json')
+# The relative slowdown of the median above which a benchmark is reported as a regression.
+DEFAULT_THRESHOLD = 0.1
+
+
+class BenchmarkStats(object):
+    """
+    The timings of a benchmark's rounds, in seconds per call.
+    """
+
+    def __init__(self, timings, iterations):
+        # type: (tp.List[float], int) -> None
+        self.timings = sorted(timings)
+        # The number of calls timed together in every round.
+        self.iterations = iterations
+
+    @property
+    def rounds(self):
+        # type: () -> int
+        return len(self.timings)
+
+    @property
+    def min(self):
+        # type: () -> float
+        return self.timings[0]
+
+    @property
+    def max(self):
+        # type: () -> float
+        return self.timings[-1]
+
+    @property
+    def mean(self):
+        # type: () -> float
+        return sum(self.timings) / len(self.timings)
+
+    @property
+    def median(self):
+        # type: () -> float
+        middle = len(self.timings) // 2
+        if len(self.timings) % 2:
+            return self.timings[middle]
+        return (self.timings[middle - 1] + self.timings[middle]) / 2
+
+    @property
+    def stddev(self):
+        # type: () -> float
+        if len(self.timings) < 2:
+            return 0.0
+        mean = self.mean
+        return math.sqrt(sum((t - mean) ** 2 for t in self.timings) / (len(self.timings) - 1))
+
+    def as_dict(self):
+        # type: () -> tp.Dict[tp.Text, tp.Any]
+        return dict(min=self.min, max=self.max, mean=self.mean, median=self.median, stddev=self.stddev,
+                    rounds=self.rounds, iterations=self.iterations)
+
+
+class MicroBenchmark(object):
+    """
+    A function benchmarked on inputs of every size. setup creates the inputs of a size (outside of
+    the timings), and func is called with them.
+    """
+
+    def __init__(self, name, setup, func, sized=True):
+        # type: (tp.Text, tp.Callable[[float], tp.Tuple], tp.Callable, bool) -> None
+        """
+        :param sized: Whether the inputs depend on the size, or the benchmark runs once for all sizes.
+        """
+        self.name = name
+        self.setup = setup
+        self.func = func
+        self.sized = sized
+
+    def full_name(self, size):
+        # type: (float) -> tp.Text
+        return '{}[{:g}MP]'.format(self.name, size) if self.sized else self.name
+
+
+def _timed(func, args, iterations):
+    # type: (tp.Callable, tp.Tuple, int) -> float
+    start = default_timer()
+    for _ in range(iterations):
+        func(*args)
+    return (default_timer() - start) / iterations
+
+
+def measure(func, args, min_rounds=3, max_time=1.0, min_round_time=0.001):
+    # type: (tp.Callable, tp.Tuple, int, float, float) -> BenchmarkStats
+    """
+    Times func(*args) in rounds, after a warm-up call, until there were min_rounds rounds and
+    max_time seconds passed. Fast functions are called enough times per round to take min_round_time.
+    """
+    first = _timed(func, args, 1)
+    iterations = max(1, int(math.ceil(min_round_time / first))) if first > 0 else 1000
+    timings = []
+    deadline = time.time() + max_time
+    while len(timings) < min_rounds or time.time() < deadline:
+        timings.append(_timed(func, args, iterations))
+    return BenchmarkStats(timings, iterations)
+
+
+def _image(megapixels):
+    # type: (float) -> tp.Any
+    return render_page((IMAGE_WIDTH, max(1, int(megapixels * 1000 * 1000 / IMAGE_WIDTH))), seed=1)
+
+
+def _image_and_viewport(megapixels):
+    # type: (float) -> tp.Tuple[tp.Any, Region]
+    image = _image(megapixels)
+    height = min(image.height, 800)
+    return image, Region(0, (image.height - height) // 2, image.width, height)
+
+
+def _match_payload(regions=500, triggers=200):
+    # type: (int, int) -> tp.Dict[tp.Text, tp.Any]
+    """
+    Returns match data shaped like MatchWindowTask's, with many ignore and floating regions and
+    user inputs.
+    """
+    ignore = [Region(i % 1280, i * 10, 100, 20) for i in range(regions)]
+    floating = [dict(Top=i * 10, Left=i % 1280, Width=100, Height=20, MaxUpOffset=5, MaxDownOffset=5,
+                     MaxLeftOffset=5, MaxRightOffset=5) for i in range(regions)]
+    user_inputs = [MouseTrigger('click', Region(i, i, 50, 20), Point(10, 10)) for i in range(triggers)]
+    return {
+        "IgnoreMismatch": False,
+        "Options": {
+            "Name": "Checkpoint",
+            "UserInputs": user_inputs,
+            "ImageMatchSettings": {"MatchLevel": "Strict", "IgnoreCaret": True, "Exact": None,
+                                   "Ignore": ignore, "Floating": floating, "UseDom": False,
+                                   "EnablePatterns": False},
+            "IgnoreMismatch": False,
+            "Trim": {"Enabled": False},
+        },
+        "UserInputs": user_inputs,
+        "AppOutput": {"title": "Benchmark page", "screenshot64": None,
+                      "screenshotUrl": "https://eyes.example.com/blobs/0123456789abcdef",
+                      "domUrl": "https://eyes.example.com/blobs/fedcba9876543210"},
+        "tag": "Checkpoint",
+    }
+
+
+def _intersect_many(regions, other):
+    # type: (tp.List[Region], Region) -> None
+    for region in regions:
+        Region(region.left, region.top, region.width, region.height).intersect(other)
+
+
+def _log_parts(parts, app_output, deferred):
+    # type: (tp.List[Region], tp.Dict[tp.Text, tp.Any], bool) -> None
+    """
+    Logs debug messages as a stitching loop and a match do, with logging disabled.
+    """
+    previous_logger, logger._logger = logger._logger, None
+    try:
+        for part in parts:
+            if deferred:
+                logger.debug("Taking screenshot for {0}", part)
+                logger.debug("Scrolled To ({0},{1})", part.left, part.top)
+                logger.debug('AppOutput: {}', app_output)
+            else:
+                logger.debug("Taking screenshot for {0}".format(part))
+                logger.debug("Scrolled To ({0},{1})".format(part.left, part.top))
+                logger.debug('AppOutput: {}'.format(app_output))
+    finally:
+        logger._logger = previous_logger
+
+
+def _parts_and_app_output(megapixels):
+    # type: (float) -> tp.Tuple[tp.List[Region], tp.Dict[tp.Text, tp.Any]]
+    return [Region(0, i * 500, IMAGE_WIDTH, 500) for i in range(100)], _match_payload()['AppOutput']
+
+
+BENCHMARKS = [
+    MicroBenchmark('image_utils.scale_image', lambda mp: (_image(mp), 0.5), image_utils.scale_image),
+    MicroBenchmark('image_utils.get_bytes', lambda mp: (_image(mp),), image_utils.get_bytes),
+    MicroBenchmark('image_utils.get_base64', lambda mp: (_image(mp),), image_utils.get_base64),
+    MicroBenchmark('image_utils.get_image_part', _image_and_viewport, image_utils.get_image_part),
+    # Images are decoded lazily, so they're loaded to time the decoding too.
+    MicroBenchmark('image_utils.image_from_base64', lambda mp: (image_utils.get_base64(_image(mp)),),
+                   lambda base64_str: image_utils.image_from_base64(base64_str).load()),
+    MicroBenchmark('geometry.Region.get_sub_regions',
+                   lambda mp: (Region(0, 0, IMAGE_WIDTH, int(mp * 1000 * 1000 / IMAGE_WIDTH)),
+                               {'width': 500, 'height': 500}),
+                   Region.get_sub_regions),
+    MicroBenchmark('geometry.Region.intersect[1000 regions]',
+                   lambda mp: ([Region(i, i * 3, 200, 100) for i in range(1000)], Region(100, 100, 1280, 800)),
+                   _intersect_many, sized=False),
+    MicroBenchmark('general_utils.to_json[match payload]', lambda mp: (_match_payload(),), general_utils.to_json,
+                   sized=False),
+    # The overhead of the debug messages of 100 screenshot parts when no logger is set.
+    MicroBenchmark('logger.debug[disabled, eager format]', lambda mp: _parts_and_app_output(mp) + (False,),
+                   _log_parts, sized=False),
+    MicroBenchmark('logger.debug[disabled, deferred format]', lambda mp: _parts_and_app_output(mp) + (True,),
+                   _log_parts, sized=False),
+]  # type: tp.List[MicroBenchmark]
+
+
+def run(benchmarks=None,  # type: tp.Optional[tp.List[MicroBenchmark]]
+        sizes=DEFAULT_SIZES,  # type: tp.Sequence[float]
+        min_rounds=3,  # type: int
+        max_time=1.0,  # type: float
+        report=lambda name, stats: None,  # type: tp.Callable[[tp.Text, BenchmarkStats], None]
+        ):
+    # type: (...) -> tp.Dict[tp.Text, BenchmarkStats]
+    """
+    Runs the benchmarks on every size, and returns their stats by full name.
+
+    :param report: Called with the full name and stats of every benchmark once it ran.
+    """
+    results = {}
+    for benchmark in benchmarks if benchmarks is not None else BENCHMARKS:
+        for size in sizes if benchmark.sized else sizes[:1]:
+            args = benchmark.setup(size)
+            stats = measure(benchmark.func, args, min_rounds, max_time)
+            results[benchmark.full_name(size)] = stats
+            report(benchmark.full_name(size), stats)
+            del args
+    return results
+
+
+def _machine_info():
+    # type: () -> tp.Dict[tp.Text, tp.Text]
+    return dict(node=platform.node(), system=platform.system(), machine=platform.machine(),
+                processor=platform.processor(), python=platform.python_version(),
+                implementation=platform.python_implementation())
+
+
+def _commit():
+    # type: () -> tp.Optional[tp.Text]
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=os.path.dirname(__file__), stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+class BaselineHistory(object):
+    """
+    The saved runs of the benchmarks, oldest first, in a JSON file.
+    """
+
+    def __init__(self, path=DEFAULT_BASELINES):
+        # type: (tp.Text) -> None
+        self.path = path
+        self.runs = []  # type: tp.List[tp.Dict[tp.Text, tp.Any]]
+        if os.path.exists(path):
+            with open(path) as f:
+                self.runs = json.load(f)['runs']
+
+    def latest(self, machine=None):
+        # type: (tp.Optional[tp.Dict[tp.Text, tp.Text]]) -> tp.Optional[tp.Dict[tp.Text, tp.Any]]
+        """
+        Returns the latest run, on the given machine if any, as runs on others aren't comparable.
+        """
+        for saved_run in reversed(self.runs):
+            if machine is None or saved_run['machine'] == machine:
+                return saved_run
+        return None
+
+    def add(self, results):
+        # type: (tp.Dict[tp.Text, BenchmarkStats]) -> tp.Dict[tp.Text, tp.Any]
+        saved_run = dict(datetime=datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'), commit=_commit(),
+                         machine=_machine_info(),
+                         benchmarks={name: stats.as_dict() for name, stats in sorted(results.items())})
+        self.runs.append(saved_run)
+        return saved_run
+
+    def save(self):
+        # type: () -> None
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.path, 'w') as f:
+            json.dump(dict(runs=self.runs), f, indent=2, sort_keys=True)
+            f.write('\n')
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    # type: (tp.Dict[tp.Text, BenchmarkStats], tp.Dict[tp.Text, tp.Any], float) -> tp.List[tp.Dict[tp.Text, tp.Any]]
+    """
+    Compares the medians of the results with those of the baseline run. Returns a row per
+    benchmark the baseline has, with the relative change and whether it's a regression.
+    """
+    rows = []
+    for name, stats in sorted(results.items()):
+        saved = baseline['benchmarks'].get(name)
+        if saved is None:
+            continue
+        change = stats.median / saved['median'] - 1 if saved['median'] else 0.0
+        rows.append(dict(name=name, baseline=saved['median'], median=stats.median, change=change,
+                         regression=change > threshold))
+    return rows
+
+
+def _format_seconds(seconds):
+    # type: (float) -> tp.Text
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '{:.3f} {}'.format(seconds / scale, unit)
+    return '{:.3f} ns'.format(seconds / 1e-9)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.micro',
+                                     description='Runs the micro-benchmarks of the image and geometry functions.')
+    parser.add_argument('-k', dest='filter', default='', help='Only run the benchmarks whose name contains this.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='The comma-separated megapixels of the images.')
+    parser.add_argument('--min-rounds', type=int, default=3)
+    parser.add_argument('--max-time', type=float, default=1.0, help='The seconds to time every benchmark for.')
+    parser.add_argument('--baselines', default=DEFAULT_BASELINES, help='The JSON file of the saved runs.')
+    parser.add_argument('--save', action='store_true', help='Add the run to the saved ones.')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare with the latest saved run of this machine, and exit with 1 on regressions.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='The relative slowdown of the median reported as a regression.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args(argv)
+
+    benchmarks = [benchmark for benchmark in BENCHMARKS if args.filter in benchmark.name]
+    sizes = [float(size) for size in args.sizes.split(',')]
+
+    def report(name, stats):
+        if not args.json:
+            print('{:<50} median {:>12}  min {:>12}  rounds {}'.format(
+                name, _format_seconds(stats.median), _format_seconds(stats.min), stats.rounds))
+
+    results = run(benchmarks, sizes, args.min_rounds, args.max_time, report)
+    history = BaselineHistory(args.baselines)
+    regressions = []
+    if args.compare:
+        baseline = history.latest(_machine_info())
+        if baseline is None:
+            print('No saved run of this machine to compare with. Run with --save first.', file=sys.stderr)
+        else:
+            rows = compare(results, baseline, args.threshold)
+            regressions = [row for row in rows if row['regression']]
+            if not args.json:
+                print('\nCompared with the run of {} ({}):'.format(baseline['datetime'], baseline['commit']))
+                for row in rows:
+                    print('{:<50} {:>12} -> {:>12}  {:+.1%}{}'.format(
+                        row['name'], _format_seconds(row['baseline']), _format_seconds(row['median']),
+                        row['change'], '  REGRESSION' if row['regression'] else ''))
+    if args.save:
+        history.add(results)
+        history.save()
+    if args.json:
+        print(json.dumps(dict(benchmarks={name: stats.as_dict() for name, stats in sorted(results.items())},
+                              regressions=regressions), indent=2))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+The benchmarked scenarios: a page for the fake driver, and the checks made on it.
+"""
+from __future__ import absolute_import
+
+import typing as tp
+
+from applitools.selenium import Eyes
+from applitools.selenium.capture.css_cache import CssCache
+
+from .fake_webdriver import FakeElement, FakePage
+
+__all__ = ('Scenario', 'SCENARIOS')
+
+
+class Scenario(object):
+    """
+    A test made of one or more checks of a page, between Eyes.open and Eyes.close.
+    """
+
+    def __init__(self,
+                 name,  # type: tp.Text
+                 description,  # type: tp.Text
+                 page,  # type: tp.Callable[[], FakePage]
+                 check,  # type: tp.Callable[[Eyes, tp.Any], None]
+                 configure=lambda eyes: None,  # type: tp.Callable[[Eyes], None]
+                 ):
+        # type: (...) -> None
+        """
+        :param page: Creates the page the fake driver shows.
+        :param check: Makes the checks, given the open Eyes and its driver.
+        :param configure: Configures the Eyes instance before it's opened.
+        """
+        self.name = name
+        self.description = description
+        self.page = page
+        self.check = check
+        self.configure = configure
+
+
+def _check_window(eyes, driver):
+    eyes.check_window('Window')
+
+
+def _check_scrollable_element(eyes, driver):
+    eyes.check_region_by_element(driver.find_element_by_css_selector('#scrollable'), 'Element', stitch_content=True)
+
+
+def _force_full_page(eyes):
+    eyes.force_full_page_screenshot = True
+
+
+def _send_dom(eyes):
+    eyes.send_dom = True
+    # Stylesheets are downloaded on every run, rather than served from the cache of previous ones.
+    eyes.css_cache = CssCache()
+
+
+SCENARIOS = [
+    Scenario('viewport', 'A single viewport screenshot',
+             lambda: FakePage(entire_size=(800, 3000)),
+             _check_window),
+    Scenario('full_page', 'A full page screenshot stitched from 20 viewports',
+             lambda: FakePage(entire_size=(800, 12000)),
+             _check_window, _force_full_page),
+    Scenario('element_stitch', 'A scrollable element stitched from 10 of its client areas',
+             lambda: FakePage(entire_size=(800, 1200),
+                              elements=[FakeElement('scrollable', '#scrollable', (50, 100), (600, 400), (600, 4000))]),
+             _check_scrollable_element),
+    Scenario('dom_capture', 'A viewport screenshot and the DOM of its page, with 50 stylesheets',
+             lambda: FakePage(entire_size=(800, 3000), stylesheets=50, dom_nodes=2000),
+             _check_window, _send_dom),
+]  # type: tp.List[Scenario]
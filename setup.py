@@ -39,7 +39,7 @@ if sys.version_info < (3, 5):
 setup(
     name='eyes-selenium',
     version=get_version(),
-    packages=find_packages(exclude=('tests',)),
+    packages=find_packages(exclude=('tests', 'benchmarks', 'benchmarks.*')),
     url='http://www.applitools.com',
     license='Apache License, Version 2.0',
     author='Applitools Team',
@@ -75,6 +75,7 @@ setup(
             'pytest-xdist==1.26.1',
             'mock'
         ],
+        'numpy':   ['numpy'],
     },
     package_data={
         '':           ['README.md', 'samples'],
@@ -13,6 +13,7 @@ Example of usage:
 import os
 import sys
 
+import mock
 import pytest
 from selenium import webdriver
 from selenium.common.exceptions import WebDriverException
@@ -28,6 +29,23 @@ from .platfroms import SUPPORTED_PLATFORMS, SUPPORTED_PLATFORMS_DICT
 logger.set_logger(StdoutLogger())
 
 
+@pytest.fixture
+def response():
+    """
+    Returns a factory of mocked `requests` responses.
+    """
+
+    def create(status_code=200, json_data=None, location=None, text='', headers=None):
+        result = mock.Mock(status_code=status_code, ok=status_code < 400, url='https://eyes.example.com',
+                           text=text, headers=dict(headers or {}))
+        if location:
+            result.headers['Location'] = location
+        result.json.return_value = json_data
+        return result
+
+    return create
+
+
 @pytest.fixture(scope="function")
 def eyes(request):
     # TODO: allow to setup logger level through pytest option
@@ -0,0 +1,25 @@
+import mock
+import pytest
+
+from applitools.core import PollingStrategy, RenderInfoCache, UploadIndex
+from applitools.core.agent_connector import AgentConnector
+
+
+@pytest.fixture
+def connector_class():
+    return AgentConnector
+
+
+@pytest.fixture
+def connector(connector_class):
+    """
+    Returns a connector with caches of its own, whose transport is mocked.
+    """
+    connector = connector_class('https://eyes.example.com', 'agent', polling_strategy=PollingStrategy(jitter=0))
+    connector.api_key = 'key'
+    connector._render_info_cache = RenderInfoCache()
+    connector._upload_index = UploadIndex()
+    connector._transport = mock.Mock()
+    for name in ('get', 'post', 'put', 'delete'):
+        getattr(connector._transport, name).__name__ = name
+    return connector
@@ -0,0 +1,75 @@
+import sys
+
+import mock
+import pytest
+
+from applitools.core.agent_connector import AgentConnector
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 5), reason="asyncio connector requires Python 3.5+")
+
+
+@pytest.fixture
+def loop():
+    import asyncio
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+@pytest.fixture
+def connector_class(loop):
+    from applitools.core.agent_connector_async import AsyncAgentConnector
+    return AsyncAgentConnector
+
+
+def test_start_session_polls_long_request(loop, connector, response):
+    session = {'id': 'session-id', 'url': 'https://eyes.example.com/s', 'isNew': True}
+    connector._transport.post.return_value = response(202, location='https://eyes.example.com/poll')
+    connector._transport.get.side_effect = [response(200, location='https://eyes.example.com/poll'),
+                                            response(201, location='https://eyes.example.com/done')]
+    connector._transport.delete.return_value = response(200, session)
+    with mock.patch('asyncio.sleep', return_value=_completed(loop)) as sleep:
+        running_session = loop.run_until_complete(connector.start_session_async({}))
+
+    assert running_session == dict(session_id='session-id',
+                                   session_url='https://eyes.example.com/s',
+                                   is_new_session=True)
+    assert connector._transport.get.call_count == 2
+    assert [call[0][0] for call in sleep.call_args_list] == [3.0, 4.5]
+    assert connector.polling_stats['start_session']['polls']['count'] == 1
+
+
+def test_sessions_run_concurrently(loop, connector, response):
+    import asyncio
+    connector._transport.post.return_value = response(200, {'asExpected': True})
+    results = loop.run_until_complete(asyncio.gather(
+        *[connector.match_window_async({'session_id': str(i)}, b'data') for i in range(5)]
+    ))
+    assert results == [True] * 5
+    assert connector._transport.post.call_count == 5
+
+
+def test_upload_fetches_render_info_on_cold_cache(loop, connector, response):
+    connector._transport.get.return_value = response(
+        200, {'accessToken': 'token', 'resultsUrl': 'https://storage.example.com/__random__'})
+    connector._transport.put.return_value = response(201)
+
+    dom_url = loop.run_until_complete(connector.post_dom_capture_async('{"tagName": "HTML"}'))
+
+    assert dom_url.startswith('https://storage.example.com/')
+    assert connector._transport.get.call_count == 1
+    assert connector._transport.put.call_args[1]['headers']['X-Auth-Token'] == 'token'
+
+
+def test_async_connector_is_an_agent_connector(connector, response):
+    assert isinstance(connector, AgentConnector)
+    connector._transport.post.return_value = response(200, {'asExpected': True})
+    assert connector.match_window({'session_id': 'sync'}, b'data') is True
+
+
+def _completed(loop):
+    future = loop.create_future()
+    future.set_result(None)
+    return future
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from applitools.core import ConnectionSettings, HttpTransport
+from applitools.core.agent_connector import AgentConnector
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server_url():
+    server = _Server(('127.0.0.1', 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield 'http://127.0.0.1:%d' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(server_url):
+    transport = HttpTransport()
+    for _ in range(20):
+        assert transport.get(server_url + '/api/sessions/renderinfo').ok
+    stats = transport.connection_stats
+    assert stats['requests'] == 20
+    assert stats['connections_opened'] == 1
+    assert stats['connections_reused'] == 19
+
+
+def test_no_keep_alive_opens_connection_per_request(server_url):
+    transport = HttpTransport(ConnectionSettings(keep_alive=False))
+    for _ in range(5):
+        transport.post(server_url, data=b'x')
+    assert transport.connection_stats['connections_opened'] == 5
+
+
+def test_pool_is_shared_between_threads(server_url):
+    transport = HttpTransport(ConnectionSettings(pool_maxsize=2))
+
+    def send():
+        for _ in range(10):
+            transport.put(server_url, data=b'data')
+
+    threads = [threading.Thread(target=send) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = transport.connection_stats
+    assert stats['requests'] == 20
+    assert stats['connections_opened'] <= 2
+
+
+def test_per_host_pool_size_and_proxies():
+    settings = ConnectionSettings(per_host_pool_maxsize={'eyes.example.com': 3},
+                                  proxies={'https': 'http://proxy:3128'})
+    transport = HttpTransport(settings)
+    session = transport.session
+    adapter = session.get_adapter('https://eyes.example.com/api/sessions/running')
+    assert adapter._pool_maxsize == 3
+    assert session.get_adapter('https://other.example.com/')._pool_maxsize == 10
+    assert session.proxies['https'] == 'http://proxy:3128'
+
+
+def test_agent_connector_can_share_transport():
+    transport = HttpTransport()
+    first = AgentConnector('https://eyes.example.com', 'agent', transport=transport)
+    second = AgentConnector('https://eyes.example.com', 'agent', transport=transport)
+    assert first.transport is second.transport
@@ -0,0 +1,135 @@
+import logging
+import threading
+
+import pytest
+
+from applitools.core import logger
+
+
+class _RecordingHandler(logging.Handler):
+    def __init__(self):
+        super(_RecordingHandler, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    handler = _RecordingHandler()
+    previous_logger = logger._logger
+    logger.set_logger(logger._Logger('eyes.test_logger', logging.INFO, lambda: handler))
+    try:
+        yield handler.records
+    finally:
+        logger.set_logger(previous_logger)
+
+
+class _Formatted(object):
+    count = 0
+
+    def __format__(self, format_spec):
+        _Formatted.count += 1
+        return 'formatted'
+
+
+def test_records_are_stamped_with_the_context(records):
+    log_context = logger.LogContext('Login page', session_id='abcd1234')
+    logger.info('outside')
+    with logger.context(log_context):
+        logger.info('inside {}', 1)
+
+    outside, inside = records
+    assert (outside.eyes_context, outside.eyes_session_id) == ('', None)
+    assert inside.getMessage() == 'inside 1'
+    assert inside.eyes_context == '[abcd1234 Login page] '
+    assert (inside.eyes_session_id, inside.eyes_test_name) == ('abcd1234', 'Login page')
+
+
+def test_records_of_other_loggers_are_formatted(capsys):
+    previous_logger = logger._logger
+    logger.set_logger(logger.StdoutLogger(name='myapp'))
+    try:
+        logging.getLogger('myapp').info('from the app')
+        with logger.context(logger.LogContext('Child', session_id='abcd1234')):
+            logging.getLogger('myapp.child').warning('from a child')
+    finally:
+        logger.set_logger(previous_logger)
+
+    out, err = capsys.readouterr()
+    assert 'myapp: from the app' in out
+    assert 'myapp.child: [abcd1234 Child] from a child' in out
+    assert 'Logging error' not in err
+
+
+def test_disabled_messages_are_not_formatted(records):
+    _Formatted.count = 0
+    logger.debug('value: {}', _Formatted())
+    assert (records, _Formatted.count) == ([], 0)
+
+    logger.info('value: {value}', value=_Formatted())
+    assert records[0].getMessage() == 'value: formatted'
+    assert _Formatted.count == 1
+
+
+def test_bound_functions_log_in_the_context_of_the_caller(records):
+    log_context = logger.LogContext('Bound')
+    with logger.context(log_context):
+        func = logger.bind_context(lambda: logger.info('from the pool'))
+    thread = threading.Thread(target=func)
+    thread.start()
+    thread.join()
+
+    assert records[0].eyes_session_id == log_context.session_id
+
+
+def test_closing_a_session_does_not_affect_other_threads(records):
+    opened = threading.Event()
+    closed = threading.Event()
+    other_context = logger.LogContext('Other')
+
+    def other_session():
+        logger.open_(other_context)
+        opened.set()
+        closed.wait()
+        logger.info('still logging')
+        logger.close(other_context)
+
+    thread = threading.Thread(target=other_session)
+    thread.start()
+    opened.wait()
+    log_context = logger.LogContext('Mine')
+    logger.open_(log_context)
+    logger.close(log_context)
+    assert logger.get_context() is None
+    closed.set()
+    thread.join()
+
+    assert [record.eyes_test_name for record in records] == ['Other']
+
+
+def test_callable_messages_are_built_only_if_enabled(records):
+    built = []
+
+    def message():
+        built.append(True)
+        return 'built {}'
+
+    logger.debug(message)
+    assert (logger.is_enabled_for(logging.DEBUG), built) == (False, [])
+
+    assert logger.is_enabled_for(logging.INFO)
+    logger.info(message, 'once')
+    assert records[0].getMessage() == 'built once'
+    assert built == [True]
+
+
+def test_nothing_is_enabled_without_a_logger():
+    previous_logger = logger._logger
+    logger.set_logger(None)
+    try:
+        assert not logger.is_enabled_for(logging.WARNING)
+        logger.debug(lambda: 1 / 0)
+    finally:
+        logger.set_logger(previous_logger)
@@ -0,0 +1,79 @@
+import mock
+import pytest
+from PIL import Image
+
+from applitools.core import ImageMatchSettings
+from applitools.core.match_window_task import MatchWindowTask
+from applitools.utils import image_utils
+
+
+def _screenshot(color):
+    return mock.Mock(_screenshot=Image.new('RGBA', (32, 24), color))
+
+
+@pytest.fixture
+def clock():
+    now = [1000.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    with mock.patch('time.time', lambda: now[0]), mock.patch('time.sleep', sleep):
+        yield now
+
+
+def _task(screenshots, stabilization_timeout=0):
+    eyes = mock.MagicMock(send_dom=False, use_dom=False, enable_patterns=False, _title='title',
+                          stabilization_timeout=stabilization_timeout)
+    eyes.get_screenshot.side_effect = screenshots
+    connector = mock.Mock()
+    connector.match_window.return_value = False
+    connector._try_upload_data.return_value = 'https://storage.example.com/image'
+    return MatchWindowTask(eyes, connector, {'session_id': 'id'}, 2000), eyes, connector
+
+
+def test_fingerprint_of_identical_images_is_equal():
+    first = image_utils.get_fingerprint(Image.new('RGB', (100, 50), 'white'))
+    second = image_utils.get_fingerprint(Image.new('RGB', (100, 50), 'white'))
+    changed = Image.new('RGB', (100, 50), 'white')
+    changed.putpixel((10, 10), (0, 0, 0))
+    assert first == second
+    assert first != image_utils.get_fingerprint(changed)
+    assert first.distance(image_utils.get_fingerprint(changed)) <= 1
+
+
+def test_retries_with_unchanged_screenshot_are_skipped(clock):
+    screenshot = _screenshot('white')
+    task, eyes, connector = _task(iter(lambda: screenshot, None))
+    result = task.match_window(2000, 'tag', [], ImageMatchSettings(), target=None)
+    assert result['as_expected'] is False
+    # The first attempt and the last (not ignored) attempt are sent, the rest are skipped.
+    assert connector.match_window.call_count == 2
+    assert task.skipped_matches == 4
+
+
+def test_retries_with_changed_screenshot_are_sent(clock):
+    colors = iter(['white', 'black', 'red', 'green', 'blue', 'yellow', 'gray'])
+    task, eyes, connector = _task(lambda **kwargs: _screenshot(next(colors)))
+    task.match_window(2000, 'tag', [], ImageMatchSettings(), target=None)
+    assert connector.match_window.call_count == 6
+    assert task.skipped_matches == 0
+
+
+def test_first_match_waits_until_screenshot_is_stable(clock):
+    screenshots = [_screenshot('white'), _screenshot('black'), _screenshot('red'), _screenshot('red')]
+    task, eyes, connector = _task(screenshots, stabilization_timeout=1000)
+    connector.match_window.return_value = True
+    result = task.match_window(2000, 'tag', [], ImageMatchSettings(), target=None)
+    assert result == {'as_expected': True, 'screenshot': screenshots[3]}
+    assert eyes.get_screenshot.call_count == 4
+    assert connector.match_window.call_count == 1
+
+
+def test_single_match_does_not_fingerprint_the_screenshot():
+    task, eyes, connector = _task([_screenshot('white')])
+    with mock.patch.object(image_utils, 'get_fingerprint') as get_fingerprint:
+        task.match_window(0, 'tag', [], ImageMatchSettings(), target=None)
+    assert connector.match_window.call_count == 1
+    assert get_fingerprint.call_count == 0
+    assert task._last_fingerprint is None
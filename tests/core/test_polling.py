@@ -0,0 +1,54 @@
+import mock
+import pytest
+
+from applitools.core import LongRequestTimeoutError, PollingStrategy
+
+
+def test_delays_grow_up_to_max_delay():
+    poll = PollingStrategy(jitter=0, timeout=None).begin('endpoint')
+    assert [poll.next_delay() for _ in range(6)] == [3.0, 4.5, 6.75, 10.0, 10.0, 10.0]
+
+
+def test_jitter_randomizes_delays():
+    poll = PollingStrategy(jitter=0.5, timeout=None).begin('endpoint')
+    delays = [poll.next_delay() for _ in range(20)]
+    assert all(5.0 <= delay <= 15.0 for delay in delays[5:])
+    assert len(set(delays[5:])) > 1
+
+
+def test_retry_after_overrides_delay(response):
+    poll = PollingStrategy(jitter=0).begin('endpoint')
+    poll.on_response(response(202, headers={'Retry-After': '1'}))
+    assert poll.next_delay() == 1.0
+    poll.on_response(response(200))
+    assert poll.next_delay() == 4.5
+
+
+def test_long_request_polls_iteratively_until_done(connector, response):
+    connector._transport.post.return_value = response(202, location='https://eyes.example.com/poll')
+    connector._transport.get.side_effect = [response(200)] * 50 + [response(201, location='/done')]
+    connector._transport.delete.return_value = response(200)
+    with mock.patch('time.sleep'):
+        connector.long_request(connector._transport.post, 'https://eyes.example.com/api', endpoint='test')
+    assert connector._transport.get.call_count == 51
+    stats = connector.polling_stats['test']
+    assert stats['polls']['count'] == 1
+    assert stats['polls']['buckets']['>20'] == 1
+
+
+def test_long_request_gives_up_after_deadline(connector, response):
+    connector.polling_strategy = PollingStrategy(jitter=0, timeout=5)
+    connector._transport.post.return_value = response(202, location='https://eyes.example.com/poll')
+    connector._transport.get.return_value = response(200)
+    clock = [1000.0]
+
+    def sleep(seconds):
+        clock[0] += seconds
+
+    with mock.patch('time.time', lambda: clock[0]), mock.patch('time.sleep', sleep):
+        with pytest.raises(LongRequestTimeoutError):
+            connector.long_request(connector._transport.post, 'https://eyes.example.com/api/sessions')
+    # 3 + 4.5 seconds would exceed the budget
+    assert connector._transport.get.call_count == 1
+    assert clock[0] == 1003.0
+    assert '/api/sessions' in connector.polling_stats
@@ -0,0 +1,70 @@
+import base64
+import json
+import time
+
+import mock
+
+from applitools.core import RenderInfoCache
+
+
+def _jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': exp}).encode('utf-8')).decode('ascii')
+    return 'header.{}.signature'.format(payload.rstrip('='))
+
+
+def test_render_info_is_cached_until_token_expires():
+    cache = RenderInfoCache(refresh_margin=60)
+    fetch = mock.Mock(return_value={'accessToken': _jwt(time.time() + 3600)})
+    for _ in range(5):
+        cache.get('key', fetch)
+    assert fetch.call_count == 1
+    assert cache.stats == dict(hits=4, misses=1, invalidations=0)
+
+
+def test_render_info_refreshed_before_expiration():
+    cache = RenderInfoCache(refresh_margin=60)
+    fetch = mock.Mock(return_value={'accessToken': _jwt(time.time() + 30)})
+    cache.get('key', fetch)
+    cache.get('key', fetch)
+    assert fetch.call_count == 2
+
+
+def test_render_info_without_token_expiration_uses_default_ttl():
+    cache = RenderInfoCache(default_ttl=0, refresh_margin=0)
+    fetch = mock.Mock(return_value={'accessToken': 'opaque'})
+    cache.get('key', fetch)
+    cache.get('key', fetch)
+    assert fetch.call_count == 2
+
+
+def test_invalidated_keys_are_dropped():
+    cache = RenderInfoCache()
+    fetch = mock.Mock(return_value={'accessToken': 'opaque'})
+    for i in range(3):
+        cache.invalidate(i, cache.get(i, fetch))
+    assert cache._entries == {}
+    assert cache.stats == dict(hits=0, misses=3, invalidations=3)
+
+
+def test_render_info_shared_between_uploads(connector, response):
+    render_info = {'accessToken': _jwt(time.time() + 3600),
+                   'resultsUrl': 'https://storage.example.com/__random__'}
+    connector._transport.get.return_value = response(200, render_info)
+    connector._transport.put.return_value = response(201)
+
+    for _ in range(3):
+        assert connector._try_upload_data(b'png', 'image/png', 'image/png')
+    assert connector._transport.get.call_count == 1
+    assert connector.render_info_stats['hits'] == 2
+
+
+def test_render_info_refreshed_on_rejected_token(connector, response):
+    old_info = {'accessToken': 'old', 'resultsUrl': 'https://storage.example.com/__random__'}
+    new_info = {'accessToken': 'new', 'resultsUrl': 'https://storage.example.com/__random__'}
+    connector._transport.get.side_effect = [response(200, old_info), response(200, new_info)]
+    connector._transport.put.side_effect = [response(403), response(201)]
+
+    assert connector._try_upload_data(b'png', 'image/png', 'image/png')
+    tokens = [c[1]['headers']['X-Auth-Token'] for c in connector._transport.put.call_args_list]
+    assert tokens == ['old', 'new']
+    assert connector.render_info_stats['invalidations'] == 1
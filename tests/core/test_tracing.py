@@ -0,0 +1,70 @@
+import pytest
+from PIL import Image
+
+from applitools.core import SpanHistogramHook, TraceHook, add_trace_hook, remove_trace_hook, tracing
+from applitools.utils import image_utils
+
+
+class RecordingHook(TraceHook):
+    def __init__(self):
+        self.events = []
+
+    def on_start(self, span):
+        self.events.append(('start', span.name))
+
+    def on_end(self, span):
+        self.events.append(('end', span.name, span.parent and span.parent.name))
+
+
+@pytest.fixture
+def hook():
+    hook = RecordingHook()
+    add_trace_hook(hook)
+    yield hook
+    remove_trace_hook(hook)
+
+
+def test_spans_are_no_ops_without_hooks():
+    assert tracing.span('capture') is tracing._NO_SPAN
+    with tracing.span('capture') as span:
+        span.set_attribute('type', 'viewport')
+
+
+def test_nested_spans_reach_hooks(hook):
+    with tracing.span('capture', type='viewport') as span:
+        image_utils.scale_image(Image.new('RGB', (20, 20)), 0.5)
+    assert span.attributes == dict(type='viewport')
+    assert hook.events == [('start', 'capture'), ('start', 'scale'), ('end', 'scale', 'capture'),
+                           ('end', 'capture', None)]
+
+
+def test_failing_hooks_and_errors_do_not_break_spans(hook):
+    class FailingHook(TraceHook):
+        def on_start(self, span):
+            raise RuntimeError()
+
+    failing = FailingHook()
+    add_trace_hook(failing)
+    try:
+        with pytest.raises(ValueError):
+            with tracing.span('upload') as span:
+                raise ValueError()
+    finally:
+        remove_trace_hook(failing)
+    assert isinstance(span.error, ValueError)
+    assert hook.events[-1] == ('end', 'upload', None)
+
+
+def test_histogram_hook_aggregates_durations():
+    histograms = SpanHistogramHook(bounds=(1, 10))
+    add_trace_hook(histograms)
+    try:
+        for _ in range(3):
+            with tracing.span('encode'):
+                pass
+    finally:
+        remove_trace_hook(histograms)
+    stats = histograms.as_dict()['encode']
+    assert stats['durations']['count'] == 3
+    assert stats['durations']['buckets']['<=1'] == 3
+    assert stats['errors'] == 0
@@ -0,0 +1,65 @@
+import mock
+import pytest
+
+from applitools.utils.caching import LRUCache
+from applitools.utils.streaming import GzipSpool
+
+
+@pytest.fixture
+def connector(connector, response):
+    connector._transport.get.return_value = response(200, {
+        'accessToken': 'token', 'resultsUrl': 'https://storage.example.com/__random__'})
+    connector._transport.put.return_value = response(201)
+    return connector
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_uploads_are_not_deduplicated_by_default(connector):
+    urls = {connector._try_upload_data(b'png', 'image/png', 'image/png') for _ in range(3)}
+    assert len(urls) == 3
+    assert connector._transport.put.call_count == 3
+
+
+def test_identical_payloads_reuse_uploaded_url(connector):
+    connector.deduplicate_uploads = True
+    urls = {connector._try_upload_data(b'png', 'image/png', 'image/png') for _ in range(3)}
+    other = connector._try_upload_data(b'other png', 'image/png', 'image/png')
+    assert len(urls) == 1
+    assert other not in urls
+    assert connector._transport.put.call_count == 2
+    assert connector.upload_dedup_stats == dict(hits=2, misses=2, bytes_saved=6)
+
+
+def test_failed_uploads_are_not_indexed(connector, response):
+    connector.deduplicate_uploads = True
+    connector._transport.put.return_value = response(500)
+    with mock.patch('time.sleep'):
+        assert connector._try_upload_data(b'png', 'image/png', 'image/png') is None
+    connector._transport.put.return_value = response(201)
+    assert connector._try_upload_data(b'png', 'image/png', 'image/png') is not None
+    assert connector.upload_dedup_stats['hits'] == 0
+
+
+def test_streamed_payloads_are_uploaded_and_deduplicated(connector):
+    connector.deduplicate_uploads = True
+    spools = []
+    for _ in range(2):
+        spool = GzipSpool()
+        spool.write(u'{"tagName":"HTML"}')
+        spools.append(spool)
+    urls = {connector.post_dom_capture(spool) for spool in spools}
+    assert len(urls) == 1
+    assert connector._transport.put.call_count == 1
+    _, kwargs = connector._transport.put.call_args
+    assert kwargs['data'] is spools[0]
+    assert kwargs['headers']['Content-Length'] == str(len(spools[0].getvalue()))
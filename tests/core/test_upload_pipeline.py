@@ -0,0 +1,94 @@
+import threading
+import time
+
+import mock
+import pytest
+from PIL import Image
+
+from applitools.core import ImageMatchSettings, UploadPipeline
+from applitools.core.match_window_task import MatchWindowTask
+
+
+def test_pipeline_returns_results_in_order():
+    pipeline = UploadPipeline(workers=3)
+    handles = [pipeline.submit(lambda i=i: {'as_expected': i % 2 == 0}, 10, tag=str(i)) for i in range(6)]
+    assert [h.tag for h in pipeline.drain()] == [str(i) for i in range(6)]
+    assert [h.result()['as_expected'] for h in handles] == [True, False] * 3
+    assert pipeline.in_flight_bytes == 0
+    pipeline.close()
+
+
+def test_pipeline_caps_in_flight_bytes():
+    pipeline = UploadPipeline(workers=4, max_in_flight_bytes=100)
+    release = threading.Event()
+    first = pipeline.submit(lambda: release.wait(5), 60)
+    submitted = threading.Event()
+
+    def submit_second():
+        pipeline.submit(lambda: True, 60)
+        submitted.set()
+
+    thread = threading.Thread(target=submit_second)
+    thread.start()
+    # The second job doesn't fit until the first one completes.
+    assert not submitted.wait(0.2)
+    assert pipeline.in_flight_bytes == 60
+    release.set()
+    assert submitted.wait(5)
+    thread.join()
+    assert first.result() is True
+    pipeline.close()
+    assert pipeline.in_flight_bytes == 0
+
+
+def test_ordered_steps_run_in_order_of_submission():
+    pipeline = UploadPipeline(workers=3)
+    matched = []
+
+    def upload(i):
+        if i == 0:
+            # The first upload is the slowest, completing after the later ones.
+            time.sleep(0.2)
+        return i
+
+    handles = [pipeline.submit(lambda i=i: upload(i), 1, tag=str(i), ordered=lambda i: matched.append(i) or i)
+               for i in range(3)]
+    assert [handle.result(5) for handle in handles] == [0, 1, 2]
+    assert matched == [0, 1, 2]
+    pipeline.close()
+
+
+def test_pipeline_reports_job_exceptions():
+    pipeline = UploadPipeline()
+
+    def fail():
+        raise ValueError('upload failed')
+
+    handle = pipeline.submit(fail, 1, tag='failing')
+    pipeline.drain()
+    assert handle.done()
+    assert isinstance(handle.exception(), ValueError)
+    with pytest.raises(ValueError):
+        handle.result()
+    pipeline.close()
+
+
+def test_match_window_in_background_captures_before_returning():
+    screenshot = mock.Mock(_screenshot=Image.new('RGBA', (10, 20)))
+    eyes = mock.MagicMock(send_dom=False, use_dom=False, enable_patterns=False, _title='title',
+                          stabilization_timeout=0)
+    eyes.get_screenshot.return_value = screenshot
+    connector = mock.Mock()
+    connector.match_window.return_value = True
+    connector._try_upload_data.return_value = 'https://storage.example.com/image'
+    task = MatchWindowTask(eyes, connector, {'session_id': 'id'}, 2000)
+    pipeline = UploadPipeline()
+    pipeline.submit = mock.Mock(wraps=pipeline.submit)
+
+    handle = task.match_window_in_background(pipeline, -1, 'tag', [], ImageMatchSettings(), target=None)
+
+    eyes.get_screenshot.assert_called_once_with(hide_scrollbars_called=True)
+    assert pipeline.submit.call_args[0][1] == 10 * 20 * 4
+    assert handle.result() == {'as_expected': True, 'screenshot': screenshot}
+    connector._try_upload_data.assert_called_once()
+    pipeline.close()
@@ -0,0 +1,63 @@
+import mock
+import pytest
+
+from applitools.core import EyesError, FailureReports, TestResultsStatus
+from applitools.selenium import Eyes
+
+from benchmarks.fake_server import FakeEyesServer
+from benchmarks.fake_webdriver import FakePage, FakeWebDriver
+
+
+@pytest.fixture
+def eyes_server():
+    with FakeEyesServer() as server:
+        yield server
+
+
+@pytest.fixture
+def eyes(eyes_server):
+    eyes = Eyes(eyes_server.url)
+    eyes.api_key = 'background'
+    eyes.wait_before_screenshots = 0
+    eyes.pipeline_uploads = True
+    eyes.open(FakeWebDriver(FakePage()), 'App', 'Background', {'width': 800, 'height': 600})
+    with mock.patch.object(eyes._agent_connector, 'match_window', side_effect=EyesError('Match failed')):
+        eyes.check_window('Window')
+        yield eyes
+
+
+def test_close_aborts_the_session_of_a_failed_background_match(eyes_server, eyes):
+    results = eyes.close(raise_ex=False)
+
+    assert results.status == TestResultsStatus.Failed
+    assert not eyes.is_open
+    assert eyes_server.requests['DELETE /api/sessions/running'] == 1
+
+
+def test_close_raises_the_error_of_a_failed_background_match(eyes_server, eyes):
+    with pytest.raises(EyesError, match='Match failed'):
+        eyes.close()
+    assert eyes._log_context is None
+    eyes.abort_if_not_closed()
+    assert eyes_server.requests['DELETE /api/sessions/running'] == 1
+
+
+def test_immediate_failure_reports_are_rejected(eyes_server):
+    eyes = Eyes(eyes_server.url)
+    eyes.api_key = 'background'
+    eyes.pipeline_uploads = True
+    eyes.failure_reports = FailureReports.IMMEDIATE
+    eyes.open(FakeWebDriver(FakePage()), 'App', 'Immediate', {'width': 800, 'height': 600})
+    try:
+        with pytest.raises(EyesError, match='ON_CLOSE'):
+            eyes.check_window('Window')
+        assert eyes_server.matches == 0
+    finally:
+        eyes.abort_if_not_closed()
+
+
+def test_disabled_checks_return_no_handle():
+    eyes = Eyes()
+    eyes.is_disabled = True
+    eyes.pipeline_uploads = True
+    assert eyes._check_window_base('Window') is None
@@ -0,0 +1,22 @@
+from benchmarks.harness import get_scenario, run_scenario
+
+
+def test_viewport_scenario_runs_end_to_end():
+    result = run_scenario(get_scenario('viewport'), warmup=False)
+
+    assert result.unhandled == {}
+    assert result.webdriver_calls == sum(result.commands.values())
+    assert result.commands['screenshot'] == 1
+    assert result.requests['PUT /blobs'] == 1
+    assert result.requests['DELETE /api/sessions/running'] == 1
+    assert result.bytes_sent > 0
+    assert result.wall_seconds > 0
+
+
+def test_dom_capture_scenario_downloads_every_stylesheet():
+    result = run_scenario(get_scenario('dom_capture'), warmup=False)
+
+    assert result.unhandled == {}
+    assert result.requests['GET /css'] == 50
+    # The screenshot and the DOM.
+    assert result.requests['PUT /blobs'] == 2
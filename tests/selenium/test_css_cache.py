@@ -0,0 +1,77 @@
+import mock
+
+from applitools.selenium.capture.css_cache import CssCache, CssCacheEntry
+from applitools.utils.caching import SizedLRUCache
+
+URL = 'https://example.com/main.css'
+CSS = 'body{color:red;}'
+
+
+def _downloader(*responses):
+    return mock.Mock(side_effect=[(response, response.status_code == 304) for response in responses])
+
+
+def test_sized_lru_cache_evicts_by_total_size():
+    cache = SizedLRUCache(10)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'yyyy')
+    cache.get('a')
+    cache.put('c', 'zzzz')
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.total_size == 8
+    cache.put('d', 'w' * 11)
+    assert 'd' not in cache
+    assert cache.total_size == 8
+
+
+def test_fresh_entries_are_served_from_memory(response):
+    cache = CssCache()
+    download = _downloader(response(text=CSS, headers={'Cache-Control': 'max-age=60'}))
+    for _ in range(3):
+        assert cache.lookup(URL, download).text == 'body{color:red;}'
+    assert download.call_count == 1
+    stats = cache.stats
+    assert (stats['misses'], stats['memory_hits']) == (1, 2)
+    assert stats['hit_rate'] == 2.0 / 3
+
+
+def test_stale_entries_are_revalidated_with_their_etag(response):
+    cache = CssCache()
+    download = _downloader(response(text=CSS, headers={'ETag': '"v1"', 'Cache-Control': 'no-cache'}),
+                           response(304, headers={'Cache-Control': 'max-age=60'}))
+    cache.lookup(URL, download)
+    entry = cache.lookup(URL, download)
+    assert download.call_args[0][0] is entry
+    assert entry.etag == '"v1"'
+    assert entry.text == 'body{color:red;}'
+    assert entry.fresh
+    assert cache.stats['revalidations'] == 1
+
+
+def test_no_store_responses_are_not_cached(response):
+    cache = CssCache()
+    download = _downloader(response(text=CSS, headers={'Cache-Control': 'no-store'}), response(text='p{}'))
+    assert cache.lookup(URL, download).text == 'body{color:red;}'
+    assert cache.lookup(URL, download).text == 'p{}'
+    assert download.call_args_list[1][0][0] is None
+
+
+def test_entries_and_segments_are_kept_on_disk(tmpdir, response):
+    cache = CssCache(directory=str(tmpdir))
+    entry = cache.lookup(URL, _downloader(response(text=CSS, headers={'ETag': '"v1"'})))
+    entry.segments = [['css', 'body{color:red;}']]
+    cache.put(entry)
+
+    other_run = CssCache(directory=str(tmpdir))
+    download = _downloader()
+    loaded = other_run.lookup(URL, download)
+    assert not download.called
+    assert loaded.segments == [['css', 'body{color:red;}']]
+    assert loaded.etag == '"v1"'
+    assert other_run.stats['disk_hits'] == 1
+
+
+def test_entry_size_counts_text_and_segments():
+    entry = CssCacheEntry(URL, 'body { color: red; }', segments=[['css', 'body{color:red;}']])
+    assert entry.size == 20 + 16
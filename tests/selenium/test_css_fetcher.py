@@ -0,0 +1,37 @@
+import mock
+import pytest
+
+from applitools.selenium.capture import dom_capture
+from applitools.selenium.capture.css_cache import CssCache
+from applitools.selenium.capture.css_fetcher import CssFetcher
+
+STYLESHEETS = {
+    'https://example.com/main.css': '@import url("theme.css"); body { color: red; }',
+    'https://example.com/theme.css': 'h1 { margin: 0; }',
+}
+
+
+def _transport():
+    transport = mock.Mock()
+    transport.get.side_effect = lambda url, timeout, headers: mock.Mock(
+        text=STYLESHEETS[url], ok=True, status_code=200, headers={})
+    return transport
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_frame_css_is_bundled_through_the_fetcher(workers):
+    fetcher = CssFetcher(workers, transport=_transport(), cache=CssCache())
+    driver = mock.Mock(current_url='https://example.com/index.html')
+    driver.execute_script.return_value = [[None, 'main.css'], ['p { padding: 1px; }', None]] * 3
+    css = dom_capture._get_frame_bundled_css(driver, fetcher)
+    fetcher.close()
+    assert css == 'h1{margin:0;}body{color:red;}p{padding:1px;}' * 3
+    assert fetcher._pool is None
+    # Every stylesheet is downloaded once, and served from the cache afterwards.
+    assert fetcher._transport.get.call_count == 2
+
+
+def test_blob_urls_are_not_fetched():
+    fetcher = CssFetcher(transport=_transport(), cache=CssCache())
+    assert fetcher.fetch('blob:https://example.com/1') == ''
+    assert not fetcher._transport.get.called
@@ -0,0 +1,98 @@
+import gzip
+import io
+import json
+
+import mock
+
+from applitools.selenium.capture import dom_capture
+from applitools.selenium.capture.css_cache import CssCache
+from applitools.selenium.capture.css_fetcher import CssFetcher
+
+STYLESHEETS = {
+    'https://example.com/main.css': 'body { color: red; }',
+    'https://example.com/ads/ad.css': 'div { margin: 0; }',
+}
+
+
+def _html(*child_nodes):
+    return {'tagName': 'HTML', 'childNodes': [{'tagName': 'BODY', 'childNodes': list(child_nodes)}]}
+
+
+def _iframe(*child_nodes):
+    return {'tagName': 'IFRAME', 'childNodes': list(child_nodes)}
+
+
+# A page with a cross-origin frame (which isn't captured) and a frame nesting another one.
+DOM = _html(_iframe(), _iframe(_html(_iframe(_html()))))
+PLAN = {'url': 'https://example.com/index.html', 'css': [[None, 'main.css'], ['p { padding: 1px; }', None]],
+        'frames': [None, {'url': 'https://example.com/ads/ad.html', 'css': [[None, 'ad.css']],
+                          'frames': [{'url': 'about:blank', 'css': [['a { color: blue; }', None]], 'frames': []}]}]}
+
+
+def _fetcher(workers):
+    transport = mock.Mock()
+    transport.get.side_effect = lambda url, timeout, headers: mock.Mock(
+        text=STYLESHEETS[url], ok=True, status_code=200, headers={})
+    return CssFetcher(workers, transport=transport, cache=CssCache())
+
+
+def _driver(plan):
+    driver = mock.MagicMock(current_url='https://example.com/index.html')
+
+    def execute_script(script, *args):
+        if script == dom_capture._CAPTURE_FRAME_SCRIPT:
+            return json.dumps(DOM)
+        if script == dom_capture._PLAN_FRAMES_SCRIPT:
+            return plan
+        return [[None, 'ads/ad.css']]
+
+    driver.execute_script.side_effect = execute_script
+    return driver
+
+
+def test_frames_are_planned_without_switching():
+    driver = _driver(PLAN)
+    fetcher = _fetcher(4)
+    dom = dom_capture.get_full_window_dom(driver, return_as_dict=True, css_fetcher=fetcher)
+    fetcher.close()
+    frame = dom['childNodes'][0]['childNodes'][1]['childNodes'][0]
+    nested_frame = frame['childNodes'][0]['childNodes'][0]['childNodes'][0]
+    assert dom['css'] == 'body{color:red;}p{padding:1px;}'
+    assert frame['css'] == 'div{margin:0;}'
+    assert nested_frame['css'] == 'a{color:blue;}'
+    assert driver.execute_script.call_count == 2
+    assert not driver.switch_to.frame.called
+
+
+def test_unplanned_frames_are_traversed_by_switching():
+    plan = dict(PLAN, frames=[None, None])
+    driver = _driver(plan)
+    fetcher = _fetcher(1)
+    dom = dom_capture.get_full_window_dom(driver, return_as_dict=True, css_fetcher=fetcher)
+    frame = dom['childNodes'][0]['childNodes'][1]['childNodes'][0]
+    assert dom['css'] == 'body{color:red;}p{padding:1px;}'
+    assert frame['css'] == 'div{margin:0;}'
+    # The unplanned frame is switched to, and the frames nested in it traversed the same way.
+    assert driver.switch_to.frame.call_args_list == [mock.call(1)]
+    assert driver.switch_to.frame_and_back.call_args_list == [mock.call(0)]
+    assert driver.switch_to.parent_frame.call_count == 1
+
+
+def test_streamed_dom_matches_the_captured_one():
+    fetcher = _fetcher(1)
+    expected = dom_capture.get_full_window_dom(_driver(PLAN), return_as_dict=True, css_fetcher=fetcher)
+    spool = dom_capture.get_full_window_dom_stream(_driver(PLAN), css_fetcher=fetcher, compress_level=1)
+    assert json.loads(gzip.GzipFile(fileobj=io.BytesIO(spool.getvalue())).read().decode('utf-8')) == expected
+    assert spool.stats['raw_bytes'] > 0
+    spool.close()
+
+
+def test_failed_frame_captures_switch_back_to_the_parent_frames():
+    driver = mock.Mock()
+    try:
+        with dom_capture._switched_to_frames(driver, [0, 2]):
+            raise ValueError('capture failed')
+    except ValueError:
+        pass
+    assert [call[0] for call in driver.switch_to.frame.call_args_list] == [(0,), (2,)]
+    assert driver.switch_to.parent_frame.call_count == 2
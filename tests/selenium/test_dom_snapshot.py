@@ -0,0 +1,60 @@
+import json
+
+import mock
+
+from applitools.selenium.capture import dom_capture
+
+
+def _text(node_id, text):
+    return {'tagName': '#text', 'text': text, '$id': node_id}
+
+
+def _element(node_id, tag_name, *child_nodes, **style):
+    return {'tagName': tag_name, 'style': style, '$id': node_id, 'childNodes': list(child_nodes)}
+
+
+def _driver(*captures):
+    driver = mock.Mock()
+    driver.execute_script.side_effect = [json.dumps(capture) for capture in captures]
+    return driver
+
+
+FULL = {'token': 't1', 'full': True, 'tree': _element(
+    4, 'HTML', _element(3, 'BODY', _element(1, 'P', _text(0, 'hello'), color='red'), _text(2, 'bye')))}
+
+
+def _strip_ids(node):
+    node = {key: value for key, value in node.items() if key != '$id'}
+    if 'childNodes' in node:
+        node['childNodes'] = [_strip_ids(child_node) for child_node in node['childNodes']]
+    return node
+
+
+def test_unchanged_subtrees_are_reused():
+    changed = {'token': 't1', 'full': False, 'tree': _element(
+        4, 'HTML', _element(3, 'BODY', {'$ref': 1}, _text(2, 'changed')))}
+    snapshot = dom_capture.DomSnapshot()
+    driver = _driver(FULL, changed, {'token': 't1', 'full': False, 'tree': {'$ref': 4}})
+
+    first = snapshot.capture(driver)
+    assert first == _strip_ids(FULL['tree'])
+    assert snapshot.token == 't1'
+
+    second = snapshot.capture(driver)
+    body = second['childNodes'][0]
+    assert body['childNodes'][0] is first['childNodes'][0]['childNodes'][0]
+    assert body['childNodes'][1] == {'tagName': '#text', 'text': 'changed'}
+    assert snapshot.last_stats['reused_subtrees'] == 1
+    assert driver.execute_script.call_args[0][2] == 't1'
+
+    # Nodes inside reused subtrees can be referenced by the next capture too.
+    assert snapshot.capture(driver) is second
+
+
+def test_missing_references_fall_back_to_a_full_capture():
+    snapshot = dom_capture.DomSnapshot()
+    snapshot.token = 'stale'
+    driver = _driver({'token': 'stale', 'full': False, 'tree': {'$ref': 4}}, FULL)
+    assert snapshot.capture(driver) == _strip_ids(FULL['tree'])
+    assert driver.execute_script.call_args_list[1][0][2] is None
+    assert snapshot.last_stats['full']
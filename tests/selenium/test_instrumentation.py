@@ -0,0 +1,51 @@
+import mock
+import pytest
+
+from applitools.core import DriverBudgetExceededError
+from applitools.selenium import DriverBudget, DriverCallRecorder
+
+
+class FakeDriver(object):
+    def execute(self, driver_command, params=None):
+        if driver_command == 'screenshot':
+            return {'value': 'iVBORw0KGgo='}
+        return {'value': {'width': 800, 'height': 600}}
+
+
+def test_records_round_trips_of_checkpoints_only():
+    driver = FakeDriver()
+    recorder = DriverCallRecorder()
+    recorder.attach(driver)
+    driver.execute('get')
+    with recorder.checkpoint('home'):
+        driver.execute('screenshot')
+        with recorder.checkpoint('nested'):
+            driver.execute('executeScript')
+            driver.execute('executeScript')
+    recorder.detach()
+    assert 'execute' not in vars(driver)
+
+    report = recorder.report()
+    assert [checkpoint['name'] for checkpoint in report['checkpoints']] == ['home']
+    assert report['total']['round_trips'] == 3
+    commands = report['total']['commands']
+    assert commands['screenshot']['bytes'] == len('iVBORw0KGgo=')
+    assert commands['executeScript']['count'] == 2
+    assert 'home: 3 round trips' in recorder.format_report()
+
+
+def test_budget_fails_or_warns():
+    driver = FakeDriver()
+    recorder = DriverCallRecorder(DriverBudget(max_round_trips=1, on_exceed=DriverBudget.FAIL))
+    recorder.attach(driver)
+    with pytest.raises(DriverBudgetExceededError):
+        with recorder.checkpoint('home'):
+            driver.execute('screenshot')
+            driver.execute('screenshot')
+
+    recorder.budget.on_exceed = DriverBudget.WARN
+    with mock.patch('applitools.core.logger.warning') as warning:
+        with recorder.checkpoint('home'):
+            driver.execute('screenshot')
+            driver.execute('screenshot')
+    assert warning.called
@@ -0,0 +1,87 @@
+import mock
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from applitools.core import EyesError, Point
+from applitools.core.match_window_task import MatchWindowTask
+from applitools.selenium import Eyes
+from applitools.selenium.webdriver import EyesWebDriver
+
+from benchmarks.fake_server import FakeEyesServer
+from benchmarks.fake_webdriver import FakePage, FakeWebDriver
+
+METRICS = {
+    'entireSize': [1200, 3000.4],
+    'viewportSize': [800, 600],
+    'scrollPosition': [0, 100],
+    'devicePixelRatio': 2,
+    'overflow': '',
+    'userAgent': 'Mozilla/5.0',
+}
+
+
+@pytest.fixture
+def eyes_driver():
+    raw_driver = mock.Mock(capabilities={}, desired_capabilities={'platformName': 'Android'})
+    raw_driver.execute_script.return_value = METRICS
+    driver = EyesWebDriver(raw_driver, mock.Mock())
+    driver.begin_check()
+    return driver
+
+
+def _metrics_queries(eyes_driver):
+    scripts = [call[0][0] for call in eyes_driver.driver.execute_script.call_args_list]
+    return scripts.count(scripts[0])
+
+
+def test_page_metrics_are_gathered_in_one_script(eyes_driver):
+    assert eyes_driver.get_entire_page_size() == dict(width=1200, height=3000)
+    assert eyes_driver.extract_full_page_height() == 3000
+    assert eyes_driver.get_viewport_size() == dict(width=800, height=600)
+    assert eyes_driver.get_current_position() == Point(0, 100)
+    assert eyes_driver.get_page_metrics().device_pixel_ratio == 2
+    assert eyes_driver.driver.execute_script.call_count == 1
+
+
+def test_page_metrics_are_invalidated_by_scrolling(eyes_driver):
+    eyes_driver.get_current_position()
+    eyes_driver.scroll_to(Point(0, 0))
+    eyes_driver.get_current_position()
+    assert _metrics_queries(eyes_driver) == 2
+
+
+def test_page_metrics_are_not_cached_outside_of_checks(eyes_driver):
+    eyes_driver.end_check()
+    eyes_driver.get_current_position()
+    eyes_driver.get_current_position()
+    assert _metrics_queries(eyes_driver) == 2
+
+
+def test_falls_back_to_separate_queries(eyes_driver):
+    eyes_driver.driver.execute_script.side_effect = [WebDriverException(), [640, 480]]
+    assert eyes_driver.get_viewport_size() == dict(width=640, height=480)
+    assert eyes_driver.get_page_metrics() is None
+
+
+def test_check_counts_real_and_cached_queries(eyes_driver):
+    for _ in range(3):
+        eyes_driver.is_mobile_device()
+        eyes_driver.get_viewport_size()
+    eyes_driver.set_window_size(800, 600)
+    eyes_driver.is_mobile_device()
+    assert eyes_driver.end_check() == dict(real=3, cached=4)
+    assert eyes_driver.last_check_command_stats == dict(real=3, cached=4)
+
+
+def test_failed_checks_stop_caching():
+    with FakeEyesServer() as server:
+        eyes = Eyes(server.url)
+        eyes.api_key = 'metrics'
+        eyes.open(FakeWebDriver(FakePage()), 'App', 'Failed check', {'width': 800, 'height': 600})
+        try:
+            with mock.patch.object(MatchWindowTask, 'match_window', side_effect=EyesError('Match failed')):
+                with pytest.raises(EyesError, match='Match failed'):
+                    eyes.check_window('Window')
+            assert not eyes._driver.command_cache.active
+        finally:
+            eyes.abort_if_not_closed()
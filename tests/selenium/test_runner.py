@@ -0,0 +1,128 @@
+import logging
+
+import mock
+import pytest
+
+from applitools.core import logger
+from applitools.core.http_transport import ConnectionSettings, HttpTransport
+from applitools.selenium import ConcurrentRunner, Eyes, RunnerJob
+
+from benchmarks.fake_server import FakeEyesServer
+from benchmarks.fake_webdriver import FakePage, FakeWebDriver
+
+
+@pytest.fixture
+def eyes_server():
+    with FakeEyesServer() as server:
+        yield server
+
+
+def _eyes_factory(server):
+    def create():
+        eyes = Eyes(server.url)
+        eyes.api_key = 'runner'
+        eyes.wait_before_screenshots = 0
+        return eyes
+
+    return create
+
+
+def _check_window(eyes, driver):
+    eyes.open(driver, 'Runner', 'Check window', {'width': 800, 'height': 600})
+    eyes.check_window('Window')
+
+
+def _check_and_close(eyes, driver):
+    eyes.open(driver, 'Runner', 'Check and close', {'width': 800, 'height': 600})
+    eyes.check_window('Window')
+    return eyes.close()
+
+
+def _fail(eyes, driver):
+    eyes.open(driver, 'Runner', 'Failing', {'width': 800, 'height': 600})
+    raise RuntimeError('Element not found')
+
+
+def test_runs_jobs_concurrently_on_a_shared_connection_pool(eyes_server):
+    drivers = []
+
+    def driver_factory():
+        drivers.append(FakeWebDriver(FakePage(entire_size=(800, 2000))))
+        return drivers[-1]
+
+    runner = ConcurrentRunner(max_workers=3, eyes_factory=_eyes_factory(eyes_server))
+    summary = runner.run([(driver_factory, _check_window) for _ in range(4)] +
+                         [RunnerJob(driver_factory, _check_and_close, name='closed by the test')])
+
+    assert summary.all_passed
+    assert (summary.passed, summary.failed, summary.errors) == (5, 0, 0)
+    assert [result.name for result in summary] == ['_check_window'] * 4 + ['closed by the test']
+    assert all(test_results.steps >= 1 for test_results in summary.test_results)
+    assert eyes_server.requests['PUT /blobs'] == 5
+    assert len(drivers) == 5
+    assert all(driver.fake_executor.commands['quit'] == 1 for driver in drivers)
+    # Connections are reused across jobs.
+    assert runner.connection_stats['requests'] > runner.connection_stats['connections_opened']
+
+
+def test_failing_job_does_not_affect_the_others(eyes_server):
+    runner = ConcurrentRunner(max_workers=2, eyes_factory=_eyes_factory(eyes_server))
+    summary = runner.run([
+        (lambda: FakeWebDriver(FakePage()), _fail),
+        (lambda: FakeWebDriver(FakePage()), _check_window),
+    ])
+
+    failed, passed = summary.results
+    assert isinstance(failed.error, RuntimeError)
+    assert 'Element not found' in failed.error_traceback
+    assert failed.test_results is None
+    assert passed.is_passed
+    assert (summary.passed, summary.errors) == (1, 1)
+    # The failed session is aborted.
+    assert eyes_server.requests['DELETE /api/sessions/running'] == 2
+    assert '1 passed, 0 failed, 1 errors' in str(summary)
+
+
+def test_connection_settings_of_a_job_do_not_close_the_shared_transport():
+    shared = mock.Mock(spec=HttpTransport)
+    eyes = Eyes('https://eyes.example.com')
+    owned = eyes.transport
+    with mock.patch.object(owned, 'close') as close_owned:
+        eyes.transport = shared
+    close_owned.assert_called_once_with()
+
+    eyes.connection_settings = ConnectionSettings(pool_maxsize=2)
+    assert not shared.close.called
+    assert eyes.transport is not shared
+    assert eyes.connection_settings.pool_maxsize == 2
+
+
+class _RecordingHandler(logging.Handler):
+    def __init__(self):
+        super(_RecordingHandler, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_sessions_log_in_their_own_context(eyes_server):
+    handler = _RecordingHandler()
+    previous_logger = logger._logger
+    logger.set_logger(logger.StdoutLogger(level=logging.DEBUG))
+    logger._logger._logger.addHandler(handler)
+    try:
+        runner = ConcurrentRunner(max_workers=2, eyes_factory=_eyes_factory(eyes_server))
+        runner.run([RunnerJob(lambda: FakeWebDriver(FakePage()), _check_and_close),
+                    RunnerJob(lambda: FakeWebDriver(FakePage()), _check_window)])
+    finally:
+        logger._logger._logger.removeHandler(handler)
+        logger.set_logger(previous_logger)
+
+    session_ids = {}
+    for record in handler.records:
+        if record.eyes_test_name is not None:
+            session_ids.setdefault(record.eyes_test_name, set()).add(record.eyes_session_id)
+    assert sorted(session_ids) == ['Check and close', 'Check window']
+    assert all(len(ids) == 1 for ids in session_ids.values())
+    assert logger.get_context() is None
@@ -0,0 +1,64 @@
+import io
+import random
+import zlib
+
+import pytest
+from PIL import Image, ImageChops
+
+from applitools.utils import image_utils
+from applitools.utils.image_utils import PngEncoder
+
+
+def _noisy_image(mode, size=(300, 200)):
+    rnd = random.Random(0)
+    data = bytes(bytearray(rnd.randrange(0, 8) for _ in range(size[0] * size[1] * len(mode))))
+    return Image.frombytes(mode, size, data)
+
+
+def _decode(png_bytes):
+    image = Image.open(io.BytesIO(png_bytes))
+    image.load()
+    return image
+
+
+@pytest.mark.parametrize('encoder', [
+    PngEncoder(),
+    PngEncoder.fast(),
+    PngEncoder(compress_level=9, strategy=zlib.Z_FILTERED),
+    PngEncoder(threads=3, chunk_size=10000),
+    PngEncoder.fast(threads=3),
+], ids=str)
+@pytest.mark.parametrize('mode', ['L', 'RGB', 'RGBA'])
+def test_encoded_image_is_lossless(encoder, mode):
+    image = _noisy_image(mode)
+    decoded = _decode(encoder.encode(image))
+    assert decoded.mode == mode
+    assert ImageChops.difference(decoded, image).getbbox() is None
+    encoder.close()
+
+
+def test_reduce_colors_drops_opaque_alpha_and_uses_palette():
+    encoder = PngEncoder(reduce_colors=True)
+    opaque = _noisy_image('L').convert('RGBA')
+    assert _decode(encoder.encode(opaque)).mode == 'P'
+    rich = Image.frombytes('RGB', (64, 64), bytes(bytearray(i % 256 for i in range(64 * 64 * 3))))
+    rich.putpixel((0, 0), (1, 2, 3))
+    rich.putpixel((0, 1), (4, 5, 6))
+    decoded = _decode(encoder.encode(rich.convert('RGBA')))
+    assert ImageChops.difference(decoded.convert('RGB'), rich).getbbox() is None
+
+
+def test_encoder_stats():
+    encoder = PngEncoder.fast()
+    image = _noisy_image('RGB', (100, 50))
+    sizes = [len(encoder.encode(image)) for _ in range(2)]
+    stats = encoder.stats
+    assert stats['images'] == 2
+    assert stats['raw_bytes'] == 2 * 100 * 50 * 3
+    assert stats['encoded_bytes'] == sum(sizes)
+
+
+def test_load_image_decodes_eagerly():
+    image = image_utils.load_image(image_utils.get_bytes(_noisy_image('RGB', (20, 10))))
+    assert image.fp is None
+    assert image.size == (20, 10)
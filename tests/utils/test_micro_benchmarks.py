@@ -0,0 +1,39 @@
+import pytest
+
+from benchmarks.micro import BENCHMARKS, BaselineHistory, BenchmarkStats, compare, run
+
+
+def test_stats_of_rounds():
+    stats = BenchmarkStats([3.0, 1.0, 2.0, 4.0], iterations=10)
+
+    assert (stats.min, stats.max, stats.rounds) == (1.0, 4.0, 4)
+    assert stats.mean == stats.median == 2.5
+    assert stats.stddev == pytest.approx(1.291, abs=1e-3)
+    assert stats.as_dict()['iterations'] == 10
+
+
+def test_run_every_benchmark_on_tiny_images():
+    reports = []
+    results = run(sizes=[0.01, 0.02], min_rounds=1, max_time=0, report=lambda name, stats: reports.append(name))
+
+    sized = [benchmark for benchmark in BENCHMARKS if benchmark.sized]
+    assert len(results) == 2 * len(sized) + len(BENCHMARKS) - len(sized)
+    assert 'image_utils.get_bytes[0.02MP]' in results
+    assert sorted(reports) == sorted(results)
+    assert all(stats.min > 0 for stats in results.values())
+
+
+def test_compare_with_saved_run(tmpdir):
+    path = str(tmpdir.join('baselines', 'micro.json'))
+    history = BaselineHistory(path)
+    saved = history.add({'a': BenchmarkStats([1.0], 1), 'b': BenchmarkStats([1.0], 1)})
+    history.save()
+
+    history = BaselineHistory(path)
+    assert history.latest() == saved
+    assert history.latest(dict(saved['machine'], node='elsewhere')) is None
+
+    rows = compare({'a': BenchmarkStats([1.05], 1), 'b': BenchmarkStats([1.5], 1), 'c': BenchmarkStats([9.0], 1)},
+                   history.latest(), threshold=0.1)
+    assert [(row['name'], row['regression']) for row in rows] == [('a', False), ('b', True)]
+    assert rows[1]['change'] == pytest.approx(0.5)
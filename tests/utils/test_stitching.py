@@ -0,0 +1,102 @@
+import base64
+
+import mock
+import pytest
+from PIL import Image, ImageChops
+
+from applitools.utils import image_utils, stitching
+from applitools.utils.stitching import PartDecoder, PartStitcher, StageTimings, StitchingEngine, create_canvas
+
+
+def _part(mode, size, color):
+    return Image.new(mode, size, color)
+
+
+def _stitch(engine, parts, size):
+    canvas = create_canvas(engine, size)
+    for image, position in parts:
+        canvas.paste(image, position)
+    return canvas.to_image()
+
+
+PARTS = [
+    (_part('RGB', (40, 30), (255, 0, 0)), (0, 0)),
+    (_part('RGB', (40, 30), (0, 255, 0)), (0, 25)),
+    # Exceeds the canvas and is clipped.
+    (_part('RGB', (40, 30), (0, 0, 255)), (10, 50)),
+]
+
+
+def test_numpy_canvas_matches_pil_canvas():
+    pytest.importorskip('numpy')
+    expected = _stitch(StitchingEngine.PIL, PARTS, (40, 70))
+    actual = _stitch(StitchingEngine.NUMPY, PARTS, (40, 70))
+    assert actual.mode == 'RGB'
+    assert actual.size == (40, 70)
+    assert ImageChops.difference(actual, expected.convert('RGB')).getbbox() is None
+
+
+def test_numpy_canvas_converts_parts_of_other_modes():
+    pytest.importorskip('numpy')
+    image = _stitch(StitchingEngine.NUMPY, [(_part('RGBA', (10, 10), (1, 2, 3, 255)), (0, 0)),
+                                            (_part('RGB', (10, 10), (4, 5, 6)), (0, 10))], (10, 20))
+    assert image.mode == 'RGBA'
+    assert image.getpixel((5, 15)) == (4, 5, 6, 255)
+
+
+def test_numpy_canvas_keeps_mode_when_scaling():
+    pytest.importorskip('numpy')
+    canvas = create_canvas(StitchingEngine.NUMPY, (10, 10))
+    assert canvas.scale(_part('RGB', (20, 20), 'white'), 0.5).mode == 'RGB'
+    assert create_canvas(StitchingEngine.PIL, (10, 10)).scale(_part('RGB', (20, 20), 'white'), 0.5).mode == 'RGBA'
+
+
+def test_falls_back_to_pil_without_numpy():
+    with mock.patch.object(stitching, 'np', None):
+        canvas = create_canvas(StitchingEngine.NUMPY, (10, 10))
+    assert isinstance(canvas, stitching._PILCanvas)
+
+
+def _part64(color):
+    return base64.b64encode(image_utils.get_bytes(_part('RGB', (20, 10), color))).decode('ascii')
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_part_decoder_returns_parts_in_order(workers):
+    decoder = PartDecoder(workers)
+    timings = StageTimings()
+    colors = [(i, i, i) for i in range(0, 250, 25)]
+    results = [decoder.submit(_part64(color), lambda image: image.resize((10, 5)), timings) for color in colors]
+    images = [result.get() for result in results]
+    decoder.close()
+    assert [image.getpixel((0, 0)) for image in images] == colors
+    assert all(image.size == (10, 5) for image in images)
+    stages = timings.as_dict()
+    assert stages['decode']['count'] == stages['transform']['count'] == len(colors)
+
+
+def test_part_decoder_rotates_parts_before_transform():
+    from applitools.selenium.webdriver import EyesWebDriver
+    decoder = PartDecoder(1)
+    part = _part('RGB', (20, 20), 'black')
+    part.putpixel((19, 0), (255, 255, 255))
+    transform = EyesWebDriver._rotating_transform(-90, lambda image: image.crop((0, 0, 10, 10)))
+    image = decoder.submit(base64.b64encode(image_utils.get_bytes(part)), transform).get()
+    assert image.size == (10, 10)
+    assert image.getpixel((0, 0)) == (255, 255, 255)
+    assert EyesWebDriver._rotating_transform(0) is None
+
+
+def test_part_stitcher_caps_the_parts_in_flight():
+    decoder = PartDecoder(2)
+    canvas = create_canvas(StitchingEngine.PIL, (20, 50))
+    stitcher = PartStitcher(decoder, canvas, StageTimings())
+    colors = [(i, i, i) for i in range(0, 250, 50)]
+    for i, color in enumerate(colors):
+        stitcher.add(_part64(color), None, (0, i * 10))
+        assert len(stitcher._pending) <= 2
+    stitcher.finish()
+    decoder.close()
+    image = canvas.to_image()
+    assert not stitcher._pending
+    assert [image.getpixel((0, i * 10))[:3] for i in range(len(colors))] == colors
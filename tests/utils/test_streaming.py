@@ -0,0 +1,43 @@
+import gzip
+import io
+
+from applitools.utils.streaming import GzipSpool
+
+
+def _decompress(data):
+    return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+
+
+def test_spool_compresses_written_pieces():
+    spool = GzipSpool(compress_level=1)
+    for i in range(1000):
+        spool.write(u'{"n":%d}' % i)
+    spool.write(b',')
+    spool.finish()
+    expected = u''.join(u'{"n":%d}' % i for i in range(1000)).encode('utf-8') + b','
+    assert _decompress(spool.getvalue()) == expected
+    assert b''.join(spool) == spool.getvalue()
+    assert len(spool) == len(spool.getvalue())
+    assert spool.stats['raw_bytes'] == len(expected)
+    spool.close()
+
+
+def test_spool_spills_to_disk_beyond_max_memory():
+    data = bytes(bytearray(range(256))) * 4096
+    with GzipSpool(compress_level=1, max_memory=1024) as spool:
+        for i in range(0, len(data), 10000):
+            spool.write(data[i:i + 10000])
+        spool.finish()
+        assert spool._file._rolled
+        assert _decompress(spool.getvalue()) == data
+        # Only the buffered pieces were held in memory once the output was spooled to disk.
+        assert spool.peak_memory < len(data) / 2
+
+
+def test_identical_payloads_have_identical_output():
+    spools = [GzipSpool() for _ in range(2)]
+    for spool in spools:
+        spool.write(u'{"tagName":"HTML"}')
+        spool.finish()
+    assert spools[0].getvalue() == spools[1].getvalue()
+    assert spools[0].digest == spools[1].digest